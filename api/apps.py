@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Every process that loads the api, web worker or management command alike, tunes its connections.
+        from booking import database  # noqa: F401
+        from . import signals  # noqa: F401
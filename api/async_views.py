@@ -0,0 +1,156 @@
+"""Module for the async read views of the api served under ASGI.
+
+The hottest read endpoints, the reservation list and detail and the studio list and availability, answer GET
+requests natively with the async ORM and the async cache API, so a waiting query or cache lookup never holds a
+worker thread. They authenticate, scope, paginate and serialize exactly like their viewset counterparts and return
+the same bodies. Every other method, and reads shaped with `?fields=` or `?expand=`, are passed on to the viewset.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, PermissionDenied, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from booking.serialization import values_serializer
+from users.authentication import aauthenticate, get_jwt_authenticator
+from .availability import astudio_availability
+from .cache import acached_studios, areservation_versions
+from .models import Studio, Reservation, StudioEmployee
+from .serializers import StudioSerializer, ReservationSerializer, AvailabilityQuerySerializer
+from .views import StudioViewSet, ReservationViewSet, etag_matches, reservation_list_etag
+
+
+def _render(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+def _error(request, exc):
+    """Renders an API exception the way DRF's exception handler does."""
+    headers = {}
+    if exc.status_code == 401:
+        headers['WWW-Authenticate'] = get_jwt_authenticator().authenticate_header(request)
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return _render(data, status=exc.status_code, headers=headers)
+
+
+def async_read_view(read, fallback):
+    """Builds a view that answers GET requests with an async handler and passes other requests to a sync view.
+
+    Args:
+        read (callable): The async handler for unshaped GET and HEAD requests, which may raise an `APIException`.
+        fallback (callable): The sync view for every other request.
+
+    Returns:
+        callable: The async view.
+    """
+    fallback = sync_to_async(fallback)
+
+    async def view(request, **kwargs):
+        if request.method not in ('GET', 'HEAD') or 'fields' in request.GET or 'expand' in request.GET:
+            return await fallback(request, **kwargs)
+        try:
+            return await read(request, **kwargs)
+        except APIException as exc:
+            return _error(request, exc)
+
+    view.csrf_exempt = True
+    view.__name__ = read.__name__
+    return view
+
+
+async def _authenticated_user(request):
+    result = await aauthenticate(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+async def _reservation_user(request):
+    """Authenticates a request to the reservation endpoints, rejecting users without a role like the viewset."""
+    user = await _authenticated_user(request)
+    if not (user.is_customer or user.is_employee or user.is_studio_owner):
+        raise PermissionDenied()
+    return user
+
+
+async def _reservation_scope(user):
+    """Returns the studio and customer IDs whose reservation list versions make up the ETag of a user's list."""
+    if user.is_customer:
+        return [], [user.id]
+    studio_ids = getattr(user, 'studio_ids', None)
+    if studio_ids is None and user.is_employee:
+        studio_ids = StudioEmployee.objects.filter(user_id=user.id).values_list('studio_id', flat=True)
+        studio_ids = [studio_id async for studio_id in studio_ids]
+    elif studio_ids is None:
+        studio_ids = Studio.objects.filter(owner_id=user.id).values_list('id', flat=True)
+        studio_ids = [studio_id async for studio_id in studio_ids]
+    return sorted(studio_ids), []
+
+
+async def reservation_list(request):
+    """Returns a page of the reservations visible to the user, or an empty 304 response if the ETag is current."""
+    user = await _reservation_user(request)
+    versions = await areservation_versions(*await _reservation_scope(user))
+    etag = reservation_list_etag(user, versions, request.get_full_path())
+    if etag_matches(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    serializer = values_serializer(ReservationSerializer)
+    paginator = ReservationViewSet.pagination_class()
+    page = await paginator.apaginate_queryset(serializer.values(Reservation.objects.visible_to(user)), Request(request))
+    data = await serializer.arepresent(page)
+    return _render(paginator.get_paginated_response(data).data, headers={'ETag': etag})
+
+
+async def reservation_detail(request, pk):
+    """Returns a reservation visible to the user."""
+    user = await _reservation_user(request)
+    try:
+        reservation = await Reservation.objects.visible_to(user).aget(pk=pk)
+    except Reservation.DoesNotExist:
+        raise NotFound()
+    return _render(ReservationSerializer(reservation).data)
+
+
+async def studio_list(request):
+    """Returns a page of studios, from the studio cache the viewset shares when it was built before."""
+    await _authenticated_user(request)
+
+    async def build():
+        serializer = values_serializer(StudioSerializer)
+        paginator = StudioViewSet.pagination_class()
+        page = await paginator.apaginate_queryset(serializer.values(StudioViewSet.queryset), Request(request))
+        return paginator.get_paginated_response(await serializer.arepresent(page)).data
+
+    return _render(await acached_studios(f'list:{request.get_host()}:{request.GET.urlencode()}', build))
+
+
+async def studio_availability(request, pk):
+    """Returns the free slots and remaining daily capacity of a studio for each day of a date range."""
+    await _authenticated_user(request)
+    try:
+        studio = await Studio.objects.aget(pk=pk)
+    except Studio.DoesNotExist:
+        raise NotFound()
+    query = AvailabilityQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        raise ValidationError(query.errors)
+    start, end = query.validated_data['start'], query.validated_data['end']
+    return _render({
+        'studio': studio.id,
+        'max_customers_per_day': studio.max_customers_per_day,
+        'days': await astudio_availability(studio, start, end),
+    })
+
+
+reservation_list_view = async_read_view(
+    reservation_list, ReservationViewSet.as_view({'get': 'list', 'post': 'create'}, detail=False))
+reservation_detail_view = async_read_view(
+    reservation_detail,
+    ReservationViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+                               detail=True))
+studio_list_view = async_read_view(studio_list, StudioViewSet.as_view({'get': 'list', 'post': 'create'}, detail=False))
+studio_availability_view = async_read_view(
+    studio_availability, StudioViewSet.as_view({'get': 'availability'}, detail=True))
@@ -0,0 +1,136 @@
+"""Module for computing the free slots and remaining daily capacity of a studio.
+
+A studio day is represented as an integer bitmap over the studio's slot grid, bit `i` being set when a reservation
+overlaps the `i`-th slot, so a date range is answered from two range queries however many slots it covers. The
+grid of each distinct set of opening hours and slot length is built once per process.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from .intervals import to_minutes
+from .models import Reservation, DailyOccupancy
+
+
+@lru_cache(maxsize=None)
+def _build_slot_grid(day_start, day_end, slot_minutes):
+    """Builds the slot start times between two times of day.
+
+    Args:
+        day_start (time): The start of the first slot.
+        day_end (time): The time by which the last slot has ended.
+        slot_minutes (int): The length of a slot in minutes.
+
+    Returns:
+        tuple: The start time of every slot, in order.
+    """
+    step = timedelta(minutes=slot_minutes)
+    current = datetime.combine(datetime.min, day_start)
+    end = datetime.combine(datetime.min, day_end)
+    slots = []
+    while current + step <= end:
+        slots.append(current.time())
+        current += step
+    return tuple(slots)
+
+
+@lru_cache(maxsize=None)
+def _slot_starts(slots):
+    return tuple(to_minutes(slot) for slot in slots)
+
+
+def slot_grid(studio):
+    """Returns the slot start times of a day of a studio, from its opening hours and slot length.
+
+    Args:
+        studio (Studio): The studio to return the grid of.
+
+    Returns:
+        tuple: The start time of every slot, in order.
+    """
+    return _build_slot_grid(studio.opens_at, studio.closes_at, studio.slot_minutes)
+
+
+def _booked_query(studio, start, end):
+    return Reservation.objects.filter(studio=studio, date__range=(start, end)).values_list(
+        'date', 'time', 'duration_minutes')
+
+
+def _occupancy_query(studio, start, end):
+    return DailyOccupancy.objects.filter(studio=studio, date__range=(start, end)).values_list('date', 'num_customers')
+
+
+def _add_to_bitmaps(bitmaps, starts, slot_minutes, day, time, duration_minutes):
+    """Sets the bits of the slots a reservation overlaps, found with two binary searches of the grid."""
+    start = to_minutes(time)
+    first = bisect_right(starts, start - slot_minutes)
+    last = bisect_left(starts, start + duration_minutes)
+    if last > first:
+        bitmaps[day] = bitmaps.get(day, 0) | ((1 << (last - first)) - 1) << first
+
+
+def booked_bitmaps(studio, start, end):
+    """Builds the booked-slot bitmap of every day in a date range that has reservations.
+
+    A slot is booked when any reservation overlaps it, whether or not the reservation starts on the grid.
+
+    Args:
+        studio (Studio): The studio to build the bitmaps for.
+        start (date): The first day of the range.
+        end (date): The last day of the range, inclusive.
+
+    Returns:
+        dict: The bitmap of each day that has at least one reservation overlapping the grid, keyed by date.
+    """
+    starts, bitmaps = _slot_starts(slot_grid(studio)), {}
+    for day, time, duration_minutes in _booked_query(studio, start, end).iterator():
+        _add_to_bitmaps(bitmaps, starts, studio.slot_minutes, day, time, duration_minutes)
+    return bitmaps
+
+
+async def abooked_bitmaps(studio, start, end):
+    """Builds the booked-slot bitmaps like `booked_bitmaps`, with the async ORM."""
+    starts, bitmaps = _slot_starts(slot_grid(studio)), {}
+    async for day, time, duration_minutes in _booked_query(studio, start, end):
+        _add_to_bitmaps(bitmaps, starts, studio.slot_minutes, day, time, duration_minutes)
+    return bitmaps
+
+
+def _availability_days(studio, start, end, bitmaps, occupancy):
+    """Turns the booked-slot bitmaps and the ledger of a date range into the availability of each day."""
+    slots = slot_grid(studio)
+    days = []
+    day = start
+    while day <= end:
+        remaining = max(studio.max_customers_per_day - occupancy.get(day, 0), 0)
+        bitmap = bitmaps.get(day, 0)
+        free_slots = [slot.isoformat() for i, slot in enumerate(slots) if not bitmap >> i & 1] if remaining else []
+        days.append({'date': day.isoformat(), 'remaining_capacity': remaining, 'free_slots': free_slots})
+        day += timedelta(days=1)
+    return days
+
+
+def studio_availability(studio, start, end):
+    """Computes the free slots and the remaining capacity of a studio for every day in a date range.
+
+    A day without remaining capacity reports no free slots, since nothing can be booked on it.
+
+    Args:
+        studio (Studio): The studio to compute the availability of.
+        start (date): The first day of the range.
+        end (date): The last day of the range, inclusive.
+
+    Returns:
+        list: One dictionary per day with its `date`, `remaining_capacity` and `free_slots`.
+    """
+    bitmaps = booked_bitmaps(studio, start, end)
+    occupancy = dict(_occupancy_query(studio, start, end))
+    return _availability_days(studio, start, end, bitmaps, occupancy)
+
+
+async def astudio_availability(studio, start, end):
+    """Computes the availability of a studio like `studio_availability`, with the async ORM."""
+    bitmaps = await abooked_bitmaps(studio, start, end)
+    occupancy = {day: num_customers async for day, num_customers in _occupancy_query(studio, start, end)}
+    return _availability_days(studio, start, end, bitmaps, occupancy)
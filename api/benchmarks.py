@@ -0,0 +1,265 @@
+"""Module for the building blocks of the HTTP benchmarks of the booking API.
+
+Benchmarks run against a throwaway test database seeded with deterministic data, so they never touch the
+development database and two runs with the same options measure the same workload.
+"""
+
+import asyncio
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta, time as dtime
+
+from django.contrib.auth.hashers import make_password
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from users.models import User
+from .models import Studio, Reservation, StudioEmployee, DailyOccupancy
+from .search import index_names
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+FIRST_DAY = date(2030, 1, 1)
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@contextmanager
+def benchmark_database(name=None):
+    """Runs the enclosed block against a freshly created test database, destroyed afterwards.
+
+    Args:
+        name (str): The name of the test database, such as a file path on SQLite, whose default test database is
+                    in memory; by default the name the test runner would use.
+    """
+    setup_test_environment()
+    test_settings = connection.settings_dict['TEST']
+    if name is not None:
+        connection.settings_dict['TEST'] = {**test_settings, 'NAME': name}
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST'] = test_settings
+        teardown_test_environment()
+
+
+def seed(studios=20, customers=200, reservations=5000, days=60, random_seed=0):
+    """Seeds owners, employees, customers, studios and reservations.
+
+    Every user shares one password hash, computed once, so seeding does not pay for a hash per user. The
+    occupancy ledger is built from the seeded reservations.
+
+    Args:
+        studios (int): The number of studios, each with its own owner and employee.
+        customers (int): The number of customers.
+        reservations (int): The number of reservations to spread over the studios and days.
+        days (int): The number of days, starting at `FIRST_DAY`, the reservations are spread over.
+        random_seed (int): The seed of the generator that places the reservations.
+
+    Returns:
+        dict: The seeded `owners`, `employees`, `customers` and `studios` lists.
+    """
+    rng = random.Random(random_seed)
+    password = make_password(BENCHMARK_PASSWORD)
+
+    def users(prefix, count, **flags):
+        return User.objects.bulk_create(
+            User(username=f'{prefix}{i}', password=password, **flags) for i in range(count))
+
+    owners = users('owner', studios, is_studio_owner=True)
+    employees = users('employee', studios, is_employee=True)
+    customer_users = users('customer', customers, is_customer=True)
+    studio_objects = Studio.objects.bulk_create(
+        Studio(name=f'Studio {i}', owner=owner, max_customers_per_day=10 ** 6, opens_at=dtime(8), closes_at=dtime(22),
+               slot_minutes=30) for i, owner in enumerate(owners))
+    StudioEmployee.objects.bulk_create(
+        StudioEmployee(studio=studio, user=employee) for studio, employee in zip(studio_objects, employees))
+    # bulk_create skips the signal that indexes studio names for search.
+    index_names(studio_objects)
+
+    slots = [(studio, FIRST_DAY + timedelta(days=day), dtime(hour, minute))
+             for studio in studio_objects for day in range(days) for hour in range(8, 22) for minute in (0, 30)]
+    Reservation.objects.bulk_create(
+        (Reservation(customer=rng.choice(customer_users), studio=studio, date=day, time=slot, duration_minutes=30)
+         for studio, day, slot in rng.sample(slots, min(reservations, len(slots)))), batch_size=1000)
+    DailyOccupancy.objects.bulk_create(
+        DailyOccupancy(studio_id=row['studio_id'], date=row['date'], num_customers=row['total'],
+                       num_reservations=row['count'])
+        for row in Reservation.objects.values('studio_id', 'date').annotate(
+            total=Sum('num_customers'), count=Count('id')))
+    return {'owners': owners, 'employees': employees, 'customers': customer_users, 'studios': studio_objects}
+
+
+def percentile(samples, fraction):
+    """Returns the value below which the given fraction of the sorted samples fall, by nearest rank."""
+    index = max(int(round(fraction * len(samples) + 0.5)) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+def summarize(latencies, queries, elapsed, errors=0):
+    """Summarizes the samples of one scenario.
+
+    Args:
+        latencies (list): The latency of each request, in seconds.
+        queries (list): The number of SQL queries run by each request.
+        elapsed (float): The wall time of the whole scenario, in seconds.
+        errors (int): The number of requests that returned an unexpected status.
+
+    Returns:
+        dict: The request count, throughput, latency percentiles in milliseconds and mean queries per request.
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+    }
+
+
+def measure(request, iterations, expected_status, warmup=5):
+    """Calls a request function repeatedly and summarizes its latency and query count.
+
+    Args:
+        request (callable): Called with the iteration number, performs one request and returns the response.
+        iterations (int): The number of measured requests.
+        expected_status (int): The status code a successful request returns.
+        warmup (int): The number of requests made, and discarded, before measuring.
+
+    Returns:
+        dict: The summary built by `summarize`.
+    """
+    for i in range(warmup):
+        request(-1 - i)
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = request(i)
+            latencies.append(time.perf_counter() - begin)
+        queries.append(len(captured))
+        errors += response.status_code != expected_status
+    return summarize(latencies, queries, time.perf_counter() - started, errors)
+
+
+def reported_queries(response):
+    """Returns the query count the timing middleware reported in the `Server-Timing` header of a response."""
+    match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def _summarize_outcomes(outcomes, elapsed, expected_status):
+    latencies = [latency for latency, _ in outcomes]
+    queries = [reported_queries(response) for _, response in outcomes]
+    errors = sum(response.status_code != expected_status for _, response in outcomes)
+    return summarize(latencies, queries, elapsed, errors)
+
+
+def measure_concurrent(request, iterations, expected_status, concurrency, warmup=5):
+    """Calls a request function from a pool of threads and summarizes its latency and query count.
+
+    The queries of other threads are invisible to `CaptureQueriesContext`, so they are read from the
+    `Server-Timing` header of each response instead.
+
+    Args:
+        request (callable): Called with the iteration number, performs one request and returns the response.
+        iterations (int): The number of measured requests.
+        expected_status (int): The status code a successful request returns.
+        concurrency (int): The number of requests kept in flight.
+        warmup (int): The number of requests made, and discarded, before measuring.
+
+    Returns:
+        dict: The summary built by `summarize`.
+    """
+    for i in range(warmup):
+        request(-1 - i)
+
+    def timed(i):
+        begin = time.perf_counter()
+        response = request(i)
+        return time.perf_counter() - begin, response
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        outcomes = list(pool.map(timed, range(iterations)))
+        elapsed = time.perf_counter() - started
+        # Every worker closes the connections it opened, which the barrier spreads over all of them.
+        barrier = threading.Barrier(concurrency)
+        list(pool.map(lambda _: (connections.close_all(), barrier.wait()), range(concurrency)))
+    return _summarize_outcomes(outcomes, elapsed, expected_status)
+
+
+async def ameasure(request, iterations, expected_status, concurrency=1, warmup=5):
+    """Awaits an async request function with bounded concurrency and summarizes its latency and query count.
+
+    Args:
+        request (callable): Called with the iteration number, returns an awaitable of the response.
+        iterations (int): The number of measured requests.
+        expected_status (int): The status code a successful request returns.
+        concurrency (int): The number of requests kept in flight.
+        warmup (int): The number of requests made, and discarded, before measuring.
+
+    Returns:
+        dict: The summary built by `summarize`.
+    """
+    for i in range(warmup):
+        await request(-1 - i)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i):
+        async with semaphore:
+            begin = time.perf_counter()
+            response = await request(i)
+            return time.perf_counter() - begin, response
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(timed(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - started
+    # The async ORM ran its queries on the thread shared by sync_to_async, whose connections are closed here.
+    await sync_to_async(connections.close_all)()
+    return _summarize_outcomes(outcomes, elapsed, expected_status)
+
+
+def compare(results, baseline, threshold):
+    """Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): The scenario summaries of this run.
+        baseline (dict): The scenario summaries of the baseline run.
+        threshold (float): The relative increase of p50 latency that counts as a regression, e.g. 0.2 for 20%.
+
+    Returns:
+        list: One line per scenario describing the change, prefixed with "REGRESSION" where p50 grew beyond the
+              threshold or queries per request grew at all.
+    """
+    lines = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            lines.append(f'{name}: no baseline')
+            continue
+        change = (current['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] if previous['p50_ms'] else 0.0
+        regressed = change > threshold or current['queries_per_request'] > previous['queries_per_request']
+        lines.append(
+            f"{'REGRESSION ' if regressed else ''}{name}: p50 {previous['p50_ms']} -> {current['p50_ms']} ms "
+            f"({change:+.0%}), queries {previous['queries_per_request']} -> {current['queries_per_request']}")
+    return lines
+
+
+def load_results(path):
+    """Reads the scenario summaries saved by a previous run."""
+    with open(path) as f:
+        return json.load(f)['scenarios']
@@ -0,0 +1,119 @@
+"""Module for creating many reservations at once with grouped validation queries.
+
+A batch locks the ledger rows of its days, then is checked against existing bookings, the studios' opening hours and
+daily capacity and itself with one query per concern, and inserted with a single `bulk_create`, all inside one
+transaction. Overlaps are found in an in-memory `DaySchedule` of each day, so each item costs a binary search, and
+slot holds are read from the hold cache, one key per item.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction, IntegrityError
+
+from users.models import User
+from .cache import bump_reservation_versions
+from .errors import OVERLAP_ERROR, HOURS_ERROR, CAPACITY_ERROR, CONFLICT_ERROR, missing_pk
+from .holds import SlotUnavailable, alternative_slots, held_by_other
+from .intervals import DaySchedule, to_minutes
+from .models import Studio, Reservation, DailyOccupancy
+
+
+def create_reservations(items, user_id=None):
+    """Validates and inserts a batch of reservations, reporting the outcome of each item.
+
+    Items are accepted in order, so when two items of the batch compete for the same time or the last capacity of
+    a day, the earlier one wins. An item without a duration lasts one slot of its studio. A slot held by anyone
+    but the booking user counts as taken, and its error lists the nearest free slots of the day as `alternatives`.
+
+    Args:
+        items (list): Validated reservation data dictionaries with `studio_id`, `customer_id`, `date`, `time`,
+                      `num_customers` and optionally `duration_minutes` and `notes`.
+        user_id (int): The ID of the user booking the items, whose own holds do not block them, or None to book
+                       each item as its customer.
+
+    Returns:
+        list: For each item, in order, either the created Reservation object or a dictionary of errors.
+    """
+    studios = Studio.objects.in_bulk({item['studio_id'] for item in items})
+    customers = set(User.objects.filter(id__in={item['customer_id'] for item in items}).values_list('id', flat=True))
+    days = {(item['studio_id'], item['date']) for item in items if item['studio_id'] in studios}
+    dates = {date for _, date in days}
+
+    results = []
+    groups = defaultdict(list)
+    try:
+        with transaction.atomic():
+            # Bookings are read only once the days are locked, so a concurrent writer cannot slip an overlapping
+            # booking in between the checks and the insert.
+            DailyOccupancy.lock_days(days)
+            schedules = day_schedules(studios, dates)
+            occupancy = {
+                (studio_id, date): num_customers for studio_id, date, num_customers in DailyOccupancy.objects.filter(
+                    studio_id__in=studios, date__in=dates).values_list('studio_id', 'date', 'num_customers')
+            }
+            for index, item in enumerate(items):
+                studio = studios.get(item['studio_id'])
+                if studio is None:
+                    results.append({'studio': missing_pk(item['studio_id'])})
+                    continue
+                if item['customer_id'] not in customers:
+                    results.append({'customer': missing_pk(item['customer_id'])})
+                    continue
+                duration = item.get('duration_minutes') or studio.slot_minutes
+                if not studio.is_open(item['time'], duration):
+                    results.append({'non_field_errors': [HOURS_ERROR.format(studio=studio)]})
+                    continue
+                booker = item['customer_id'] if user_id is None else user_id
+                if held_by_other(studio.id, item['date'], item['time'], booker):
+                    results.append({'non_field_errors': [SlotUnavailable.default_detail],
+                                    'alternatives': alternative_slots(studio, item['date'], item['time'])})
+                    continue
+                day = (studio.id, item['date'])
+                start = to_minutes(item['time'])
+                if schedules[day].overlaps(start, start + duration):
+                    results.append({'non_field_errors': [OVERLAP_ERROR.format(date=item['date'], studio=studio)]})
+                    continue
+                if occupancy.get(day, 0) + item['num_customers'] > studio.max_customers_per_day:
+                    results.append({'non_field_errors': [CAPACITY_ERROR.format(date=item['date'], studio=studio)]})
+                    continue
+                schedules[day].add(start, start + duration)
+                occupancy[day] = occupancy.get(day, 0) + item['num_customers']
+                reservation = Reservation(studio=studio, duration_minutes=duration, **{
+                    key: value for key, value in item.items() if key not in ('studio_id', 'duration_minutes')})
+                results.append(reservation)
+                groups[day].append(index)
+
+            claims = {day: (sum(results[index].num_customers for index in indexes), len(indexes))
+                      for day, indexes in groups.items()}
+            for studio_id, date in DailyOccupancy.reserve_many(claims):
+                # The day went over capacity despite the checks above, so none of its items can be kept.
+                for index in groups[(studio_id, date)]:
+                    results[index] = {'non_field_errors': [CAPACITY_ERROR.format(date=date, studio=studios[studio_id])]}
+            created = [result for result in results if isinstance(result, Reservation)]
+            Reservation.objects.bulk_create(created)
+            bump_reservation_versions({reservation.studio_id for reservation in created},
+                                      {reservation.customer_id for reservation in created})
+    except IntegrityError:
+        return [result if not isinstance(result, Reservation) else {'non_field_errors': [CONFLICT_ERROR]}
+                for result in results]
+    return results
+
+
+def day_schedules(studio_ids, dates):
+    """Reads the bookings of some studios on some days into a `DaySchedule` per day, with one query.
+
+    Args:
+        studio_ids (iterable): The IDs of the studios.
+        dates (iterable): The days.
+
+    Returns:
+        defaultdict: The schedule of every (studio ID, date) pair, empty for days without bookings.
+    """
+    ranges = defaultdict(list)
+    for studio_id, date, time, duration_minutes in Reservation.objects.filter(
+            studio_id__in=studio_ids, date__in=dates).values_list('studio_id', 'date', 'time', 'duration_minutes'):
+        start = to_minutes(time)
+        ranges[(studio_id, date)].append((start, start + duration_minutes))
+    schedules = defaultdict(DaySchedule)
+    schedules.update((day, DaySchedule(day_ranges)) for day, day_ranges in ranges.items())
+    return schedules
@@ -0,0 +1,163 @@
+"""Module for the versioned read-through cache of studio representations and the reservation list versions.
+
+Cached studio entries are keyed by a version that every change to a studio replaces, so invalidation is a single
+cache write and stale entries simply stop being read until they expire.
+
+Reservation lists are versioned per studio and per customer, by the counters of `users.versions`, which are bumped
+in the transaction of every reservation write, so a write in one worker changes the ETags all of them compute as
+soon as it commits.
+"""
+
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.versions import aget_versions, bump_versions, get_versions
+
+VERSION_KEY = 'api:studios:version'
+LOCK_TIMEOUT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+
+def studio_cache_version():
+    """Returns the current version of the studio cache, starting a new one if the cache has none.
+
+    Returns:
+        int: The current version.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_studios():
+    """Moves the studio cache to a new version, so every cached studio representation is rebuilt on next read.
+
+    Returns:
+        None
+    """
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def cached_studios(key, build):
+    """Returns a cached studio representation, building and caching it on a miss.
+
+    Only one caller rebuilds a missing entry: the others wait for it to appear, for up to `LOCK_TIMEOUT` seconds,
+    before building it themselves.
+
+    Args:
+        key (str): The key of the representation within the current version, e.g. `detail:1`.
+        build (callable): Called without arguments to build the representation on a miss.
+
+    Returns:
+        The cached or newly built representation.
+    """
+    versioned_key = f'api:studios:{studio_cache_version()}:{key}'
+    value = cache.get(versioned_key)
+    if value is not None:
+        return value
+
+    lock_key = f'{versioned_key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(versioned_key)
+            if value is not None:
+                return value
+    try:
+        value = build()
+        cache.set(versioned_key, value, settings.BOOKING_STUDIO_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+STUDIO_RESERVATIONS_KEY = 'reservations:studio:{}'
+CUSTOMER_RESERVATIONS_KEY = 'reservations:customer:{}'
+
+
+def _reservation_keys(studio_ids, customer_ids):
+    return ([STUDIO_RESERVATIONS_KEY.format(studio_id) for studio_id in studio_ids]
+            + [CUSTOMER_RESERVATIONS_KEY.format(customer_id) for customer_id in customer_ids])
+
+
+def reservation_versions(studio_ids=(), customer_ids=()):
+    """Returns the reservation list versions of some studios and customers, with one query.
+
+    Args:
+        studio_ids (iterable): The IDs of the studios.
+        customer_ids (iterable): The IDs of the customers.
+
+    Returns:
+        dict: The current version of each studio and customer, keyed by its counter key.
+    """
+    return get_versions(_reservation_keys(studio_ids, customer_ids))
+
+
+def bump_reservation_versions(studio_ids=(), customer_ids=()):
+    """Increments the reservation list versions of some studios and customers, with one statement.
+
+    It must be called in the transaction of the reservation write, which then commits the new versions with it.
+
+    Args:
+        studio_ids (iterable): The IDs of the studios whose reservations changed.
+        customer_ids (iterable): The IDs of the customers whose reservations changed.
+
+    Returns:
+        None
+    """
+    bump_versions(_reservation_keys(studio_ids, customer_ids))
+
+
+async def acached_studios(key, build):
+    """Returns a cached studio representation like `cached_studios`, from an async caller.
+
+    Args:
+        key (str): The key of the representation within the current version, e.g. `detail:1`.
+        build (callable): Called without arguments to build the representation on a miss; returns an awaitable.
+
+    Returns:
+        The cached or newly built representation.
+    """
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY)
+    versioned_key = f'api:studios:{version}:{key}'
+    value = await cache.aget(versioned_key)
+    if value is not None:
+        return value
+
+    lock_key = f'{versioned_key}:lock'
+    if not await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await cache.aget(versioned_key)
+            if value is not None:
+                return value
+    try:
+        value = await build()
+        await cache.aset(versioned_key, value, settings.BOOKING_STUDIO_CACHE_TIMEOUT)
+    finally:
+        await cache.adelete(lock_key)
+    return value
+
+
+async def areservation_versions(studio_ids=(), customer_ids=()):
+    """Returns the reservation list versions of some studios and customers like `reservation_versions`, from an
+    async caller.
+
+    Args:
+        studio_ids (iterable): The IDs of the studios.
+        customer_ids (iterable): The IDs of the customers.
+
+    Returns:
+        dict: The current version of each studio and customer, keyed by its counter key.
+    """
+    return await aget_versions(_reservation_keys(studio_ids, customer_ids))
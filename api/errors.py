@@ -0,0 +1,15 @@
+"""Module for the error messages the reservation write paths share.
+
+Bulk creation, series, holds and waitlist promotion check bookings outside the serializers, and word their errors
+the way the model and DRF word the same failures.
+"""
+
+OVERLAP_ERROR = "The reservation overlaps another booking at {studio} on {date}."
+HOURS_ERROR = "{studio} is open from {studio.opens_at:%H:%M} to {studio.closes_at:%H:%M}."
+CAPACITY_ERROR = "The maximum number of customers for {date} at {studio} has already been reached."
+CONFLICT_ERROR = "The reservation conflicted with a concurrent booking, please retry."
+
+
+def missing_pk(value):
+    """Returns the error messages of a primary key that matches no object, worded as DRF words them."""
+    return [f'Invalid pk "{value}" - object does not exist.']
@@ -0,0 +1,82 @@
+"""Module for the streaming export of reservations as CSV or NDJSON.
+
+Rows are read as tuples from a database iterator and written out a chunk at a time, so an export holds at most one
+chunk of rows in memory however many it covers.
+"""
+
+import csv
+import io
+import json
+
+EXPORT_FIELDS = ('id', 'studio_id', 'customer_id', 'date', 'time', 'duration_minutes', 'num_customers', 'notes')
+EXPORT_COLUMNS = ('id', 'studio', 'customer', 'date', 'time', 'duration_minutes', 'num_customers', 'notes')
+
+
+def export_rows(queryset, chunk_size):
+    """Returns an iterator over the export columns of a reservation queryset, in booking order.
+
+    Args:
+        queryset (QuerySet): The reservations to export, already scoped to the user.
+        chunk_size (int): The number of rows fetched from the database at a time.
+
+    Returns:
+        iterator: One tuple of `EXPORT_FIELDS` values per reservation.
+    """
+    return queryset.order_by('date', 'time', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _drain(buffer):
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def csv_chunks(rows, chunk_size):
+    """Writes rows as CSV with a header line, yielding the text of `chunk_size` rows at a time.
+
+    Args:
+        rows (iterable): The tuples returned by `export_rows`.
+        chunk_size (int): The number of rows per yielded chunk.
+
+    Yields:
+        str: A chunk of CSV text.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def ndjson_chunks(rows, chunk_size):
+    """Writes rows as newline-delimited JSON objects, yielding the text of `chunk_size` rows at a time.
+
+    The objects have the keys and value formats of the reservation API, dates and times in ISO 8601.
+
+    Args:
+        rows (iterable): The tuples returned by `export_rows`.
+        chunk_size (int): The number of rows per yielded chunk.
+
+    Yields:
+        str: A chunk of NDJSON text.
+    """
+    buffer = io.StringIO()
+    for count, (id, studio, customer, date, time, duration_minutes, num_customers, notes) in enumerate(rows, 1):
+        buffer.write(json.dumps({
+            'id': id, 'studio': studio, 'customer': customer, 'date': date.isoformat(), 'time': time.isoformat(),
+            'duration_minutes': duration_minutes, 'num_customers': num_customers, 'notes': notes,
+        }, separators=(',', ':')))
+        buffer.write('\n')
+        if count % chunk_size == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+}
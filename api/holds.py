@@ -0,0 +1,174 @@
+"""Module for short-lived holds on reservation slots.
+
+A hold keeps a (studio, date, time) slot for one user for `BOOKING_HOLD_SECONDS`, until it is confirmed into a
+reservation or expires. Holds are claimed with the atomic `add` of the `BOOKING_HOLD_CACHE` cache, so of many
+clients racing for a hot slot exactly one wins without opening a transaction, and the others are answered at once
+with the free slots nearest to the one they asked for. Holds are keyed by their start time, so two holds may cover
+overlapping bookings of different starts; the one confirmed second is then refused like a taken slot.
+
+Any cache backend can keep the holds as long as all workers share it: Redis or Memcached in production, Django's
+database cache where neither is available, or the local-memory cache for a single process.
+"""
+
+import secrets
+from datetime import datetime, timedelta, time as dtime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from users.models import User
+from .availability import studio_availability
+from .errors import CAPACITY_ERROR, HOURS_ERROR, missing_pk
+from .models import Studio, Reservation, DailyOccupancy
+
+SLOT_KEY = 'api:holds:slot:{}:{}:{}'
+HOLD_KEY = 'api:holds:hold:{}'
+
+
+class SlotUnavailable(APIException):
+    """Raised when a slot is already booked or held, with the nearest free slots of the same day.
+
+    Args:
+        alternatives (list): The start times of the alternative slots, in ISO 8601.
+        detail (str): The error message; defaults to `default_detail`.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The slot is already booked or held by another client.'
+    default_code = 'slot_unavailable'
+
+    def __init__(self, alternatives, detail=None):
+        super().__init__({'detail': detail or self.default_detail, 'alternatives': alternatives})
+
+
+def hold_cache():
+    """Returns the cache the holds are kept in."""
+    return caches[settings.BOOKING_HOLD_CACHE]
+
+
+def _slot_key(studio_id, date, time):
+    return SLOT_KEY.format(studio_id, date.isoformat(), time.isoformat())
+
+
+def place_hold(user_id, data):
+    """Holds a slot for a user unless another hold already has it.
+
+    Args:
+        user_id (int): The ID of the user placing the hold, the only one who can confirm it.
+        data (dict): The validated reservation data, with `studio_id`, `customer_id`, `date`, `time`,
+                     `num_customers` and optionally `duration_minutes` and `notes`.
+
+    Returns:
+        dict: The hold, with its `hold` token and expiry, or None if the slot is already held.
+    """
+    cache, timeout = hold_cache(), settings.BOOKING_HOLD_SECONDS
+    token = secrets.token_urlsafe(16)
+    if not cache.add(_slot_key(data['studio_id'], data['date'], data['time']), (token, user_id), timeout):
+        return None
+    hold = {
+        'hold': token,
+        'user': user_id,
+        'studio': data['studio_id'],
+        'customer': data['customer_id'],
+        'date': data['date'].isoformat(),
+        'time': data['time'].isoformat(),
+        'num_customers': data['num_customers'],
+        'duration_minutes': data.get('duration_minutes'),
+        'notes': data.get('notes'),
+        'expires_at': (timezone.now() + timedelta(seconds=timeout)).isoformat(),
+    }
+    cache.set(HOLD_KEY.format(token), hold, timeout)
+    return hold
+
+
+def get_hold(token):
+    """Returns a hold by its token, or None if it does not exist or has expired."""
+    return hold_cache().get(HOLD_KEY.format(token))
+
+
+def release_hold(hold):
+    """Gives up a hold, freeing its slot unless the hold expired and the slot was held again since.
+
+    Args:
+        hold (dict): The hold, as returned by `place_hold`.
+
+    Returns:
+        None
+    """
+    cache = hold_cache()
+    slot_key = SLOT_KEY.format(hold['studio'], hold['date'], hold['time'])
+    keys = [HOLD_KEY.format(hold['hold'])]
+    if cache.get(slot_key) == (hold['hold'], hold['user']):
+        keys.append(slot_key)
+    cache.delete_many(keys)
+
+
+def held_by_other(studio_id, date, time, user_id):
+    """Returns whether a slot is held by someone other than the given user."""
+    holder = hold_cache().get(_slot_key(studio_id, date, time))
+    return holder is not None and holder[1] != user_id
+
+
+def alternative_slots(studio, date, time):
+    """Returns the free, unheld slots of a studio's day nearest to a given time.
+
+    Args:
+        studio (Studio): The studio of the unavailable slot.
+        date (date): The day of the unavailable slot.
+        time (time): The start time of the unavailable slot.
+
+    Returns:
+        list: At most `BOOKING_HOLD_ALTERNATIVES` slot start times in ISO 8601, nearest first.
+    """
+    free = [slot for slot in studio_availability(studio, date, date)[0]['free_slots'] if slot != time.isoformat()]
+    keys = {_slot_key(studio.id, date, dtime.fromisoformat(slot)): slot for slot in free}
+    held = {keys[key] for key in hold_cache().get_many(keys)}
+    requested = datetime.combine(date, time)
+    free = [slot for slot in free if slot not in held]
+    free.sort(key=lambda slot: abs(datetime.combine(date, dtime.fromisoformat(slot)) - requested))
+    return free[:settings.BOOKING_HOLD_ALTERNATIVES]
+
+
+def hold_slot(user_id, data):
+    """Holds a slot for a user once the studio and its opening hours, the customer, the slot and the day's capacity
+    are checked.
+
+    Only the studio is read before the hold is claimed, so a client that loses the race for a slot is turned away
+    without any further query but the ones that find its alternatives.
+
+    Args:
+        user_id (int): The ID of the user placing the hold.
+        data (dict): The validated reservation data, as for `place_hold`.
+
+    Returns:
+        dict: The hold, as returned by `place_hold`.
+
+    Raises:
+        ValidationError: If the studio or customer does not exist, the booking is outside the studio's opening hours
+                         or the day has no capacity left for the party.
+        SlotUnavailable: If the slot is already held, or overlaps a booking.
+    """
+    studio = Studio.objects.filter(pk=data['studio_id']).first()
+    if studio is None:
+        raise ValidationError({'studio': missing_pk(data['studio_id'])})
+    duration = data.get('duration_minutes') or studio.slot_minutes
+    if not studio.is_open(data['time'], duration):
+        raise ValidationError(HOURS_ERROR.format(studio=studio))
+    hold = place_hold(user_id, data)
+    if hold is None:
+        raise SlotUnavailable(alternative_slots(studio, data['date'], data['time']))
+    try:
+        if not User.objects.filter(pk=data['customer_id']).exists():
+            raise ValidationError({'customer': missing_pk(data['customer_id'])})
+        if Reservation.objects.overlaps(studio.id, data['date'], data['time'], duration):
+            raise SlotUnavailable(alternative_slots(studio, data['date'], data['time']))
+        occupied = DailyOccupancy.objects.filter(studio=studio, date=data['date']).values_list(
+            'num_customers', flat=True).first() or 0
+        if occupied + data['num_customers'] > studio.max_customers_per_day:
+            raise ValidationError(CAPACITY_ERROR.format(date=data['date'], studio=studio))
+    except APIException:
+        release_hold(hold)
+        raise
+    return hold
@@ -0,0 +1,55 @@
+"""Module for the sorted interval index that the bookings of a studio day are checked for overlaps against.
+
+Times of day are handled as minutes since midnight and a booking as the half-open range [start, end), so two
+bookings that meet, one ending when the next starts, do not overlap.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import time as dtime
+
+
+def to_minutes(time):
+    """Returns a time of day as minutes since midnight, ignoring seconds."""
+    return time.hour * 60 + time.minute
+
+
+def from_minutes(minutes):
+    """Returns the time of day a number of minutes after midnight."""
+    return dtime(*divmod(minutes, 60))
+
+
+class DaySchedule:
+    """The booked ranges of one studio day, sorted by start, answering overlap checks with one binary search.
+
+    Alongside the starts it keeps, for every position, the latest end of the ranges up to it: a range overlaps
+    the booked ones exactly when some range starting before it ends has not ended by its start, which is the
+    latest end before the first range starting at or after its end.
+
+    Args:
+        ranges (iterable): The booked (start, end) ranges, in minutes since midnight, in any order.
+    """
+
+    def __init__(self, ranges=()):
+        self._starts, self._reach = [], []
+        for start, end in sorted(ranges):
+            self._starts.append(start)
+            self._reach.append(max(end, self._reach[-1]) if self._reach else end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start, end):
+        """Returns whether the range [start, end) overlaps any booked range."""
+        position = bisect_left(self._starts, end)
+        return position > 0 and self._reach[position - 1] > start
+
+    def add(self, start, end):
+        """Books the range [start, end)."""
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._reach.insert(position, end)
+        for index in range(position, len(self._reach)):
+            reach = max(self._reach[index], self._reach[index - 1]) if index else self._reach[index]
+            if index > position and reach == self._reach[index]:
+                break
+            self._reach[index] = reach
@@ -0,0 +1,198 @@
+"""Module for the database-backed job queue that runs side effects outside the request.
+
+Work is registered as a job function with `@job` and queued with `enqueue`, which inserts a `Job` row in the
+caller's transaction: the job becomes visible to workers when the transaction commits and is discarded with it if
+it rolls back, so a view can queue work and return at once. The `run_jobs` command runs the queue.
+
+Workers claim due jobs in batches. On databases with `SELECT ... FOR UPDATE SKIP LOCKED`, such as PostgreSQL,
+concurrent workers skip each other's rows instead of waiting on them. SQLite has no row locks and serializes
+writers, so there a batch is claimed with a conditional UPDATE tagged with the worker's claim token, and idle
+workers poll. Failed jobs are retried with exponential backoff; a job whose worker died is claimed again once its
+lock times out.
+
+Every run is a transaction of its own, so a job that fails leaves no partial work behind. When a batch function
+fails, the jobs of the batch are run again one at a time, so one bad payload fails only its own job.
+"""
+
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('booking.jobs')
+
+_registry = {}
+
+
+def job(name, batch=False, max_attempts=None):
+    """Registers a function as a job under a name.
+
+    Args:
+        name (str): The name jobs of the function are queued under.
+        batch (bool): Whether the function takes the payloads of all jobs of a claimed batch at once, as a list,
+                      rather than the payload of one job as keyword arguments.
+        max_attempts (int): How many times a job is tried before it is marked failed. Defaults to
+                            `BOOKING_JOB_MAX_ATTEMPTS`.
+
+    Returns:
+        callable: The decorator, which returns the function unchanged.
+    """
+    def register(function):
+        _registry[name] = (function, batch, max_attempts)
+        return function
+    return register
+
+
+def enqueue(name, dedupe_key=None, run_at=None, **payload):
+    """Queues a job in the current transaction; workers see it once the transaction commits.
+
+    Args:
+        name (str): The name of a registered job function.
+        dedupe_key (str): If a pending job already has this key, no job is queued.
+        run_at (datetime): The earliest time the job may run. Defaults to now.
+        **payload: The JSON-serializable keyword arguments of the job function.
+
+    Returns:
+        Job: The queued job, or None if a pending job with the same key exists.
+
+    Raises:
+        KeyError: If no job function is registered under the name.
+    """
+    if name not in _registry:
+        raise KeyError(f'No job is registered as {name!r}.')
+    queued = Job(name=name, payload=payload, dedupe_key=dedupe_key, run_at=run_at or timezone.now())
+    if dedupe_key is None:
+        queued.save()
+        return queued
+    # The unique constraint on pending dedupe keys, rather than a prior lookup, decides, so two writers cannot both
+    # queue the job.
+    try:
+        with transaction.atomic():
+            queued.save()
+    except IntegrityError:
+        return None
+    return queued
+
+
+def claim_jobs(batch_size, worker=None):
+    """Claims up to `batch_size` due jobs for a worker, in the order they became due.
+
+    Pending jobs are due once their `run_at` has passed; running jobs are due again once their lock is older than
+    `BOOKING_JOB_LOCK_TIMEOUT` seconds.
+
+    Args:
+        batch_size (int): The most jobs to claim.
+        worker (str): The claim token of the worker. Defaults to a new random token.
+
+    Returns:
+        list: The claimed jobs, marked running, with their attempts counted.
+    """
+    worker = worker or uuid.uuid4().hex
+    now = timezone.now()
+    due = Q(status=Job.PENDING, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.BOOKING_JOB_LOCK_TIMEOUT))
+    with transaction.atomic():
+        candidates = Job.objects.filter(due)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.order_by('run_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # Without row locks, another worker may have claimed some of the rows since they were read: the claim
+        # only takes the rows that are still due, and the token tells which ones this worker got.
+        Job.objects.filter(due, id__in=ids).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1)
+    return list(Job.objects.filter(id__in=ids, locked_by=worker, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+def _retry_delay(attempts):
+    return min(settings.BOOKING_JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.BOOKING_JOB_RETRY_MAX_DELAY)
+
+
+def _finish(jobs, error=None):
+    """Deletes succeeded jobs, or schedules failed ones for a retry or marks them failed.
+
+    A job due for a retry while a newer job with its dedupe key is pending is deleted instead, as the pending job
+    does the same work.
+    """
+    if error is None:
+        Job.objects.filter(id__in=[claimed.id for claimed in jobs], locked_by=jobs[0].locked_by).delete()
+        return
+    for claimed in jobs:
+        _, _, max_attempts = _registry.get(claimed.name, (None, None, None))
+        if claimed.attempts >= (max_attempts or settings.BOOKING_JOB_MAX_ATTEMPTS):
+            changes = {'status': Job.FAILED}
+        else:
+            changes = {'status': Job.PENDING, 'run_at': timezone.now() + timedelta(
+                seconds=_retry_delay(claimed.attempts))}
+        claimed_row = Job.objects.filter(id=claimed.id, locked_by=claimed.locked_by)
+        try:
+            with transaction.atomic():
+                claimed_row.update(locked_at=None, locked_by=None, last_error=error, **changes)
+        except IntegrityError:
+            claimed_row.delete()
+
+
+def _run(function, batch, jobs):
+    """Runs a job function on the payloads of some jobs in a transaction, and records the outcome.
+
+    Returns:
+        bool: Whether the run succeeded.
+    """
+    try:
+        with transaction.atomic():
+            if function is None:
+                raise KeyError(f'No job is registered as {jobs[0].name!r}.')
+            if batch:
+                function([claimed.payload for claimed in jobs])
+            else:
+                function(**jobs[0].payload)
+    except Exception:
+        logger.exception('Job %s failed.', jobs[0].name)
+        _finish(jobs, traceback.format_exc())
+        return False
+    _finish(jobs)
+    return True
+
+
+def run_jobs(jobs):
+    """Runs claimed jobs, the jobs of a batch function together, and records the outcome of each job.
+
+    If a batch fails, its jobs are run again one at a time, so only the jobs that fail on their own are retried.
+
+    Args:
+        jobs (list): Jobs claimed by `claim_jobs`.
+
+    Returns:
+        int: The number of jobs that succeeded.
+    """
+    runs = {}
+    for claimed in jobs:
+        _, batch, _ = _registry.get(claimed.name, (None, False, None))
+        # The jobs of a batch function run together, any other job on its own.
+        runs.setdefault(claimed.name if batch else claimed.id, []).append(claimed)
+    succeeded = 0
+    for group in runs.values():
+        function, batch, _ = _registry.get(group[0].name, (None, False, None))
+        if len(group) == 1:
+            succeeded += len(group) if _run(function, batch, group) else 0
+            continue
+        try:
+            with transaction.atomic():
+                function([claimed.payload for claimed in group])
+        except Exception:
+            logger.warning('Batch of %d %s jobs failed; running them one at a time.', len(group), group[0].name,
+                           exc_info=True)
+        else:
+            _finish(group)
+            succeeded += len(group)
+            continue
+        succeeded += sum(_run(function, batch, [claimed]) for claimed in group)
+    return succeeded
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import platform
+from datetime import timedelta, time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from api.benchmarks import benchmark_database, seed, measure, measure_concurrent, ameasure, compare, load_results, \
+    BENCHMARK_PASSWORD, FIRST_DAY
+from api.models import Reservation
+
+READ_SCENARIOS = ('studio_list', 'studio_search', 'studio_availability', 'reservation_list_customer',
+                  'reservation_list_owner', 'reservation_retrieve')
+
+
+class Command(BaseCommand):
+    """Benchmarks the booking API end to end through the project's URLconf.
+
+    It seeds a throwaway test database, drives signup, login, token, studio list and availability and reservation
+    create/list/retrieve requests through the Django test client, and reports throughput, latency percentiles
+    and SQL queries per request. Requests are made one at a time unless `--concurrency` is given.
+
+    With `--asgi` the read scenarios are driven through the async test client and the ASGI URLconf, which serves
+    them with the async views, so the same scenarios can be compared between the two deployments.
+    """
+    help = 'Benchmarks the booking API end to end and optionally compares the results with a saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Measured requests per scenario.')
+        parser.add_argument('--studios', type=int, default=20)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--reservations', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated data.')
+        parser.add_argument('--scenario', action='append', help='Run only the named scenario; may be repeated.')
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--baseline', help='Compare the results with the JSON saved at this path.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p50 increase reported as a regression (default 0.2).')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Drive the read scenarios through the ASGI URLconf and its async views.')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Requests kept in flight; above 1 only the read scenarios are run.')
+
+    def handle(self, *args, **options):
+        # The timing middleware stays on, as in production, but its per-request log lines would drown the report.
+        logging.getLogger('booking.timing').setLevel(logging.ERROR)
+        asgi, concurrency = options['asgi'], options['concurrency']
+        if concurrency < 1:
+            raise CommandError('The concurrency must be at least 1.')
+        reads_only = asgi or concurrency > 1
+        urlconf = 'booking.asgi_urls' if asgi else 'booking.urls'
+        # Every request comes from the one test client, which the credential throttles would soon refuse. The
+        # concurrent runs read query counts from the Server-Timing header.
+        with benchmark_database(), override_settings(ROOT_URLCONF=urlconf, BOOKING_THROTTLE_RATES={},
+                                                     BOOKING_SERVER_TIMING=True):
+            data = seed(options['studios'], options['customers'], options['reservations'], random_seed=options['seed'])
+            scenarios = self.scenarios(data, asgi)
+            selected = options['scenario'] or [name for name in scenarios if name in READ_SCENARIOS or not reads_only]
+            unknown = set(selected) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            if reads_only and not set(selected) <= set(READ_SCENARIOS):
+                raise CommandError(f"--asgi and --concurrency only run the read scenarios: {', '.join(READ_SCENARIOS)}")
+
+            results = {}
+            for name in selected:
+                request, expected_status = scenarios[name]
+                if asgi:
+                    results[name] = asyncio.run(ameasure(request, options['iterations'], expected_status, concurrency))
+                elif concurrency > 1:
+                    results[name] = measure_concurrent(request, options['iterations'], expected_status, concurrency)
+                else:
+                    results[name] = measure(request, options['iterations'], expected_status)
+                self.stdout.write(self.format_result(name, results[name]))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'meta': self.meta(options), 'scenarios': results}, f, indent=2, sort_keys=True)
+        if options['baseline']:
+            lines = compare(results, load_results(options['baseline']), options['threshold'])
+            for line in lines:
+                self.stdout.write(self.style.ERROR(line) if line.startswith('REGRESSION') else line)
+            if any(line.startswith('REGRESSION') for line in lines):
+                raise CommandError('Performance regressed against the baseline.')
+
+    def scenarios(self, data, asgi=False):
+        """Builds the request function and expected status of every scenario.
+
+        Args:
+            data (dict): The seeded objects returned by `seed`.
+            asgi (bool): Whether the read scenarios use the async test client, their request functions then
+                         returning awaitables.
+
+        Returns:
+            dict: `(request, expected_status)` pairs keyed by scenario name.
+        """
+        anonymous = Client()
+        customer, owner = data['customers'][0], data['owners'][0]
+        studio = data['studios'][0]
+        customer_client = self.authenticated_client(customer.username)
+        if asgi:
+            # The async test client takes headers per request rather than as client defaults.
+            reader = AsyncClient()
+            customer_get = self.authenticated_get(reader, customer.username, 'AUTHORIZATION')
+            owner_get = self.authenticated_get(reader, owner.username, 'AUTHORIZATION')
+        else:
+            customer_get = self.authenticated_get(Client(), customer.username, 'HTTP_AUTHORIZATION')
+            owner_get = self.authenticated_get(Client(), owner.username, 'HTTP_AUTHORIZATION')
+        availability = f'/api/studios/{studio.id}/availability/?start={FIRST_DAY}&end={FIRST_DAY + timedelta(days=6)}'
+        reservation = Reservation.objects.filter(customer=customer).first() or Reservation.objects.create(
+            customer=customer, studio=studio, date=FIRST_DAY - timedelta(days=1), time=time(8))
+        credentials = {'username': customer.username, 'password': BENCHMARK_PASSWORD}
+
+        def new_reservation(i):
+            # A slot a year past the seeded days, unique per iteration, so every create succeeds.
+            day = FIRST_DAY + timedelta(days=365 + (i % 10 ** 4) // 28)
+            slot = time(8 + (i % 28) // 2, 30 * (i % 2))
+            return {'customer': customer.id, 'studio': studio.id, 'date': day.isoformat(), 'time': slot.isoformat()}
+
+        def new_series(i):
+            # A year of weekly bookings in a slot three years past the seeded days, unique per iteration.
+            start = FIRST_DAY + timedelta(days=3 * 365 + (i // 28) * 52 * 7)
+            slot = time(8 + (i % 28) // 2, 30 * (i % 2))
+            return {'customer': customer.id, 'studio': studio.id, 'date': start.isoformat(),
+                    'time': slot.isoformat(), 'count': 52}
+
+        return {
+            'signup': (lambda i: anonymous.post('/signup/', {
+                'username': f'signup{i}', 'password': BENCHMARK_PASSWORD, 'confirm_password': BENCHMARK_PASSWORD,
+                'is_studio_owner': False, 'is_employee': False, 'is_customer': True}), 201),
+            'login': (lambda i: anonymous.post('/login/', credentials), 200),
+            'token': (lambda i: anonymous.post('/users/token/', credentials), 200),
+            'studio_list': (lambda i: customer_get('/api/studios/'), 200),
+            'studio_search': (lambda i: customer_get(f'/api/studios/search/?q=stud%20{i % 20}'), 200),
+            'studio_availability': (lambda i: customer_get(availability), 200),
+            'reservation_create': (lambda i: customer_client.post('/api/reservations/', new_reservation(i)), 201),
+            'reservation_series_52': (lambda i: customer_client.post('/api/reservations/series/', new_series(i)), 201),
+            'reservation_list_customer': (lambda i: customer_get('/api/reservations/'), 200),
+            'reservation_list_owner': (lambda i: owner_get('/api/reservations/'), 200),
+            'reservation_retrieve': (lambda i: customer_get(f'/api/reservations/{reservation.id}/'), 200),
+        }
+
+    @staticmethod
+    def access_token(username):
+        """Logs the given user in and returns their access token."""
+        response = Client().post('/login/', {'username': username, 'password': BENCHMARK_PASSWORD})
+        return response.json()['access']
+
+    @classmethod
+    def authenticated_client(cls, username):
+        """Returns a test client that sends the access token of the given user with every request."""
+        return Client(HTTP_AUTHORIZATION=f'Bearer {cls.access_token(username)}')
+
+    @classmethod
+    def authenticated_get(cls, client, username, header):
+        """Returns a function that GETs a path with a client, sending the access token of the given user."""
+        authorization = {header: f'Bearer {cls.access_token(username)}'}
+        return lambda path: client.get(path, **authorization)
+
+    @staticmethod
+    def format_result(name, result):
+        return (f"{name:<28} {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']:>8} ms  "
+                f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+                f"{result['queries_per_request']:>5} queries  {result['errors']} errors")
+
+    @staticmethod
+    def meta(options):
+        return {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'options': {key: options[key] for key in ('iterations', 'studios', 'customers', 'reservations', 'seed',
+                                                      'asgi', 'concurrency')},
+        }
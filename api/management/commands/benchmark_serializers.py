@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import benchmark_database, seed
+from api.models import Reservation
+from api.serializers import ReservationSerializer, StudioSerializer
+from api.views import StudioViewSet
+from booking.serialization import values_serializer
+
+
+class Command(BaseCommand):
+    """Measures the per-row cost of the list serializers against their `.values()` fast path.
+
+    For reservations and studios it times building the list representation with the `ModelSerializer` from model
+    instances and with the `ValuesSerializer` from `.values()` rows, both with and without the query that loads
+    the rows, and checks that the two produce the same JSON bytes.
+    """
+    help = 'Compares the per-row serialization cost of the list serializers with their .values() fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows serialized per measurement.')
+        parser.add_argument('--repeat', type=int, default=20, help='Measurements per path; the median is reported.')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with benchmark_database():
+            seed(studios=rows, customers=50, reservations=rows, random_seed=0)
+            cases = {
+                'reservation': (ReservationSerializer, Reservation.objects.order_by('id')[:rows]),
+                'studio': (StudioSerializer, StudioViewSet.queryset.order_by('id')[:rows]),
+            }
+            for name, (serializer_class, queryset) in cases.items():
+                fast = values_serializer(serializer_class)
+                instances, values = list(queryset), list(fast.values(queryset))
+                if JSONRenderer().render(serializer_class(instances, many=True).data) != \
+                        JSONRenderer().render(fast.represent(values)):
+                    raise CommandError(f'The {name} fast path does not match the serializer output.')
+
+                results = {
+                    'serializer': self.per_row(lambda: serializer_class(instances, many=True).data, len(instances),
+                                               repeat),
+                    'values': self.per_row(lambda: fast.represent(values), len(values), repeat),
+                    'serializer+query': self.per_row(lambda: serializer_class(queryset.all(), many=True).data,
+                                                     len(instances), repeat),
+                    'values+query': self.per_row(lambda: fast.represent(fast.values(queryset)), len(values), repeat),
+                }
+                for path, microseconds in results.items():
+                    self.stdout.write(f'{name:<12} {path:<18} {microseconds:>8.2f} us/row')
+                speedup = results['serializer'] / results['values']
+                self.stdout.write(f'{name:<12} {"speedup":<18} {speedup:>8.1f} x\n')
+
+    @staticmethod
+    def per_row(build, count, repeat):
+        """Returns the median time, in microseconds per row, of building a list representation."""
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build()
+            samples.append((time.perf_counter() - start) / max(count, 1) * 1e6)
+        return statistics.median(samples)
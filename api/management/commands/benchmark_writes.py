@@ -0,0 +1,96 @@
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta, time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.benchmarks import benchmark_database, seed, measure_concurrent, FIRST_DAY
+from . import benchmark
+
+
+class Command(benchmark.Command):
+    """Benchmarks concurrent reservation creates against the configured database profile.
+
+    On SQLite it runs the writers twice, each time against a fresh database file: once with the connections as
+    Django opens them, in rollback-journal mode with the driver's default timeout and deferred transactions, and
+    once tuned with `BOOKING_SQLITE_PRAGMAS` and the configured `transaction_mode`, so the gain of the tuning is
+    measured on the same workload. On a server database it runs them once against the profile as configured.
+
+    Requests whose transaction fails, for example with "database is locked", return 500 and count as errors.
+    """
+    help = 'Benchmarks concurrent reservation creates and compares untuned and tuned SQLite connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Measured creates per run.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Writers kept in flight.')
+        parser.add_argument('--studios', type=int, default=20)
+        parser.add_argument('--customers', type=int, default=20)
+        parser.add_argument('--reservations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        logging.getLogger('booking.timing').setLevel(logging.ERROR)
+        # A failed write is counted from its 500; the logged traceback of each would drown the report.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        if options['concurrency'] < 1:
+            raise CommandError('The concurrency must be at least 1.')
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.format_result('server', self.run(options)))
+            return
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            database_options = connection.settings_dict['OPTIONS']
+            untuned_options = {key: value for key, value in database_options.items() if key != 'transaction_mode'}
+            for name, pragmas, run_options in (('untuned', {}, untuned_options),
+                                               ('tuned', settings.BOOKING_SQLITE_PRAGMAS, database_options)):
+                # Every thread's connection is opened from this same settings dict.
+                connection.settings_dict['OPTIONS'] = run_options
+                try:
+                    with override_settings(BOOKING_SQLITE_PRAGMAS=pragmas):
+                        results[name] = self.run(options, os.path.join(directory, f'{name}.sqlite3'))
+                finally:
+                    connection.settings_dict['OPTIONS'] = database_options
+                self.stdout.write(self.format_result(name, results[name]))
+        untuned, tuned = results['untuned'], results['tuned']
+        if untuned['throughput_rps']:
+            self.stdout.write(f"tuned/untuned throughput {tuned['throughput_rps'] / untuned['throughput_rps']:.2f}x, "
+                              f"errors {untuned['errors']} -> {tuned['errors']}")
+
+    def run(self, options, name=None):
+        """Seeds a fresh test database and measures concurrent reservation creates against it.
+
+        Args:
+            options (dict): The command options.
+            name (str): The name of the test database, by default the test runner's.
+
+        Returns:
+            dict: The summary built by `measure_concurrent`.
+        """
+        # Every writer books as the one customer, which the credential throttles would soon refuse. Query counts are
+        # read from the Server-Timing header.
+        with benchmark_database(name), override_settings(ROOT_URLCONF='booking.urls', BOOKING_THROTTLE_RATES={},
+                                                         BOOKING_SERVER_TIMING=True):
+            data = seed(options['studios'], options['customers'], options['reservations'])
+            customer, studios = data['customers'][0], data['studios']
+            token = self.access_token(customer.username)
+            # Test clients are not shared between threads; a failed request answers 500 instead of raising.
+            local = threading.local()
+
+            def create(i):
+                # Writers spread over the studios and a year past the seeded days, every slot unique, so a create
+                # fails only if the database refuses it.
+                if not hasattr(local, 'client'):
+                    local.client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+                studio, k = studios[i % len(studios)], i // len(studios)
+                day = FIRST_DAY + timedelta(days=365 + k // 28)
+                slot = time(8 + (k % 28) // 2, 30 * (k % 2))
+                return local.client.post('/api/reservations/', {
+                    'customer': customer.id, 'studio': studio.id, 'date': day.isoformat(), 'time': slot.isoformat()})
+
+            return measure_concurrent(create, options['iterations'], 201, options['concurrency'])
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.waitlist import promote_waitlist, waitlisted_days
+
+
+class Command(BaseCommand):
+    """Promotes waiting customers on every upcoming day that has a waitlist.
+
+    Cancellations are promoted by a background worker as they happen; this command catches up on days the worker
+    missed, for example because the process restarted before it got to them.
+    """
+    help = 'Promotes waitlisted customers into the free capacity of every upcoming day, in batches of days.'
+
+    def handle(self, *args, **options):
+        batch_size = settings.BOOKING_WAITLIST_BATCH_SIZE
+        days, promoted = list(waitlisted_days()), 0
+        for start in range(0, len(days), batch_size):
+            promoted += len(promote_waitlist(days[start:start + batch_size]))
+        self.stdout.write(f'Promoted {promoted} waitlist entries over {len(days)} days.')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import DailyOccupancy
+
+
+class Command(BaseCommand):
+    """Rebuilds the daily occupancy ledger from the reservations.
+
+    The ledger is kept up to date as reservations are saved and deleted; this command recomputes it, for example
+    after reservations were changed with queryset updates that bypass `Reservation.save()`.
+    """
+    help = 'Rebuilds the daily occupancy ledger of some or all studios from their reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--studio', type=int, action='append', help='Rebuild only this studio; may be repeated.')
+
+    def handle(self, *args, **options):
+        rows = DailyOccupancy.rebuild(options['studio'])
+        self.stdout.write(f'Rebuilt {rows} daily occupancy rows.')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """Rebuilds the studio search indexes from the studio names.
+
+    The indexes are kept up to date as studios are saved; this command recomputes them, for example after studios
+    were created with `bulk_create` or renamed with queryset updates, which bypass the signal that indexes names.
+    """
+    help = 'Rebuilds the studio name search indexes.'
+
+    def handle(self, *args, **options):
+        postings = rebuild_index()
+        self.stdout.write(f'Rebuilt {postings} studio name trigrams.')
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+
+from api.jobs import claim_jobs, run_jobs
+
+logger = logging.getLogger('booking.jobs')
+
+
+class Command(BaseCommand):
+    """Runs the job queue with a number of worker threads.
+
+    Each worker claims a batch of due jobs, runs them and claims the next batch, and waits
+    `BOOKING_JOB_POLL_INTERVAL` seconds whenever no job is due. With `--once` the workers stop as soon as the queue
+    has no due jobs left instead.
+    """
+    help = 'Runs the background job queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads claiming jobs.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Jobs claimed at a time per worker (default BOOKING_JOB_BATCH_SIZE).')
+        parser.add_argument('--once', action='store_true', help='Stop once no job is due.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        batch_size = options['batch_size'] or settings.BOOKING_JOB_BATCH_SIZE
+        if concurrency < 1 or batch_size < 1:
+            raise CommandError('The concurrency and batch size must be at least 1.')
+        self.succeeded = 0
+        self.lock = threading.Lock()
+        workers = [threading.Thread(target=self.work, args=(batch_size, options['once']), name=f'job-worker-{i}',
+                                    daemon=True) for i in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Ran {self.succeeded} jobs successfully.')
+
+    def work(self, batch_size, once):
+        """Claims and runs batches of jobs until stopped, on one worker thread.
+
+        A database error, such as a lock held too long by another writer, is logged and the work retried after
+        the poll interval, so a busy database does not stop the worker.
+        """
+        token = uuid.uuid4().hex
+        try:
+            while True:
+                try:
+                    jobs = claim_jobs(batch_size, token)
+                    succeeded = run_jobs(jobs) if jobs else 0
+                except DatabaseError:
+                    logger.exception('Claiming or finishing jobs failed.')
+                    jobs = None
+                if jobs:
+                    with self.lock:
+                        self.succeeded += succeeded
+                    continue
+                if once and jobs is not None:
+                    return
+                close_old_connections()
+                time.sleep(settings.BOOKING_JOB_POLL_INTERVAL)
+        finally:
+            close_old_connections()
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-17 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_occupancy(apps, schema_editor):
+    """Builds the occupancy ledger from the reservations that already exist."""
+    Reservation = apps.get_model('api', 'Reservation')
+    DailyOccupancy = apps.get_model('api', 'DailyOccupancy')
+    totals = Reservation.objects.values('studio_id', 'date').annotate(total=models.Sum('num_customers'))
+    DailyOccupancy.objects.bulk_create(
+        DailyOccupancy(studio_id=row['studio_id'], date=row['date'], num_customers=row['total']) for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_studio_max_customers_per_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='num_customers',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='DailyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('num_customers', models.PositiveIntegerField(default=0)),
+                ('studio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='api.studio')),
+            ],
+            options={
+                'unique_together': {('studio', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_reservation_num_customers_dailyoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['customer', 'date', 'time'], name='api_resv_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studioemployee',
+            index=models.Index(fields=['user', 'studio'], name='api_studioemp_user_studio_idx'),
+        ),
+    ]
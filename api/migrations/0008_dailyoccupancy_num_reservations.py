@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+def backfill_num_reservations(apps, schema_editor):
+    """Counts the reservations of every ledger row that already exists."""
+    Reservation = apps.get_model('api', 'Reservation')
+    DailyOccupancy = apps.get_model('api', 'DailyOccupancy')
+    counts = {
+        (row['studio_id'], row['date']): row['count']
+        for row in Reservation.objects.values('studio_id', 'date').annotate(count=models.Count('id'))
+    }
+    rows = list(DailyOccupancy.objects.all())
+    for row in rows:
+        row.num_reservations = counts.get((row.studio_id, row.date), 0)
+    DailyOccupancy.objects.bulk_update(rows, ['num_reservations'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_reservation_studioemployee_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyoccupancy',
+            name='num_reservations',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_num_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0008_dailyoccupancy_num_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('num_customers', models.PositiveIntegerField(default=1)),
+                ('time', models.TimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('studio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='api.studio')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['studio', 'date', 'id'], name='api_waitlist_day_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['customer', 'date'], name='api_waitlist_customer_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='waitlistentry',
+            unique_together={('studio', 'date', 'customer')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:30
+
+import api.models
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_job'),
+    ]
+
+    operations = [
+        # Reservations booked before durations existed took one slot of the fixed 60-minute grid.
+        migrations.AddField(
+            model_name='reservation',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(blank=True, default=60, validators=[django.core.validators.MinValueValidator(1)]),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='studio',
+            name='closes_at',
+            field=models.TimeField(default=api.models.default_closes_at),
+        ),
+        migrations.AddField(
+            model_name='studio',
+            name='opens_at',
+            field=models.TimeField(default=api.models.default_opens_at),
+        ),
+        migrations.AddField(
+            model_name='studio',
+            name='slot_minutes',
+            field=models.PositiveIntegerField(default=api.models.default_slot_minutes, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
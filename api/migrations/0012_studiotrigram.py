@@ -0,0 +1,88 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:33
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+WORD = re.compile(r'\w+')
+
+# On SQLite, a later migration that alters api_studio rebuilds the table, which drops these triggers; it must create
+# them again.
+FTS_STATEMENTS = [
+    # An external content table: the names stay in api_studio and only the full-text index is stored.
+    "CREATE VIRTUAL TABLE api_studio_fts USING fts5("
+    "name, content='api_studio', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER api_studio_fts_insert AFTER INSERT ON api_studio BEGIN "
+    "INSERT INTO api_studio_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER api_studio_fts_delete AFTER DELETE ON api_studio BEGIN "
+    "INSERT INTO api_studio_fts(api_studio_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER api_studio_fts_update AFTER UPDATE OF name ON api_studio BEGIN "
+    "INSERT INTO api_studio_fts(api_studio_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO api_studio_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO api_studio_fts(api_studio_fts) VALUES ('rebuild')",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    """Creates the FTS5 index of studio names on SQLite builds that have FTS5, and nowhere else."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+    for statement in FTS_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS api_studio_fts_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS api_studio_fts')
+
+
+def name_trigrams(name):
+    """Returns the trigrams of a studio name as `api.search` indexed them when this migration was written."""
+    decomposed = unicodedata.normalize('NFKD', name.lower())
+    trigrams = set()
+    for word in WORD.findall(''.join(char for char in decomposed if not unicodedata.combining(char))):
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def backfill_trigrams(apps, schema_editor):
+    """Indexes the trigrams of every existing studio name."""
+    Studio = apps.get_model('api', 'Studio')
+    StudioTrigram = apps.get_model('api', 'StudioTrigram')
+    StudioTrigram.objects.bulk_create(
+        (StudioTrigram(studio_id=studio_id, trigram=trigram)
+         for studio_id, name in Studio.objects.values_list('id', 'name').iterator() for trigram in name_trigrams(name)),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_studio_hours_reservation_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudioTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('studio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='api.studio')),
+            ],
+            options={
+                'unique_together': {('trigram', 'studio')},
+            },
+        ),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
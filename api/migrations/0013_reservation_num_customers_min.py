@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:53
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_studiotrigram'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='num_customers',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
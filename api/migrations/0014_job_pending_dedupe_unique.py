@@ -0,0 +1,30 @@
+# Generated by Django 4.1.7 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending_jobs(apps, schema_editor):
+    """Keeps only the earliest pending job of every dedupe key, which the constraint requires."""
+    Job = apps.get_model('api', 'Job')
+    pending = Job.objects.filter(status='pending', dedupe_key__isnull=False)
+    earliest = pending.order_by().values('dedupe_key').annotate(first=models.Min('id')).values('first')
+    pending.exclude(id__in=earliest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_reservation_num_customers_min'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='api_job_dedupe_idx',
+        ),
+        migrations.RunPython(drop_duplicate_pending_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('dedupe_key',), name='api_job_pending_dedupe_uniq'),
+        ),
+    ]
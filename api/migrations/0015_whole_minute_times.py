@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-17 04:01
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_job_pending_dedupe_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='time',
+            field=models.TimeField(validators=[api.models.validate_whole_minute]),
+        ),
+        migrations.AlterField(
+            model_name='studio',
+            name='closes_at',
+            field=models.TimeField(default=api.models.default_closes_at, validators=[api.models.validate_whole_minute]),
+        ),
+        migrations.AlterField(
+            model_name='studio',
+            name='opens_at',
+            field=models.TimeField(default=api.models.default_opens_at, validators=[api.models.validate_whole_minute]),
+        ),
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='time',
+            field=models.TimeField(blank=True, null=True, validators=[api.models.validate_whole_minute]),
+        ),
+    ]
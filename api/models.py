@@ -1,10 +1,42 @@
 """Module for defining Django models related to studio and reservation."""
 
-from django.db import models
-from django.db.models import Sum
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
 from users.models import User
 from django.core.exceptions import ValidationError
 
+from .cache import bump_reservation_versions
+from .intervals import to_minutes, from_minutes
+
+
+def default_opens_at():
+    return settings.BOOKING_DAY_START
+
+
+def default_closes_at():
+    return settings.BOOKING_DAY_END
+
+
+def default_slot_minutes():
+    return settings.BOOKING_SLOT_MINUTES
+
+
+def validate_whole_minute(value):
+    """Rejects a time of day with seconds, which the minute-based opening hours and overlap checks would drop.
+
+    Raises:
+        ValidationError: If the time is not on a whole minute.
+    """
+    if value is not None and (value.second or value.microsecond):
+        raise ValidationError("Times must be on a whole minute.", code='whole_minute')
+
 
 class Studio(models.Model):
     """Studio Model.
@@ -16,15 +48,26 @@ class Studio(models.Model):
         owner (User): The owner of the studio.
         employees (ManyToManyField): The employees associated with the studio.
         max_customers_per_day (int): The maximum number of customers per day that can be reserved.
+        opens_at (time): When the first booking of a day may start.
+        closes_at (time): When the last booking of a day must have ended.
+        slot_minutes (int): The length of the slots availability is reported in, and of a booking by default.
     """
     name = models.CharField(max_length=100)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='studios')
     employees = models.ManyToManyField(User, related_name='studios_employee')
     max_customers_per_day = models.IntegerField(default=10)
+    opens_at = models.TimeField(default=default_opens_at, validators=[validate_whole_minute])
+    closes_at = models.TimeField(default=default_closes_at, validators=[validate_whole_minute])
+    slot_minutes = models.PositiveIntegerField(default=default_slot_minutes, validators=[MinValueValidator(1)])
 
     def __str__(self):
         return self.name
 
+    def is_open(self, time, duration_minutes):
+        """Returns whether a booking starting at a time and lasting a number of minutes is within opening hours."""
+        start = to_minutes(time)
+        return to_minutes(self.opens_at) <= start and start + duration_minutes <= to_minutes(self.closes_at)
+
     def assign_employee(self, user):
         """Assigns an employee to the Studio object.
 
@@ -46,6 +89,64 @@ class Studio(models.Model):
         StudioEmployee.objects.create(studio=self, user=user)
 
 
+class ScopedQuerySet(models.QuerySet):
+    """QuerySet for the objects of a studio and a customer, such as reservations, with role-based scoping."""
+
+    def visible_to(self, user):
+        """Filters the objects down to the ones a user may see, as one SQL statement.
+
+        Customers see their own objects, employees the objects of the studios they work at and studio owners the
+        objects of the studios they own. The studio conditions are applied as a join and a subquery rather than
+        loaded into Python first, or straight from the `studio_ids` claim of a user authenticated by
+        `ClaimsJWTAuthentication`.
+
+        Args:
+            user (User | TokenUser): The user to scope the objects for.
+
+        Returns:
+            QuerySet: The objects visible to the user, or none if the user has no role.
+        """
+        studio_ids = getattr(user, 'studio_ids', None)
+        if user.is_customer:
+            return self.filter(customer_id=user.id)
+        elif user.is_employee:
+            if studio_ids is None:
+                studio_ids = StudioEmployee.objects.filter(user_id=user.id).values('studio_id')
+            return self.filter(studio_id__in=studio_ids)
+        elif user.is_studio_owner:
+            if studio_ids is None:
+                return self.filter(studio__owner_id=user.id)
+            return self.filter(studio_id__in=studio_ids)
+        return self.none()
+
+
+class ReservationQuerySet(ScopedQuerySet):
+    """QuerySet for Reservation objects with role-based scoping and overlap checks."""
+
+    def overlaps(self, studio_id, date, time, duration_minutes):
+        """Returns whether any of the reservations overlaps a booking of a studio's day, in two index lookups.
+
+        The reservations of a day never overlap each other, so a booking can only collide with a reservation
+        starting within it, or with the last one starting before it if that one has not ended by its start. Both
+        are found with a range seek on the (studio, date, time) index, however many bookings the day has.
+
+        Args:
+            studio_id (int): The ID of the studio of the booking.
+            date (date): The day of the booking.
+            time (time): The start time of the booking.
+            duration_minutes (int): The length of the booking in minutes.
+
+        Returns:
+            bool: True if the booking overlaps a reservation.
+        """
+        day = self.filter(studio_id=studio_id, date=date)
+        start = to_minutes(time)
+        if day.filter(time__gte=time, time__lt=from_minutes(start + duration_minutes)).exists():
+            return True
+        previous = day.filter(time__lt=time).order_by('-time').values_list('time', 'duration_minutes').first()
+        return previous is not None and to_minutes(previous[0]) + previous[1] > start
+
+
 class Reservation(models.Model):
     """Reservation Model.
 
@@ -56,20 +157,33 @@ class Reservation(models.Model):
         studio (Studio): The studio where the reservation is made.
         date (date): The date of the reservation.
         time (time): The time of the reservation.
+        duration_minutes (int): How long the reservation lasts; defaults to the studio's slot length.
+        num_customers (int): The party size of the reservation, counted against the studio's daily capacity.
         notes (str, optional): Any additional notes for the reservation.
     """
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     studio = models.ForeignKey(Studio, on_delete=models.CASCADE)
     date = models.DateField()
-    time = models.TimeField()
+    time = models.TimeField(validators=[validate_whole_minute])
+    duration_minutes = models.PositiveIntegerField(blank=True, validators=[MinValueValidator(1)])
+    num_customers = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     notes = models.TextField(blank=True, null=True)
 
+    objects = ReservationQuerySet.as_manager()
+
     class Meta:
         unique_together = ('studio', 'date', 'time')
+        indexes = [
+            # The unique (studio, date, time) index already serves the per-studio and per-day lookups.
+            models.Index(fields=['customer', 'date', 'time'], name='api_resv_customer_date_idx'),
+        ]
 
     def validate_max_customers_per_day(self):
-        """Validates if the number of customers for a reservation exceeds the maximum number of customers allowed
-        per day for the associated studio.
+        """Claims this reservation's party size on the studio's daily occupancy ledger.
+
+        The check and the claim are a single conditional UPDATE on the (studio, date) ledger row, so the cost does
+        not depend on the number of bookings that day and concurrent writers cannot both pass it. It must run
+        inside the transaction that inserts or updates the reservation.
 
         Args:
             self (Reservation): The Reservation object to validate.
@@ -81,17 +195,50 @@ class Reservation(models.Model):
         Returns:
             None
         """
-        max_customers_per_day = self.studio.max_customers_per_day
-        date = self.date
-        num_customers = Reservation.objects.filter(studio=self.studio, date=date).aggregate(Sum('num_customers'))[
-                            'num_customers__sum'] or 0
-        if num_customers + self.num_customers > max_customers_per_day:
+        if not DailyOccupancy.reserve(self.studio, self.date, self.num_customers):
             raise ValidationError(
-                f"The maximum number of customers for {date} at {self.studio} has already been reached.")
+                f"The maximum number of customers for {self.date} at {self.studio} has already been reached.")
+
+    def validate_opening_hours(self):
+        """Checks the reservation starts on a whole minute and starts and ends within the opening hours of its studio.
+
+        Raises:
+            ValidationError: If the reservation does not start on a whole minute, or starts before the studio opens
+                             or ends after it closes.
+
+        Returns:
+            None
+        """
+        validate_whole_minute(self.time)
+        if not self.studio.is_open(self.time, self.duration_minutes):
+            raise ValidationError(
+                f"{self.studio} is open from {self.studio.opens_at:%H:%M} to {self.studio.closes_at:%H:%M}.")
+
+    def validate_no_overlap(self):
+        """Checks the reservation does not overlap another reservation of the same studio and day.
+
+        It must run after `validate_max_customers_per_day`, whose claim on the day's ledger row keeps concurrent
+        writers of the same day out until this transaction ends.
+
+        Raises:
+            ValidationError: With code `overlap`, if the reservation overlaps another one.
+
+        Returns:
+            None
+        """
+        if Reservation.objects.exclude(pk=self.pk).overlaps(self.studio_id, self.date, self.time,
+                                                            self.duration_minutes):
+            raise ValidationError(f"The reservation overlaps another booking at {self.studio} on {self.date}.",
+                                  code='overlap')
 
     def save(self, *args, **kwargs):
-        """Saves the Reservation object after validating if the maximum number of customers allowed per day for
-        the associated studio is not exceeded.
+        """Saves the Reservation object after validating that it falls within the studio's opening hours, that the
+        maximum number of customers allowed per day for the associated studio is not exceeded and that it does not
+        overlap another reservation. A reservation without a duration lasts one slot of its studio.
+
+        When an existing reservation is saved, the party size it previously held is released from the ledger
+        before the new one is claimed, in the same transaction as the write, which also bumps the reservation list
+        versions of the studios and customers involved.
 
         Args:
             self (Reservation): The Reservation object to save.
@@ -99,14 +246,210 @@ class Reservation(models.Model):
             **kwargs: Optional keyword arguments to pass to the parent save method.
 
         Raises:
-            ValidationError: If the number of customers for the reservation exceeds the maximum number of customers
-                             allowed per day.
+            ValidationError: If the reservation is outside opening hours, the number of customers for the
+                             reservation exceeds the maximum number of customers allowed per day, or the
+                             reservation overlaps another one.
+
+        Returns:
+            None
+        """
+        if self.duration_minutes is None:
+            self.duration_minutes = self.studio.slot_minutes
+        self.validate_opening_hours()
+        with transaction.atomic():
+            studio_ids, customer_ids = {self.studio_id}, {self.customer_id}
+            if self.pk is not None:
+                previous = Reservation.objects.filter(pk=self.pk).values(
+                    'studio_id', 'customer_id', 'date', 'num_customers').first()
+                if previous:
+                    DailyOccupancy.release(previous['studio_id'], previous['date'], previous['num_customers'])
+                    studio_ids.add(previous['studio_id'])
+                    customer_ids.add(previous['customer_id'])
+            self.validate_max_customers_per_day()
+            self.validate_no_overlap()
+            super().save(*args, **kwargs)
+            bump_reservation_versions(studio_ids, customer_ids)
+
+
+class DailyOccupancy(models.Model):
+    """DailyOccupancy Model.
+
+    It is the occupancy ledger of a studio for one day, kept in step with the reservations of that day so the
+    daily capacity can be enforced, and the studio calendar served, without scanning them. The
+    `rebuild_occupancy` command rebuilds it from the reservations.
+
+    Attributes:
+        studio (Studio): The studio the ledger row belongs to.
+        date (date): The day the ledger row accounts for.
+        num_customers (int): The total party size of the studio's reservations on that day.
+        num_reservations (int): The number of the studio's reservations on that day.
+    """
+    studio = models.ForeignKey(Studio, on_delete=models.CASCADE, related_name='occupancy')
+    date = models.DateField()
+    num_customers = models.PositiveIntegerField(default=0)
+    num_reservations = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('studio', 'date')
+
+    @classmethod
+    def reserve(cls, studio, date, num_customers, num_reservations=1):
+        """Adds reservations to the ledger of a studio's day if their party size still fits the daily capacity.
+
+        Args:
+            studio (Studio): The studio to reserve capacity for.
+            date (date): The day to reserve capacity on.
+            num_customers (int): The party size to add.
+            num_reservations (int): The number of reservations the party size belongs to.
+
+        Returns:
+            bool: True if the capacity was reserved, False if the day is already too full.
+        """
+        if num_customers > studio.max_customers_per_day:
+            return False
+        cls.objects.get_or_create(studio=studio, date=date)
+        return cls.objects.filter(
+            studio=studio, date=date, num_customers__lte=studio.max_customers_per_day - num_customers,
+        ).update(num_customers=F('num_customers') + num_customers,
+                 num_reservations=F('num_reservations') + num_reservations) == 1
+
+    @classmethod
+    def lock_days(cls, days, batch_size=100):
+        """Inserts the missing ledger rows of some studio days and locks them until the current transaction ends.
+
+        A writer that reads the bookings of a day after locking its row sees every booking committed before, and
+        no other writer of the day can book until it is done.
+
+        Args:
+            days (iterable): The (studio ID, date) pairs to lock.
+            batch_size (int): The number of days locked per statement.
 
         Returns:
             None
         """
-        self.validate_max_customers_per_day()
-        super().save(*args, **kwargs)
+        days = list(days)
+        cls.objects.bulk_create([cls(studio_id=studio_id, date=date) for studio_id, date in days],
+                                ignore_conflicts=True, batch_size=batch_size)
+        for start in range(0, len(days), batch_size):
+            cls.objects.filter(cls._days(days[start:start + batch_size])).update(num_customers=F('num_customers'))
+
+    @classmethod
+    def reserve_many(cls, claims, batch_size=100):
+        """Adds reservations to the ledgers of many studio days at once, keeping them only on the days they fit.
+
+        The claims are made in a fixed number of statements per batch of days, however many days there are: the
+        missing ledger rows are inserted, the party sizes added to every day, and taken back from the days that
+        went over their studio's daily capacity. It must run inside the transaction that inserts the reservations,
+        so no other transaction sees a day over capacity; a concurrent writer of the same day waits for it.
+
+        Args:
+            claims (dict): The party size and number of reservations to add, keyed by (studio ID, date).
+            batch_size (int): The number of days claimed per statement.
+
+        Returns:
+            set: The (studio ID, date) pairs whose claim did not fit and was not made.
+        """
+        days = list(claims)
+        cls.objects.bulk_create([cls(studio_id=studio_id, date=date) for studio_id, date in days],
+                                ignore_conflicts=True, batch_size=batch_size)
+        full = set()
+        with transaction.atomic():
+            for start in range(0, len(days), batch_size):
+                batch = days[start:start + batch_size]
+                cls._add(batch, claims, 1)
+                over = set(cls.objects.filter(
+                    cls._days(batch), num_customers__gt=F('studio__max_customers_per_day'),
+                ).values_list('studio_id', 'date'))
+                if over:
+                    cls._add(over, claims, -1)
+                    full |= over
+        return full
+
+    @staticmethod
+    def _group(days, key=lambda day: None):
+        """Groups days by studio and a key, returning the dates of each (studio ID, key) pair."""
+        groups = defaultdict(list)
+        for studio_id, date in days:
+            groups[(studio_id, key((studio_id, date)))].append(date)
+        return groups
+
+    @classmethod
+    def _days(cls, days):
+        return reduce(or_, (Q(studio_id=studio_id, date__in=dates)
+                            for (studio_id, _), dates in cls._group(days).items()))
+
+    @classmethod
+    def _add(cls, days, claims, sign):
+        """Adds, or with a negative sign takes back, the claims of some days in one UPDATE.
+
+        Days of a studio with equal claims share one CASE branch, so a series of equal bookings stays one branch.
+        """
+        def delta(index):
+            return Case(*(When(studio_id=studio_id, date__in=dates, then=Value(sign * value))
+                          for (studio_id, value), dates in cls._group(days, lambda day: claims[day][index]).items()),
+                        default=Value(0))
+        cls.objects.filter(cls._days(days)).update(num_customers=F('num_customers') + delta(0),
+                                                   num_reservations=F('num_reservations') + delta(1))
+
+    @classmethod
+    def release(cls, studio_id, date, num_customers, num_reservations=1):
+        """Gives the party size of reservations back to the ledger of a studio's day.
+
+        Args:
+            studio_id (int): The ID of the studio to release capacity for.
+            date (date): The day to release capacity on.
+            num_customers (int): The party size to remove.
+            num_reservations (int): The number of reservations the party size belongs to.
+
+        Returns:
+            None
+        """
+        cls.objects.filter(
+            studio_id=studio_id, date=date, num_customers__gte=num_customers, num_reservations__gte=num_reservations,
+        ).update(num_customers=F('num_customers') - num_customers,
+                 num_reservations=F('num_reservations') - num_reservations)
+
+    @classmethod
+    def rebuild(cls, studio_ids=None):
+        """Rebuilds the ledger rows of some or all studios from their reservations, in one transaction.
+
+        Args:
+            studio_ids (iterable): The IDs of the studios to rebuild, or None for all studios.
+
+        Returns:
+            int: The number of ledger rows written.
+        """
+        ledger, reservations = cls.objects.all(), Reservation.objects.all()
+        if studio_ids is not None:
+            ledger = ledger.filter(studio_id__in=studio_ids)
+            reservations = reservations.filter(studio_id__in=studio_ids)
+        totals = reservations.order_by().values('studio_id', 'date').annotate(
+            total=models.Sum('num_customers'), count=models.Count('id'))
+        with transaction.atomic():
+            ledger.delete()
+            return len(cls.objects.bulk_create(
+                (cls(studio_id=row['studio_id'], date=row['date'], num_customers=row['total'],
+                     num_reservations=row['count']) for row in totals.iterator()),
+                batch_size=1000))
+
+
+class StudioTrigram(models.Model):
+    """StudioTrigram Model.
+
+    It is one posting of the trigram index `api.search` finds studios by when FTS5 is unavailable or a query has
+    a typo: a trigram of a word of a studio's name. It is kept in step with the studio names as they are saved;
+    the `rebuild_search_index` command rebuilds it.
+
+    Attributes:
+        trigram (str): Three characters of a normalized word, padded with spaces at the word's edges.
+        studio (Studio): The studio whose name contains the trigram.
+    """
+    trigram = models.CharField(max_length=3)
+    studio = models.ForeignKey(Studio, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        # Serves the search, which reads the postings of a few trigrams without touching the table itself.
+        unique_together = ('trigram', 'studio')
 
 
 class StudioEmployee(models.Model):
@@ -121,3 +464,95 @@ class StudioEmployee(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     studio = models.ForeignKey(Studio, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Covers the studio IDs of an employee, so scoping their reservations never reads the table itself.
+            models.Index(fields=['user', 'studio'], name='api_studioemp_user_studio_idx'),
+        ]
+
+
+class WaitlistEntryQuerySet(ScopedQuerySet):
+    """QuerySet for WaitlistEntry objects with role-based scoping."""
+
+
+class WaitlistEntry(models.Model):
+    """WaitlistEntry Model.
+
+    It is a customer's place in the first-in, first-out waitlist of a studio's day. When reservations of that day
+    are cancelled, the entries are promoted into the freed capacity in the order they were created, and deleted
+    once promoted. Entries are scoped to users like reservations are.
+
+    Attributes:
+        studio (Studio): The studio the customer waits for.
+        date (date): The day the customer waits for.
+        customer (User): The customer who is waiting.
+        num_customers (int): The party size to reserve for.
+        time (time, optional): The preferred slot; any free slot of the day is taken when it is booked.
+        notes (str, optional): Notes copied onto the reservation.
+        created_at (datetime): When the customer joined the waitlist.
+    """
+    studio = models.ForeignKey(Studio, on_delete=models.CASCADE, related_name='waitlist')
+    date = models.DateField()
+    customer = models.ForeignKey(User, on_delete=models.CASCADE)
+    num_customers = models.PositiveIntegerField(default=1)
+    time = models.TimeField(blank=True, null=True, validators=[validate_whole_minute])
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = WaitlistEntryQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('studio', 'date', 'customer')
+        indexes = [
+            # Serves the promotion order of a day; the unique index leads with the same columns but ends in the
+            # customer rather than the ID.
+            models.Index(fields=['studio', 'date', 'id'], name='api_waitlist_day_order_idx'),
+            models.Index(fields=['customer', 'date'], name='api_waitlist_customer_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Job Model.
+
+    It is a unit of background work in the job queue of `api.jobs`: the registered name of the function that
+    runs it, its arguments and its progress. Jobs that succeed are deleted; jobs that keep failing are kept as
+    failed, with their last error.
+
+    Attributes:
+        name (str): The name the job function was registered under.
+        payload (dict): The keyword arguments of the job function.
+        status (str): Pending, running or failed.
+        dedupe_key (str, optional): While a job with this key is pending, enqueuing another one is a no-op; a unique
+                                    constraint keeps concurrent writers from both queuing one.
+        attempts (int): How many times the job was claimed.
+        run_at (datetime): The earliest time the job may run.
+        locked_at (datetime, optional): When a worker claimed the job.
+        locked_by (str, optional): The claim token of the worker running the job.
+        last_error (str, optional): The traceback of the last failed attempt.
+        created_at (datetime): When the job was enqueued.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    dedupe_key = models.CharField(max_length=200, blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=64, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Serves the claim query, which takes the due pending jobs in run_at order.
+            models.Index(fields=['status', 'run_at'], name='api_job_claim_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=Q(status='pending'),
+                                    name='api_job_pending_dedupe_uniq'),
+        ]
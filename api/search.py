@@ -0,0 +1,185 @@
+"""Module for finding studios by name as the user types.
+
+Names are indexed twice. On SQLite builds with FTS5, the `api_studio_fts` full-text table, which triggers keep in
+step with `api_studio`, answers the words typed so far as prefixes, ranked by bm25. On every backend, the
+`StudioTrigram` table holds the trigrams of every word of every name; it answers the same prefixes where FTS5 is
+unavailable, and tolerates typos by ranking studios on the share of the query's trigrams their name contains.
+
+A search reads only the postings of the terms it was given, through an index, at most `BOOKING_SEARCH_CANDIDATES`
+of them per index and term, ranks at most as many candidate studios and returns at most
+`BOOKING_SEARCH_MAX_RESULTS` of them, so its cost is bounded however many studios there are and however common the
+query.
+"""
+
+import math
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Studio, StudioTrigram
+
+FTS_TABLE = 'api_studio_fts'
+WORD = re.compile(r'\w+')
+
+_fts_tables = {}
+
+
+def words(text):
+    """Splits text into lowercase words without diacritics, as both indexes tokenize names."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return WORD.findall(''.join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+def _word_trigrams(word, complete=True):
+    padded = f'  {word} ' if complete else f'  {word}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_trigrams(name):
+    """Returns the trigrams indexed for a studio name.
+
+    Args:
+        name (str): The studio name.
+
+    Returns:
+        set: The trigrams of every word of the name, each word padded with two spaces before and one after.
+    """
+    return set().union(*(_word_trigrams(word) for word in words(name)))
+
+
+def query_trigrams(query):
+    """Returns the trigrams of a query, the last word of which may still be incomplete.
+
+    The last word is left unpadded at its end, so the trigrams of a prefix are all found in the words it starts.
+
+    Args:
+        query (str): The text typed so far.
+
+    Returns:
+        set: The trigrams to look up.
+    """
+    terms = words(query)
+    return set().union(*(_word_trigrams(word, complete=i < len(terms) - 1) for i, word in enumerate(terms)))
+
+
+def index_names(studios):
+    """Replaces the trigram postings of some studios with the trigrams of their current names.
+
+    Args:
+        studios (iterable): The Studio objects whose names to index.
+
+    Returns:
+        None
+    """
+    studios = list(studios)
+    with transaction.atomic():
+        StudioTrigram.objects.filter(studio__in=studios).delete()
+        StudioTrigram.objects.bulk_create(
+            [StudioTrigram(studio=studio, trigram=trigram) for studio in studios for trigram in name_trigrams(
+                studio.name)], batch_size=1000)
+
+
+def has_fts():
+    """Returns whether the database has the FTS5 index of studio names, checking once per connection alias."""
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[connection.alias]
+
+
+def rebuild_index(batch_size=1000):
+    """Rebuilds the trigram index, and the FTS5 index where there is one, from the studio names.
+
+    Args:
+        batch_size (int): The number of studios read and indexed at a time.
+
+    Returns:
+        int: The number of trigram postings written.
+    """
+    written = 0
+    with transaction.atomic():
+        StudioTrigram.objects.all().delete()
+        postings = []
+        for studio_id, name in Studio.objects.values_list('id', 'name').iterator(chunk_size=batch_size):
+            postings.extend(StudioTrigram(studio_id=studio_id, trigram=trigram) for trigram in name_trigrams(name))
+            if len(postings) >= batch_size:
+                written += len(StudioTrigram.objects.bulk_create(postings, batch_size=batch_size))
+                postings = []
+        written += len(StudioTrigram.objects.bulk_create(postings, batch_size=batch_size))
+        if has_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return written
+
+
+def _fts_search(terms, limit):
+    """Returns the IDs of the studios whose names have words starting with every term, best bm25 rank first.
+
+    Only the first `BOOKING_SEARCH_CANDIDATES` matches are ranked, so a prefix shared by many names costs no more
+    than a rare one.
+    """
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s) '
+            f'ORDER BY rank LIMIT %s', [match, settings.BOOKING_SEARCH_CANDIDATES, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _trigram_search(trigrams, limit, exclude=()):
+    """Returns the IDs of the studios sharing the most trigrams with a query, down to `BOOKING_SEARCH_SIMILARITY`.
+
+    A trigram with more than `BOOKING_SEARCH_CANDIDATES` postings, such as those of a word most names share, tells
+    little about which studio is meant, and only its first postings are read. The candidates are taken from the
+    postings read, those holding the most rare trigrams first, and at most `BOOKING_SEARCH_CANDIDATES` of them are
+    then ranked on every trigram of the query, each looked up in the (trigram, studio) index.
+    """
+    shared = math.ceil(len(trigrams) * settings.BOOKING_SEARCH_SIMILARITY)
+    candidates = settings.BOOKING_SEARCH_CANDIDATES
+    table = connection.ops.quote_name(StudioTrigram._meta.db_table)
+    trigrams = sorted(trigrams)
+    bounded = [f'SELECT studio_id FROM {table} WHERE trigram = %s ORDER BY studio_id LIMIT %s' for _ in trigrams]
+    params = [value for trigram in trigrams for value in (trigram, candidates)]
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(
+            f'SELECT %s, COUNT(*) FROM ({query}) AS t{i}' for i, query in enumerate(bounded)),
+            [value for trigram in trigrams for value in (trigram, trigram, candidates + 1)])
+        common = {trigram for trigram, count in cursor.fetchall() if count > candidates}
+        postings = ' UNION ALL '.join(
+            f'SELECT studio_id, {0 if trigram in common else 1} AS rare FROM ({query}) AS t{i}'
+            for i, (trigram, query) in enumerate(zip(trigrams, bounded)))
+        excluded = f"AND studio_id NOT IN ({', '.join(['%s'] * len(exclude))})" if exclude else ''
+        cursor.execute(
+            f"SELECT studio_id FROM {table} WHERE trigram IN ({', '.join(['%s'] * len(trigrams))}) AND studio_id IN ("
+            f'SELECT studio_id FROM ({postings}) AS postings GROUP BY studio_id '
+            f'ORDER BY SUM(rare) DESC, COUNT(*) DESC, studio_id LIMIT %s) {excluded} '
+            f'GROUP BY studio_id HAVING COUNT(*) >= %s ORDER BY COUNT(*) DESC, studio_id LIMIT %s',
+            [*trigrams, *params, candidates, *exclude, shared, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_studios(query, limit=None, queryset=None):
+    """Finds the studios whose names best match a query, best match first.
+
+    The studios whose names have words starting with every word of the query come first, found in the FTS5 index
+    where there is one. The remaining places are filled with the studios sharing the most trigrams with it, which
+    catches prefixes on backends without FTS5, and typos everywhere.
+
+    Args:
+        query (str): The text typed so far.
+        limit (int): The most studios to return; at most, and by default, `BOOKING_SEARCH_MAX_RESULTS`.
+        queryset (QuerySet): The studios to load the matches from, for example with their relations prefetched.
+
+    Returns:
+        list: The matching Studio objects, in rank order.
+    """
+    limit = min(limit or settings.BOOKING_SEARCH_MAX_RESULTS, settings.BOOKING_SEARCH_MAX_RESULTS)
+    terms, trigrams = words(query), query_trigrams(query)
+    if not terms:
+        return []
+    ids = _fts_search(terms, limit) if has_fts() else []
+    if len(ids) < limit:
+        ids += _trigram_search(trigrams, limit - len(ids), exclude=ids)
+    studios = (Studio.objects.all() if queryset is None else queryset).in_bulk(ids)
+    return [studios[studio_id] for studio_id in ids if studio_id in studios]
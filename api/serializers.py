@@ -1,14 +1,25 @@
-from rest_framework.serializers import ModelSerializer, ValidationError, IntegerField
-from .models import Studio, Reservation, StudioEmployee
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.serializers import ModelSerializer, Serializer, ValidationError, IntegerField, DateField, \
+    PrimaryKeyRelatedField, CharField
+from .models import Studio, Reservation, StudioEmployee, WaitlistEntry
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from booking.instrumentation import TimedSerializerMixin
+from booking.shaping import ShapedSerializerMixin
+from users.authentication import RoleRefreshToken
+from users.models import User
+from users.serializers import UserSerializer
 
 
-class StudioSerializer(ModelSerializer):
+class StudioSerializer(ShapedSerializerMixin, TimedSerializerMixin, ModelSerializer):
     """A serializer class to convert the Studio model object into JSON format and vice versa.
 
     Attributes:
         model (Studio): The Studio model object that will be serialized.
         fields (tuple): A tuple of fields to include in the serialized output. In this case, all fields are included.
+        expandable (dict): The relations `?expand=` may inline: the owner and the employees.
 
     Returns:
         Serialized Studio object in JSON format.
@@ -16,14 +27,37 @@ class StudioSerializer(ModelSerializer):
     class Meta:
         model = Studio
         fields = '__all__'
+        expandable = {'owner': UserSerializer, 'employees': UserSerializer}
+
+    def validate(self, data):
+        """Checks the studio closes after it opens.
+
+        Args:
+            data: A dictionary containing the deserialized studio.
+
+        Returns:
+            The validated data dictionary.
+
+        Raises:
+            ValidationError: If the studio's opening hours are empty.
+        """
+        opens_at = data.get('opens_at', getattr(self.instance, 'opens_at', settings.BOOKING_DAY_START))
+        closes_at = data.get('closes_at', getattr(self.instance, 'closes_at', settings.BOOKING_DAY_END))
+        if closes_at <= opens_at:
+            raise ValidationError("A studio must close after it opens.")
+        return data
 
 
-class ReservationSerializer(ModelSerializer):
+class ReservationSerializer(ShapedSerializerMixin, TimedSerializerMixin, ModelSerializer):
     """A serializer class to convert the Reservation model object into JSON format and vice versa.
 
     Attributes:
         model (Reservation): The Reservation model object that will be serialized.
         fields (tuple): A tuple of fields to include in the serialized output. In this case, all fields are included.
+        expandable (dict): The relations `?expand=` may inline: the studio and the customer.
+        validators (list): Empty, so a taken slot is not refused as a plain validation error: the model's overlap
+                           check, or the unique constraint under a concurrent writer, has the view answer it with a
+                           409 and alternative slots.
 
     Returns:
         Serialized Reservation object in JSON format.
@@ -31,6 +65,202 @@ class ReservationSerializer(ModelSerializer):
     class Meta:
         model = Reservation
         fields = '__all__'
+        expandable = {'studio': StudioSerializer, 'customer': UserSerializer}
+        validators = []
+
+
+class ReservationItemSerializer(ModelSerializer):
+    """A serializer that validates one item of a reservation batch without touching the database.
+
+    The studio and customer are taken as plain IDs and the unique-slot validator is dropped, because the batch is
+    checked against the database as a whole afterwards.
+
+    Attributes:
+        studio (IntegerField): The ID of the studio, validated with the rest of the batch.
+        customer (IntegerField): The ID of the customer, validated with the rest of the batch.
+    """
+    studio = IntegerField(source='studio_id')
+    customer = IntegerField(source='customer_id')
+
+    class Meta:
+        model = Reservation
+        fields = ('studio', 'customer', 'date', 'time', 'duration_minutes', 'num_customers', 'notes')
+        extra_kwargs = {'num_customers': {'default': 1}}
+        validators = []
+
+
+class ReservationSeriesSerializer(ReservationItemSerializer):
+    """Validates a recurring reservation series: a reservation repeated every `every_days` days from its date,
+    until a date or for a number of occurrences.
+
+    Unlike the items of a batch, the studio and customer are checked here, once for the whole series.
+
+    Attributes:
+        studio (PrimaryKeyRelatedField): The studio of every occurrence.
+        customer (PrimaryKeyRelatedField): The customer of every occurrence.
+        every_days (IntegerField): The days between two occurrences, at most a year; weekly by default.
+        until (DateField): The last day an occurrence may fall on. Exclusive with `count`.
+        count (IntegerField): The number of occurrences. Exclusive with `until`.
+
+    Raises:
+        ValidationError: If neither or both of `until` and `count` are given, `until` is before the first date, the
+                         series has more than `BOOKING_SERIES_MAX_OCCURRENCES` occurrences, or its last occurrence
+                         falls more than `BOOKING_SERIES_MAX_DAYS` days after the first or past the last
+                         representable date.
+    """
+    studio = PrimaryKeyRelatedField(queryset=Studio.objects.all())
+    customer = PrimaryKeyRelatedField(queryset=User.objects.all())
+    every_days = IntegerField(default=7, min_value=1, max_value=366)
+    until = DateField(required=False)
+    count = IntegerField(required=False, min_value=1)
+
+    class Meta(ReservationItemSerializer.Meta):
+        fields = ReservationItemSerializer.Meta.fields + ('every_days', 'until', 'count')
+
+    def validate(self, data):
+        """Checks the series is bounded by exactly one of `until` and `count`, and not too long or too far out.
+
+        Args:
+            data: A dictionary containing the deserialized series.
+
+        Returns:
+            The validated data dictionary, with `count` set.
+
+        Raises:
+            ValidationError: If the series is unbounded, bounded twice, ends before it starts, is too long, or ends
+                             too far after its first date.
+        """
+        if ('until' in data) == ('count' in data):
+            raise ValidationError("Give exactly one of until and count.")
+        if 'until' in data:
+            if data['until'] < data['date']:
+                raise ValidationError("The series must not end before its first date.")
+            data['count'] = (data['until'] - data['date']).days // data['every_days'] + 1
+        if data['count'] > settings.BOOKING_SERIES_MAX_OCCURRENCES:
+            raise ValidationError(f"A series may hold at most {settings.BOOKING_SERIES_MAX_OCCURRENCES} occurrences.")
+        span = data['every_days'] * (data['count'] - 1)
+        if span > settings.BOOKING_SERIES_MAX_DAYS:
+            raise ValidationError(
+                f"The last occurrence may fall at most {settings.BOOKING_SERIES_MAX_DAYS} days after the first.")
+        try:
+            data['date'] + timedelta(days=span)
+        except OverflowError:
+            raise ValidationError("The last occurrence falls after the last date that can be booked.")
+        return data
+
+    def occurrences(self):
+        """Expands the validated series into the reservation data of each occurrence, in date order.
+
+        Returns:
+            list: One dictionary per occurrence, as `create_reservations` takes them.
+        """
+        data = self.validated_data
+        return [{
+            'studio_id': data['studio'].id,
+            'customer_id': data['customer'].id,
+            'date': data['date'] + timedelta(days=data['every_days'] * occurrence),
+            'time': data['time'],
+            'duration_minutes': data.get('duration_minutes'),
+            'num_customers': data['num_customers'],
+            'notes': data.get('notes'),
+        } for occurrence in range(data['count'])]
+
+
+class AvailabilityQuerySerializer(Serializer):
+    """Validates the date range of a studio availability query.
+
+    Attributes:
+        start (DateField): The first day of the range. Defaults to today.
+        end (DateField): The last day of the range, inclusive. Defaults to the start date.
+
+    Raises:
+        ValidationError: If the range ends before it starts or spans more days than `BOOKING_AVAILABILITY_MAX_DAYS`.
+    """
+    start = DateField(required=False)
+    end = DateField(required=False)
+
+    def validate(self, data):
+        """Fills in the default dates and checks the range is ordered and bounded.
+
+        Args:
+            data: A dictionary containing the deserialized query parameters.
+
+        Returns:
+            The validated data dictionary, with both `start` and `end` set.
+
+        Raises:
+            ValidationError: If the range ends before it starts or is too wide.
+        """
+        data.setdefault('start', timezone.localdate())
+        data.setdefault('end', data['start'])
+        days = (data['end'] - data['start']).days + 1
+        if days < 1:
+            raise ValidationError("The end date must not be before the start date.")
+        if days > settings.BOOKING_AVAILABILITY_MAX_DAYS:
+            raise ValidationError(f"A query may span at most {settings.BOOKING_AVAILABILITY_MAX_DAYS} days.")
+        return data
+
+
+class StudioSearchQuerySerializer(Serializer):
+    """Validates a studio search query.
+
+    Attributes:
+        q (CharField): The text typed so far, at least `BOOKING_SEARCH_MIN_LENGTH` characters long.
+        limit (IntegerField): The most studios to return. Defaults to, and may not exceed,
+                              `BOOKING_SEARCH_MAX_RESULTS`.
+    """
+    q = CharField(min_length=settings.BOOKING_SEARCH_MIN_LENGTH, max_length=100)
+    limit = IntegerField(required=False, min_value=1, max_value=settings.BOOKING_SEARCH_MAX_RESULTS)
+
+
+class CalendarQuerySerializer(Serializer):
+    """Validates the month of a studio calendar query.
+
+    Attributes:
+        month (DateField): The month, as `YYYY-MM`, parsed to its first day. Defaults to the current month.
+    """
+    month = DateField(required=False, input_formats=['%Y-%m'])
+
+    def validate(self, data):
+        """Fills in the default month.
+
+        Args:
+            data: A dictionary containing the deserialized query parameters.
+
+        Returns:
+            The validated data dictionary, with `month` set to the first day of the month.
+        """
+        data.setdefault('month', timezone.localdate().replace(day=1))
+        return data
+
+
+class WaitlistEntrySerializer(ModelSerializer):
+    """A serializer for the waitlist entries of the requesting customer.
+
+    The customer is the requesting user, and a customer waits at most once per studio and day, which is checked
+    when the entry is saved.
+    """
+    class Meta:
+        model = WaitlistEntry
+        fields = ('id', 'studio', 'date', 'time', 'num_customers', 'notes', 'customer', 'created_at')
+        read_only_fields = ('customer', 'created_at')
+        validators = []
+
+    def validate_date(self, value):
+        """Checks the day has not passed.
+
+        Args:
+            value (date): The day to wait for.
+
+        Returns:
+            The day.
+
+        Raises:
+            ValidationError: If the day is in the past.
+        """
+        if value < timezone.localdate():
+            raise ValidationError("Cannot wait for a day in the past.")
+        return value
 
 
 class StudioEmployeeSerializer(ModelSerializer):
@@ -106,12 +336,14 @@ class StudioTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         Attributes:
             studio_id (IntegerField): The ID of the studio for which to obtain a token.
+            token_class (RoleRefreshToken): The token class, which adds the user's role claims to the tokens.
 
         Methods:
             validate(attrs): Validates the input data and returns the validated data.
             get_token(user): Generates and returns a token for the specified user.
         """
     studio_id = IntegerField(required=True)
+    token_class = RoleRefreshToken
 
     def validate(self, attrs):
         """Validate the studio_id in the request and return the validated data.
@@ -123,7 +355,7 @@ class StudioTokenObtainPairSerializer(TokenObtainPairSerializer):
             A dictionary containing the validated data.
         """
         data = super().validate(attrs)
-        data['studio_id'] = self.validated_data['studio_id']
+        data['studio_id'] = attrs['studio_id']
         return data
 
     @classmethod
@@ -134,8 +366,8 @@ class StudioTokenObtainPairSerializer(TokenObtainPairSerializer):
             user: The user object for which the token is generated.
 
         Returns:
-            token: A JSON Web Token with the studio_id of the user.
+            token: A JSON Web Token with the studio_id of the studio the user works at, or None if there is none.
         """
         token = super().get_token(user)
-        token['studio_id'] = user.studio_employee.studio_id
+        token['studio_id'] = StudioEmployee.objects.filter(user_id=user.id).values_list('studio_id', flat=True).first()
         return token
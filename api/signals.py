@@ -0,0 +1,189 @@
+"""Module for the signal receivers that keep derived api data in step with the models."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from users.authentication import bump_role_version
+from users.models import User
+from .cache import invalidate_studios, bump_reservation_versions
+from .models import Studio, StudioEmployee, Reservation, DailyOccupancy, WaitlistEntry
+from .search import index_names
+from .waitlist import request_promotion
+
+
+@receiver(post_delete, sender=Reservation)
+def release_daily_occupancy(sender, instance, **kwargs):
+    """Gives the party size of a deleted reservation back to its studio's daily occupancy ledger.
+
+    Receiving the signal rather than overriding `Reservation.delete()` also covers queryset and cascade deletes.
+
+    Args:
+        sender (type): The Reservation model class.
+        instance (Reservation): The reservation that was deleted.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    DailyOccupancy.release(instance.studio_id, instance.date, instance.num_customers)
+
+
+@receiver(post_delete, sender=Reservation)
+def bump_deleted_reservation_versions(sender, instance, **kwargs):
+    """Bumps the reservation list versions of a deleted reservation's studio and customer, in the delete's transaction.
+
+    Args:
+        sender (type): The Reservation model class.
+        instance (Reservation): The reservation that was deleted.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    bump_reservation_versions([instance.studio_id], [instance.customer_id])
+
+
+@receiver(post_delete, sender=Reservation)
+def promote_waitlist_on_cancel(sender, instance, **kwargs):
+    """Queues the promotion of waiting customers into the capacity a deleted reservation freed.
+
+    The job is queued in the transaction of the delete, so it runs once the delete commits.
+
+    Args:
+        sender (type): The Reservation model class.
+        instance (Reservation): The reservation that was deleted.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    request_promotion(instance.studio_id, instance.date)
+
+
+@receiver(post_save, sender=WaitlistEntry)
+def promote_new_waitlist_entry(sender, instance, created, **kwargs):
+    """Queues the promotion of the day of a new waitlist entry, in case it has capacity already.
+
+    Args:
+        sender (type): The WaitlistEntry model class.
+        instance (WaitlistEntry): The entry that was saved.
+        created (bool): Whether the entry was created.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    if created:
+        request_promotion(instance.studio_id, instance.date)
+
+
+@receiver(pre_save, sender=Studio)
+@receiver(pre_save, sender=StudioEmployee)
+def invalidate_previous_role_claims(sender, instance, **kwargs):
+    """Bumps the role version of the user a studio or studio employee is about to be taken away from.
+
+    Args:
+        sender (type): The Studio or StudioEmployee model class.
+        instance (Studio | StudioEmployee): The object about to be saved.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    if instance.pk is None:
+        return
+    user_field = 'owner_id' if sender is Studio else 'user_id'
+    previous = sender.objects.filter(pk=instance.pk).values_list(user_field, flat=True).first()
+    if previous is not None and previous != getattr(instance, user_field):
+        bump_role_version(previous)
+
+
+@receiver(post_save, sender=Studio)
+@receiver(post_delete, sender=Studio)
+def invalidate_owner_role_claims(sender, instance, **kwargs):
+    """Bumps the role version of a studio's owner when the studio is saved or deleted.
+
+    Args:
+        sender (type): The Studio model class.
+        instance (Studio): The studio that was saved or deleted.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    bump_role_version(instance.owner_id)
+
+
+@receiver(post_save, sender=StudioEmployee)
+@receiver(post_delete, sender=StudioEmployee)
+def invalidate_employee_role_claims(sender, instance, **kwargs):
+    """Bumps the role version of an employee when they are assigned to or removed from a studio.
+
+    Args:
+        sender (type): The StudioEmployee model class.
+        instance (StudioEmployee): The assignment that was saved or deleted.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    bump_role_version(instance.user_id)
+
+
+@receiver(post_save, sender=Studio)
+def index_studio_name(sender, instance, update_fields=None, **kwargs):
+    """Indexes the trigrams of a saved studio's name, unless the save left the name out.
+
+    The postings of a deleted studio go with it through the cascade.
+
+    Args:
+        sender (type): The Studio model class.
+        instance (Studio): The studio that was saved.
+        update_fields (frozenset): The fields the save was restricted to, if any.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    if update_fields is None or 'name' in update_fields:
+        index_names([instance])
+
+
+@receiver(post_save, sender=Studio)
+@receiver(post_delete, sender=Studio)
+@receiver(post_save, sender=StudioEmployee)
+@receiver(post_delete, sender=StudioEmployee)
+@receiver(m2m_changed, sender=Studio.employees.through)
+def invalidate_studio_cache(sender, **kwargs):
+    """Invalidates the cached studio representations when a studio or its employees change.
+
+    The cache is invalidated once the change commits: invalidated any earlier, a concurrent reader could cache the
+    rows from before the change again and keep serving them until they expire.
+
+    Args:
+        sender (type): The model class that changed.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(invalidate_studios)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_expanded_users(sender, instance, **kwargs):
+    """Invalidates the cached studio representations when a studio owner or employee changes, since studios
+    expanded with `?expand=owner,employees` inline them. Like `invalidate_studio_cache`, it waits for the commit.
+
+    Args:
+        sender (type): The User model class.
+        instance (User): The user that changed.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    if instance.is_studio_owner or instance.is_employee:
+        transaction.on_commit(invalidate_studios)
@@ -1,3 +1,1200 @@
-from django.test import TestCase
+import base64
+import json
+import logging
+import os
+import re
+import runpy
+from io import StringIO
+from datetime import date, time, timedelta
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.db import connection, connections, transaction, IntegrityError
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.models import TokenUser
+
+from booking.serialization import values_serializer
+from booking.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from users.authentication import ClaimsJWTAuthentication, RoleRefreshToken
+from users.models import User
+from .bulk import create_reservations
+from .cache import bump_reservation_versions, reservation_versions, studio_cache_version
+from .errors import CAPACITY_ERROR, CONFLICT_ERROR
+from .holds import SlotUnavailable, place_hold, release_hold
+from .intervals import DaySchedule
+from .jobs import job, enqueue, claim_jobs, run_jobs
+from .models import Studio, Reservation, StudioEmployee, DailyOccupancy, StudioTrigram, Job, WaitlistEntry
+from .search import rebuild_index, search_studios
+from .serializers import StudioSerializer, ReservationSerializer
+from .waitlist import WaitlistChanged, promote_waitlist
+
+FULL_SCAN = {
+    # SQLite reports a full read of a table or index as "SCAN <table>" and PostgreSQL as "Seq Scan on <table>".
+    'sqlite': re.compile(r'\bSCAN (\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+class QueryPlanTests(TestCase):
+    """Checks that the hot queries of the api views are answered from indexes rather than full table scans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.employee = User.objects.create_user(username='employee', password='secret', is_employee=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+        StudioEmployee.objects.create(studio=cls.studio, user=cls.employee)
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=date(2024, 1, 1), time=time(9))
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheapest to read sequentially, which would hide whether an index is usable.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertIndexed(self, queryset):
+        """Fails if the plan of a queryset reads any table without an index."""
+        plan = queryset.explain()
+        pattern = FULL_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f'No plan check for the {connection.vendor} backend.')
+        scans = pattern.findall(plan)
+        self.assertEqual(scans, [], f'Full table scan in query plan:\n{plan}')
+
+    def test_customer_reservations(self):
+        self.assertIndexed(Reservation.objects.visible_to(self.customer).order_by('date', 'time', 'id'))
+
+    def test_employee_reservations(self):
+        self.assertIndexed(Reservation.objects.visible_to(self.employee).order_by('date', 'time', 'id'))
+
+    def test_owner_reservations(self):
+        self.assertIndexed(Reservation.objects.visible_to(self.owner).order_by('date', 'time', 'id'))
+
+    def test_reservation_detail(self):
+        reservation = Reservation.objects.get()
+        self.assertIndexed(Reservation.objects.visible_to(self.owner).filter(pk=reservation.pk))
+
+    def test_studio_day_reservations(self):
+        days = (date(2024, 1, 1), date(2024, 1, 31))
+        self.assertIndexed(Reservation.objects.filter(studio=self.studio, date__range=days).values_list(
+            'date', 'time', 'duration_minutes'))
+
+    def test_reservation_overlap_check(self):
+        day = Reservation.objects.filter(studio=self.studio, date=date(2024, 1, 1))
+        self.assertIndexed(day.filter(time__gte=time(10), time__lt=time(11)))
+        self.assertIndexed(day.filter(time__lt=time(10)).order_by('-time').values_list('time', 'duration_minutes'))
+
+    def test_studio_day_occupancy(self):
+        days = (date(2024, 1, 1), date(2024, 1, 31))
+        self.assertIndexed(DailyOccupancy.objects.filter(studio=self.studio, date__range=days))
+
+    def test_owner_studio_employees(self):
+        self.assertIndexed(StudioEmployee.objects.filter(studio__owner_id=self.owner.id).select_related('studio'))
+
+    def test_employee_studios(self):
+        self.assertIndexed(StudioEmployee.objects.filter(user_id=self.employee.id).values('studio_id'))
+
+    def test_studio_calendar(self):
+        days = (date(2024, 1, 1), date(2024, 1, 31))
+        self.assertIndexed(DailyOccupancy.objects.filter(studio=self.studio, date__range=days).values_list(
+            'date', 'num_reservations', 'num_customers'))
+
+    def test_studio_trigram_postings(self):
+        self.assertIndexed(StudioTrigram.objects.filter(trigram='stu').order_by('studio_id').values_list('studio_id'))
+
+
+class OccupancyLedgerTests(TestCase):
+    """Checks that the daily occupancy ledger follows the reservations of a studio through every write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, max_customers_per_day=5)
+        cls.day = date(2030, 1, 7)
+
+    def reserve(self, at, num_customers=1, day=None):
+        return Reservation.objects.create(customer=self.customer, studio=self.studio, date=day or self.day,
+                                          time=time(at), num_customers=num_customers)
+
+    def assertLedger(self, day, num_customers, num_reservations):
+        ledger = DailyOccupancy.objects.get(studio=self.studio, date=day)
+        self.assertEqual((ledger.num_customers, ledger.num_reservations), (num_customers, num_reservations))
+
+    def test_reserve_up_to_capacity(self):
+        self.reserve(9, num_customers=3)
+        self.reserve(10, num_customers=2)
+        self.assertLedger(self.day, 5, 2)
+        self.assertFalse(DailyOccupancy.reserve(self.studio, self.day, 1))
+        self.assertLedger(self.day, 5, 2)
+
+    def test_capacity_overrun_is_refused(self):
+        self.reserve(9, num_customers=4)
+        with self.assertRaises(ValidationError):
+            self.reserve(10, num_customers=2)
+        self.assertLedger(self.day, 4, 1)
+        self.assertFalse(Reservation.objects.filter(time=time(10)).exists())
+
+    def test_update_releases_previous_party(self):
+        reservation = self.reserve(9, num_customers=4)
+        reservation.num_customers = 5
+        reservation.save()
+        self.assertLedger(self.day, 5, 1)
+        reservation.num_customers = 2
+        reservation.save()
+        self.assertLedger(self.day, 2, 1)
+
+    def test_move_to_another_day(self):
+        reservation = self.reserve(9, num_customers=3)
+        other_day = date(2030, 1, 8)
+        reservation.date = other_day
+        reservation.save()
+        self.assertLedger(self.day, 0, 0)
+        self.assertLedger(other_day, 3, 1)
+
+    def test_delete_releases_party(self):
+        self.reserve(9, num_customers=3)
+        reservation = self.reserve(10, num_customers=2)
+        reservation.delete()
+        self.assertLedger(self.day, 3, 1)
+        Reservation.objects.all().delete()
+        self.assertLedger(self.day, 0, 0)
+
+    def test_release_never_goes_negative(self):
+        self.reserve(9, num_customers=2)
+        DailyOccupancy.release(self.studio.id, self.day, 3)
+        self.assertLedger(self.day, 2, 1)
+
+    def test_rebuild(self):
+        self.reserve(9, num_customers=3)
+        self.reserve(9, num_customers=1, day=date(2030, 1, 8))
+        DailyOccupancy.objects.update(num_customers=0, num_reservations=0)
+        self.assertEqual(DailyOccupancy.rebuild([self.studio.id]), 2)
+        self.assertLedger(self.day, 3, 1)
+        self.assertLedger(date(2030, 1, 8), 1, 1)
+
+    def test_api_rejects_empty_party(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post('/api/reservations/', {
+            'customer': self.customer.id, 'studio': self.studio.id, 'date': self.day, 'time': '09:00',
+            'num_customers': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('num_customers', response.json())
+        self.assertFalse(DailyOccupancy.objects.filter(num_customers__gt=0).exists())
+
+    def test_api_reports_full_day_as_non_field_error(self):
+        self.reserve(9, num_customers=5)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post('/api/reservations/', {
+            'customer': self.customer.id, 'studio': self.studio.id, 'date': self.day, 'time': '10:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['non_field_errors'])
+
+
+class BulkCreateTests(TestCase):
+    """Checks that a bulk create inserts its valid items together and leaves no trace of a batch it rolls back."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, max_customers_per_day=4)
+        cls.day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def item(self, at, num_customers=1, **fields):
+        return {'customer': self.customer.id, 'studio': self.studio.id, 'date': self.day.isoformat(),
+                'time': f'{at:02}:00', 'num_customers': num_customers, **fields}
+
+    def post(self, items):
+        return self.client.post('/api/reservations/bulk/', items, format='json')
+
+    def test_valid_items_are_created_and_invalid_ones_reported(self):
+        response = self.post([self.item(9), self.item(9), self.item(7), self.item(10, num_customers=3),
+                              self.item(11, studio=0)])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 3))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'error', 'error', 'created', 'error'])
+        self.assertIn('studio', body['results'][4]['errors'])
+        self.assertEqual(Reservation.objects.count(), 2)
+        ledger = DailyOccupancy.objects.get(studio=self.studio, date=self.day)
+        self.assertEqual((ledger.num_customers, ledger.num_reservations), (4, 2))
+
+    def test_earlier_item_wins_the_last_capacity(self):
+        body = self.post([self.item(9, num_customers=3), self.item(10, num_customers=2),
+                          self.item(11, num_customers=1)]).json()
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'error', 'created'])
+        self.assertEqual(body['results'][1]['errors'], {'non_field_errors': [CAPACITY_ERROR.format(
+            date=self.day, studio=self.studio)]})
+
+    def test_batch_without_valid_items_is_refused(self):
+        Reservation.objects.create(customer=self.customer, studio=self.studio, date=self.day, time=time(9))
+        response = self.post([self.item(9), self.item(9, num_customers=0)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_failed_insert_rolls_back_the_whole_batch(self):
+        with mock.patch.object(Reservation.objects, 'bulk_create', side_effect=IntegrityError):
+            body = self.post([self.item(9), self.item(10, num_customers=2), self.item(7)]).json()
+        self.assertEqual(body['created'], 0)
+        self.assertEqual(body['results'][0]['errors'], {'non_field_errors': [CONFLICT_ERROR]})
+        self.assertEqual(body['results'][1]['errors'], {'non_field_errors': [CONFLICT_ERROR]})
+        self.assertEqual(Reservation.objects.count(), 0)
+        self.assertFalse(DailyOccupancy.objects.filter(num_customers__gt=0).exists())
+
+
+class SeriesTests(TestCase):
+    """Checks that a series books its free occurrences together and refuses series it cannot expand."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, max_customers_per_day=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def post(self, **fields):
+        return self.client.post('/api/reservations/series/', {
+            'customer': self.customer.id, 'studio': self.studio.id, 'date': '2030-01-07', 'time': '09:00',
+            **fields}, format='json')
+
+    def booked_dates(self):
+        return [day.isoformat() for day in Reservation.objects.order_by('date').values_list('date', flat=True)]
+
+    def test_until_and_count_expand_alike(self):
+        weekly = ['2030-01-07', '2030-01-14', '2030-01-21', '2030-01-28']
+        self.assertEqual(self.post(until='2030-01-30').json()['created'], 4)
+        self.assertEqual(self.booked_dates(), weekly)
+        Reservation.objects.all().delete()
+        self.assertEqual(self.post(count=4).json()['created'], 4)
+        self.assertEqual(self.booked_dates(), weekly)
+        Reservation.objects.all().delete()
+        self.assertEqual(self.post(every_days=1, until='2030-01-07').json()['created'], 1)
+
+    def test_conflicting_occurrences_are_reported(self):
+        Reservation.objects.create(customer=self.customer, studio=self.studio, date=date(2030, 1, 14),
+                                   time=time(9, 30))
+        Reservation.objects.create(customer=self.customer, studio=self.studio, date=date(2030, 1, 21),
+                                   time=time(12), num_customers=2)
+        response = self.post(count=3, num_customers=1)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (1, 2))
+        self.assertEqual([reservation['date'] for reservation in body['reservations']], ['2030-01-07'])
+        self.assertEqual([conflict['date'] for conflict in body['conflicts']], ['2030-01-14', '2030-01-21'])
+        self.assertEqual(body['conflicts'][1]['errors'], {'non_field_errors': [CAPACITY_ERROR.format(
+            date=date(2030, 1, 21), studio=self.studio)]})
+
+        response = self.post(count=2, date='2030-01-14', time='09:30')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['created'], 0)
+
+    def test_failed_insert_books_no_occurrence(self):
+        with mock.patch.object(Reservation.objects, 'bulk_create', side_effect=IntegrityError):
+            response = self.post(count=3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([conflict['errors'] for conflict in response.json()['conflicts']],
+                         [{'non_field_errors': [CONFLICT_ERROR]}] * 3)
+        self.assertEqual(Reservation.objects.count(), 0)
+        self.assertFalse(DailyOccupancy.objects.filter(num_customers__gt=0).exists())
+
+    def test_unbounded_or_unreachable_series_are_refused(self):
+        for fields in ({}, {'count': 2, 'until': '2030-02-01'}, {'until': '2030-01-06'},
+                       {'count': settings.BOOKING_SERIES_MAX_OCCURRENCES + 1}, {'every_days': 0, 'count': 2},
+                       {'every_days': 10 ** 7, 'count': 2}, {'every_days': 30, 'count': 30},
+                       {'every_days': 366, 'count': 2, 'date': '9999-12-01'}):
+            with self.subTest(**fields):
+                self.assertEqual(self.post(**fields).status_code, 400)
+        self.assertFalse(Reservation.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    """Checks that keyset pages split the list exactly on their boundaries and that tampered cursors are not found."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        studios = [Studio.objects.create(name=f'Studio {i}', owner=cls.owner) for i in range(3)]
+        # Reservations of different studios at the same date and time tie on (date, time) and are ordered by ID.
+        for day in (date(2030, 1, 8), date(2030, 1, 7)):
+            for at in (10, 9):
+                for studio in studios:
+                    Reservation.objects.create(customer=cls.customer, studio=studio, date=day, time=time(at))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def walk(self, url):
+        pages = []
+        while url:
+            body = self.client.get(url).json()
+            pages.append([reservation['id'] for reservation in body['results']])
+            url = body['next']
+        return pages
+
+    def test_pages_follow_booking_order_with_ties_broken_by_id(self):
+        expected = list(Reservation.objects.order_by('date', 'time', 'id').values_list('id', flat=True))
+        for page_size in (1, 2, 4, 5, 12, 13):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(f'/api/reservations/?page_size={page_size}')
+                self.assertEqual([id for page in pages for id in page], expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+                self.assertEqual(len(pages), -(-len(expected) // page_size))
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/api/reservations/?page_size=5').json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+
+    def test_tampered_cursor_is_not_found(self):
+        positions = {'/api/reservations/': ['["x", "y", "z"]', '["2030-01-07", "09:00:00"]', '[null, null, 1]'],
+                     '/api/studios/': ['["x"]', '[{}]', '"1"'],
+                     '/users/': ['["x"]', '[[1]]', 'not json']}
+        for path, tampered in positions.items():
+            for position in tampered:
+                cursor = base64.b64encode(urlencode({'o': 0, 'r': 0, 'p': position}).encode()).decode()
+                with self.subTest(path=path, position=position):
+                    response = self.client.get(path, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 404)
+
+
+class StudioCacheTests(TestCase):
+    """Checks that changes to studios invalidate the studio cache only once they commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+
+    def test_invalidated_on_commit(self):
+        for change in (lambda: Studio.objects.filter(pk=self.studio.pk).first().save(),
+                       lambda: self.owner.save(),
+                       lambda: self.studio.employees.add(self.owner)):
+            with self.subTest(change=change):
+                version = studio_cache_version()
+                with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                    change()
+                    self.assertEqual(studio_cache_version(), version)
+                self.assertTrue(callbacks)
+                self.assertNotEqual(studio_cache_version(), version)
+
+
+class ReservationETagTests(TestCase):
+    """Checks that the ETag of a reservation list changes with every committed change to the list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+        cls.reservation = Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=date(2030, 1, 7),
+                                                     time=time(9))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def etag(self, path='/api/reservations/'):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def test_reservation_change_changes_etag(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(customer=self.customer, studio=self.studio, date=date(2030, 1, 7), time=time(10))
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_versions_commit_with_the_write(self):
+        etag = self.etag()
+        # Losing the per-process cache, as another worker never had it, changes nothing.
+        caches['default'].clear()
+        self.assertEqual(self.etag(), etag)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.create(customer=self.customer, studio=self.studio, date=date(2030, 1, 7), time=time(10))
+            raise IntegrityError
+        self.assertEqual(self.etag(), etag)
+
+    def test_bump_is_one_statement(self):
+        with self.assertNumQueries(1):
+            bump_reservation_versions([self.studio.id, 0], [self.customer.id])
+        with self.assertNumQueries(1):
+            bump_reservation_versions([self.studio.id, 0], [self.customer.id])
+        self.assertEqual(set(reservation_versions([self.studio.id, 0], [self.customer.id]).values()), {2, 3})
+
+    def test_if_none_match_lists_and_wildcard(self):
+        etag = self.etag()
+        for header, status_code in ((f'"stale", {etag}', 304), (f'"stale",{etag.removeprefix("W/")}', 304),
+                                    ('*', 304), ('"stale"', 200), (f'"stale", W/"{etag[3:-2]}"', 200), ('', 200)):
+            with self.subTest(header=header):
+                response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_expanded_list_has_no_etag(self):
+        path = '/api/reservations/?expand=studio,customer'
+        self.assertNotIn('ETag', self.client.get(path))
+        etag = self.etag()
+        Studio.objects.filter(pk=self.studio.pk).update(name='Renamed')
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['studio']['name'], 'Renamed')
+
+
+class SlotConflictTests(TestCase):
+    """Checks that a taken slot is answered with a 409 and alternatives however the conflict is found."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=date(2030, 1, 7), time=time(9))
+
+    def post(self, at):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        return client.post('/api/reservations/', {
+            'customer': self.customer.id, 'studio': self.studio.id, 'date': '2030-01-07', 'time': at})
+
+    def assertConflict(self, response):
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(set(response.json()), {'detail', 'alternatives'})
+        self.assertTrue(response.json()['alternatives'])
+
+    def test_same_slot(self):
+        self.assertConflict(self.post('09:00'))
+
+    def test_overlapping_slot(self):
+        self.assertConflict(self.post('09:30'))
+
+    def test_slot_taken_by_concurrent_writer(self):
+        # The overlap check passed before the concurrent insert, which the unique constraint then refuses.
+        with mock.patch.object(Reservation, 'validate_no_overlap'):
+            self.assertConflict(self.post('09:00'))
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_held_slot_is_refused_by_bulk_and_series(self):
+        other = User.objects.create_user(username='other', password='secret', is_customer=True)
+        slot = {'studio_id': self.studio.id, 'customer_id': other.id, 'time': time(10), 'num_customers': 1}
+        holds = [place_hold(other.id, {**slot, 'date': day}) for day in (date(2030, 1, 7), date(2030, 1, 14))]
+        self.addCleanup(lambda: [release_hold(hold) for hold in holds])
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        item = {'customer': self.customer.id, 'studio': self.studio.id, 'time': '10:00'}
+
+        response = client.post('/api/reservations/bulk/', [{**item, 'date': '2030-01-07'},
+                                                           {**item, 'date': '2030-01-08'}], format='json')
+        self.assertEqual(response.status_code, 201)
+        held, booked = response.json()['results']
+        self.assertEqual(held['errors']['non_field_errors'], [SlotUnavailable.default_detail])
+        self.assertIn('11:00:00', held['errors']['alternatives'])
+        self.assertNotIn('10:00:00', held['errors']['alternatives'])
+        self.assertEqual(booked['status'], 'created')
+
+        response = client.post('/api/reservations/series/', {**item, 'date': '2030-01-14', 'count': 2},
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([reservation['date'] for reservation in body['reservations']], ['2030-01-21'])
+        self.assertEqual([conflict['date'] for conflict in body['conflicts']], ['2030-01-14'])
+        self.assertTrue(body['conflicts'][0]['errors']['alternatives'])
+
+        # The holder's own holds do not stand in the way of their bookings.
+        client.force_authenticate(other)
+        response = client.post('/api/reservations/bulk/', [{**item, 'customer': other.id, 'date': '2030-01-07'}],
+                               format='json')
+        self.assertEqual(response.json()['created'], 1)
+
+
+ran_payloads = []
+
+
+@job('tests.record')
+def record_job(value):
+    ran_payloads.append(value)
+
+
+@job('tests.fail', max_attempts=2)
+def failing_job():
+    raise RuntimeError('failed')
+
+
+@job('tests.batch', batch=True)
+def record_batch_job(payloads):
+    if any(payload['value'] == 'poison' for payload in payloads):
+        raise ValueError('poison')
+    ran_payloads.extend(payload['value'] for payload in payloads)
+
+
+class JobQueueTests(TestCase):
+    """Checks the claiming, retrying and deduplication of the job queue."""
+
+    def setUp(self):
+        ran_payloads.clear()
+
+    def test_claims_are_exclusive_and_due_only(self):
+        first, second = enqueue('tests.record', value=1), enqueue('tests.record', value=2)
+        enqueue('tests.record', run_at=timezone.now() + timedelta(hours=1), value=3)
+        claimed = claim_jobs(10, 'worker-a')
+        self.assertEqual([claimed_job.id for claimed_job in claimed], [first.id, second.id])
+        self.assertTrue(all(claimed_job.status == Job.RUNNING and claimed_job.attempts == 1
+                            for claimed_job in claimed))
+        self.assertEqual(claim_jobs(10, 'worker-b'), [])
+
+    def test_stale_claim_is_claimed_again(self):
+        queued = enqueue('tests.record', value=1)
+        claim_jobs(10, 'worker-a')
+        Job.objects.filter(id=queued.id).update(
+            locked_at=timezone.now() - timedelta(seconds=settings.BOOKING_JOB_LOCK_TIMEOUT + 1))
+        [claimed] = claim_jobs(10, 'worker-b')
+        self.assertEqual((claimed.locked_by, claimed.attempts), ('worker-b', 2))
+
+    def test_success_deletes_the_job(self):
+        enqueue('tests.record', value=1)
+        self.assertEqual(run_jobs(claim_jobs(10)), 1)
+        self.assertEqual(ran_payloads, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failure_is_retried_with_backoff_then_marked_failed(self):
+        queued = enqueue('tests.fail')
+        self.assertEqual(run_jobs(claim_jobs(10)), 0)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.locked_by), (Job.PENDING, 1, None))
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('RuntimeError', queued.last_error)
+        Job.objects.filter(id=queued.id).update(run_at=timezone.now())
+        run_jobs(claim_jobs(10))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.FAILED, 2))
+
+    def test_poison_payload_fails_only_its_own_job(self):
+        for value in ('a', 'poison', 'b'):
+            enqueue('tests.batch', value=value)
+        self.assertEqual(run_jobs(claim_jobs(10)), 2)
+        self.assertEqual(sorted(ran_payloads), ['a', 'b'])
+        poisoned = Job.objects.get()
+        self.assertEqual((poisoned.payload, poisoned.status), ({'value': 'poison'}, Job.PENDING))
+
+    def test_dedupe_key_queues_one_pending_job(self):
+        self.assertIsNotNone(enqueue('tests.record', dedupe_key='day', value=1))
+        self.assertIsNone(enqueue('tests.record', dedupe_key='day', value=1))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_dedupe_key_is_enforced_by_the_database(self):
+        # A concurrent writer inserted the pending job after any lookup could have seen it.
+        Job.objects.create(name='tests.record', payload={'value': 1}, dedupe_key='day')
+        self.assertIsNone(enqueue('tests.record', dedupe_key='day', value=1))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_dedupe_key_of_running_job_queues_again(self):
+        enqueue('tests.fail', dedupe_key='day')
+        claimed = claim_jobs(10)
+        self.assertIsNotNone(enqueue('tests.fail', dedupe_key='day'))
+        # The failed run is not retried alongside the pending job that does the same work.
+        run_jobs(claimed)
+        self.assertEqual(list(Job.objects.values_list('status', 'attempts')), [(Job.PENDING, 0)])
+
+
+class ScheduleTests(TestCase):
+    """Checks opening hours, durations and overlaps, including bookings that meet end to start."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, opens_at=time(8), closes_at=time(22),
+                                           slot_minutes=60, max_customers_per_day=100)
+        cls.day = date(2030, 1, 7)
+
+    def reserve(self, at, duration_minutes=None):
+        return Reservation.objects.create(customer=self.customer, studio=self.studio, date=self.day, time=at,
+                                          duration_minutes=duration_minutes)
+
+    def assertRefused(self, at, duration_minutes=None, code=None):
+        with self.assertRaises(ValidationError) as raised:
+            self.reserve(at, duration_minutes)
+        if code is not None:
+            self.assertEqual(raised.exception.code, code)
+
+    def test_duration_defaults_to_slot(self):
+        self.assertEqual(self.reserve(time(9)).duration_minutes, 60)
+
+    def test_opening_hours_boundaries(self):
+        self.reserve(time(8))
+        self.reserve(time(21))
+        self.assertRefused(time(7, 59))
+        self.assertRefused(time(21, 1))
+        self.assertRefused(time(20), duration_minutes=121)
+
+    def test_back_to_back_bookings_do_not_overlap(self):
+        self.reserve(time(10))
+        self.reserve(time(9))
+        self.reserve(time(11), duration_minutes=30)
+        self.reserve(time(11, 30), duration_minutes=30)
+
+    def test_overlaps_are_refused(self):
+        self.reserve(time(10))
+        self.assertRefused(time(10, 59), code='overlap')
+        self.assertRefused(time(9, 30), duration_minutes=31, code='overlap')
+        self.assertRefused(time(8), duration_minutes=4 * 60, code='overlap')
+        self.reserve(time(9), duration_minutes=60)
+
+    def test_times_must_be_on_whole_minutes(self):
+        self.reserve(time(10))
+        self.assertRefused(time(9, 0, 30), code='whole_minute')
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post('/api/reservations/', {
+            'customer': self.customer.id, 'studio': self.studio.id, 'date': self.day, 'time': '10:59:30'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('time', response.json())
+
+    def test_day_schedule(self):
+        schedule = DaySchedule([(600, 660), (540, 720), (780, 800)])
+        self.assertFalse(schedule.overlaps(480, 540))
+        self.assertTrue(schedule.overlaps(700, 730))
+        self.assertFalse(schedule.overlaps(720, 780))
+        self.assertFalse(schedule.overlaps(800, 900))
+        schedule.add(720, 780)
+        self.assertTrue(schedule.overlaps(779, 781))
+        self.assertEqual(len(schedule), 4)
+
+
+@mock.patch('api.search.has_fts', return_value=False)
+class TrigramSearchTests(TestCase):
+    """Checks that a name is found by its rare trigrams however many names share its common ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        Studio.objects.bulk_create(Studio(name=f'Studio Number {i}', owner=owner) for i in range(1500))
+        cls.zeta = Studio.objects.create(name='Studio Zeta', owner=owner)
+        rebuild_index()
+
+    def test_common_words_do_not_crowd_out_a_match(self, has_fts):
+        self.assertEqual(search_studios('studio zeta')[0], self.zeta)
+        self.assertEqual(search_studios('zeta'), [self.zeta])
+
+    def test_typos_are_tolerated(self, has_fts):
+        self.assertEqual(search_studios('stuido zeta')[0], self.zeta)
+        self.assertEqual(search_studios('studio zrta')[0], self.zeta)
+        self.assertEqual(search_studios('numbr 1499')[0].name, 'Studio Number 1499')
+
+
+class AvailabilityTests(TestCase):
+    """Checks that the availability of a studio reports every slot a booking overlaps and every full day."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, opens_at=time(9), closes_at=time(13),
+                                           slot_minutes=60, max_customers_per_day=3)
+        cls.day = date(2030, 1, 7)
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=cls.day, time=time(10))
+        # Off the grid, it overlaps the slots of 11:00 and 12:00.
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=cls.day, time=time(11, 30),
+                                   duration_minutes=60)
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=cls.day + timedelta(days=1),
+                                   time=time(9), num_customers=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, **params):
+        return self.client.get(f'/api/studios/{self.studio.id}/availability/', params)
+
+    def test_free_slots_and_remaining_capacity(self):
+        response = self.get(start='2030-01-06', end='2030-01-08')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'studio': self.studio.id, 'max_customers_per_day': 3, 'days': [
+            {'date': '2030-01-06', 'remaining_capacity': 3,
+             'free_slots': ['09:00:00', '10:00:00', '11:00:00', '12:00:00']},
+            {'date': '2030-01-07', 'remaining_capacity': 1, 'free_slots': ['09:00:00']},
+            {'date': '2030-01-08', 'remaining_capacity': 0, 'free_slots': []},
+        ]})
+
+    def test_range_defaults_to_today(self):
+        days = self.get().json()['days']
+        self.assertEqual([day['date'] for day in days], [timezone.localdate().isoformat()])
+
+    def test_invalid_ranges_are_refused(self):
+        self.assertEqual(self.get(start='2030-01-08', end='2030-01-07').status_code, 400)
+        self.assertEqual(self.get(start='2030-01-01', end='2030-03-01').status_code, 400)
+        self.assertEqual(self.client.get('/api/studios/0/availability/').status_code, 404)
+
+
+class ReservationScopeTests(TestCase):
+    """Checks that every role sees, and can change, only the reservations in its scope."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.other_owner = User.objects.create_user(username='other_owner', password='secret', is_studio_owner=True)
+        cls.employee = User.objects.create_user(username='employee', password='secret', is_employee=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.other_customer = User.objects.create_user(username='other_customer', password='secret', is_customer=True)
+        cls.nobody = User.objects.create_user(username='nobody', password='secret')
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+        cls.other_studio = Studio.objects.create(name='Other Studio', owner=cls.other_owner)
+        StudioEmployee.objects.create(studio=cls.studio, user=cls.employee)
+        day = date(2030, 1, 7)
+        cls.mine = Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=day, time=time(9))
+        cls.theirs = Reservation.objects.create(customer=cls.other_customer, studio=cls.other_studio, date=day,
+                                                time=time(9))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def listed(self, user):
+        response = self.client_for(user).get('/api/reservations/')
+        self.assertEqual(response.status_code, 200)
+        return {reservation['id'] for reservation in response.json()['results']}
+
+    def test_lists_are_scoped_by_role(self):
+        self.assertEqual(self.listed(self.customer), {self.mine.id})
+        self.assertEqual(self.listed(self.employee), {self.mine.id})
+        self.assertEqual(self.listed(self.owner), {self.mine.id})
+        self.assertEqual(self.listed(self.other_owner), {self.theirs.id})
+        self.assertEqual(self.listed(self.other_customer), {self.theirs.id})
+
+    def test_reservations_out_of_scope_are_not_found(self):
+        path = f'/api/reservations/{self.mine.id}/'
+        for user in (self.other_owner, self.other_customer):
+            client = self.client_for(user)
+            with self.subTest(user=user.username):
+                self.assertEqual(client.get(path).status_code, 404)
+                self.assertEqual(client.patch(path, {'notes': 'Mine now'}).status_code, 404)
+                self.assertEqual(client.delete(path).status_code, 404)
+        self.assertTrue(Reservation.objects.filter(pk=self.mine.pk, notes__isnull=True).exists())
+        self.assertEqual(self.client_for(self.employee).get(f'/api/reservations/{self.theirs.id}/').status_code, 404)
+        self.assertEqual(self.client_for(self.employee).get(path).status_code, 200)
+
+    def test_employee_scope_follows_the_studio(self):
+        StudioEmployee.objects.filter(user=self.employee).update(studio=self.other_studio)
+        self.assertEqual(self.listed(self.employee), {self.theirs.id})
+
+    def test_token_claims_scope_like_the_database(self):
+        authentication = ClaimsJWTAuthentication()
+        for user in (self.owner, self.other_owner, self.employee, self.customer):
+            token = authentication.get_validated_token(str(RoleRefreshToken.for_user(user).access_token))
+            claimed = authentication.get_user(token)
+            with self.subTest(user=user.username):
+                self.assertIsInstance(claimed, TokenUser)
+                self.assertEqual(set(Reservation.objects.visible_to(claimed)),
+                                 set(Reservation.objects.visible_to(user)))
+
+    def test_user_without_role_is_refused(self):
+        client = self.client_for(self.nobody)
+        self.assertEqual(client.get('/api/reservations/').status_code, 403)
+        self.assertEqual(client.get(f'/api/reservations/{self.mine.id}/').status_code, 403)
+
+
+class RequestTimingTests(TestCase):
+    """Checks that request timings are only logged for slow requests and only sent to clients when enabled."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_server_timing_header_is_off_by_default(self):
+        with self.settings(DEBUG=False, BOOKING_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/api/studios/'))
+        for enabled in ({'DEBUG': True}, {'BOOKING_SERVER_TIMING': True}):
+            with self.subTest(**enabled), self.settings(**enabled):
+                header = self.client.get('/api/studios/')['Server-Timing']
+                self.assertRegex(header, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=')
+
+    def test_only_slow_requests_are_logged(self):
+        self.assertFalse(logging.getLogger('booking.timing').isEnabledFor(logging.INFO))
+        with self.assertNoLogs('booking.timing', 'WARNING'):
+            self.client.get('/api/studios/')
+        with self.settings(BOOKING_SLOW_REQUEST_MS=0), self.assertLogs('booking.timing', 'WARNING') as logs:
+            self.client.get('/api/studios/')
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('"sql": [', logs.output[0])
+
+
+class AsyncReadViewTests(TestCase):
+    """Checks that the async read views served under ASGI answer exactly as the viewsets do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.other_customer = User.objects.create_user(username='other_customer', password='secret', is_customer=True)
+        cls.nobody = User.objects.create_user(username='nobody', password='secret')
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, opens_at=time(9), closes_at=time(12),
+                                           slot_minutes=60)
+        Studio.objects.create(name='Other Studio', owner=cls.owner)
+        day = date(2030, 1, 7)
+        cls.mine = Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=day, time=time(9))
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=day, time=time(10))
+        cls.theirs = Reservation.objects.create(customer=cls.other_customer, studio=cls.studio, date=day,
+                                                time=time(11))
+
+    def get_both(self, user, path, **headers):
+        """Returns the sync and the async response to a GET request made with the user's access token."""
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {RoleRefreshToken.for_user(user).access_token}' if user else ''
+        # The async test client takes the headers by their HTTP names rather than their WSGI environ keys.
+        http_headers = {key.removeprefix('HTTP_').replace('_', '-').lower(): value for key, value in headers.items()}
+
+        async def get():
+            return await AsyncClient().get(path, **http_headers)
+
+        sync = self.client.get(path, **headers)
+        with self.settings(ROOT_URLCONF='booking.asgi_urls'):
+            return sync, async_to_sync(get)()
+
+    def assertSameAnswer(self, user, path, **headers):
+        sync, asynchronous = self.get_both(user, path, **headers)
+        # A DRF Response would mean the request fell through to the viewset.
+        self.assertNotIsInstance(asynchronous, Response)
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        self.assertEqual(asynchronous.content, sync.content)
+        self.assertEqual(asynchronous.get('ETag'), sync.get('ETag'))
+        return asynchronous
+
+    def test_same_answers_as_viewsets(self):
+        studio, owner, customer = self.studio.id, self.owner, self.customer
+        cases = [
+            (customer, '/api/reservations/', 200), (customer, '/api/reservations/?page_size=1', 200),
+            (owner, '/api/reservations/', 200), (customer, f'/api/reservations/{self.mine.id}/', 200),
+            (customer, f'/api/reservations/{self.theirs.id}/', 404), (self.nobody, '/api/reservations/', 403),
+            (None, '/api/reservations/', 401), (customer, '/api/studios/', 200),
+            (customer, f'/api/studios/{studio}/availability/?start=2030-01-06&end=2030-01-07', 200),
+            (customer, f'/api/studios/{studio}/availability/?start=2030-01-07&end=2030-01-06', 400),
+            (customer, '/api/studios/0/availability/', 404),
+        ]
+        for user, path, status_code in cases:
+            with self.subTest(user=user and user.username, path=path):
+                self.assertEqual(self.assertSameAnswer(user, path).status_code, status_code)
+
+    def test_current_etag_is_not_modified(self):
+        etag = self.assertSameAnswer(self.customer, '/api/reservations/')['ETag']
+        response = self.assertSameAnswer(self.customer, '/api/reservations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+
+class ExportTests(TestCase):
+    """Checks that the export streams exactly the reservations in the user's scope, in booking order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.other_customer = User.objects.create_user(username='other_customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner)
+        day = date(2030, 1, 7)
+        cls.later = Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=day, time=time(11),
+                                               notes='Bring "the" amp, please')
+        cls.earlier = Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=day, time=time(9),
+                                                 duration_minutes=90, num_customers=2)
+        cls.theirs = Reservation.objects.create(customer=cls.other_customer, studio=cls.studio, date=day,
+                                                time=time(13))
+
+    def export(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        # A chunk of one row streams every row separately.
+        with self.settings(BOOKING_EXPORT_CHUNK_SIZE=1):
+            return client.get('/api/reservations/export/', params)
+
+    def test_csv(self):
+        response = self.export(self.customer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="reservations.csv"')
+        studio, customer = self.studio.id, self.customer.id
+        self.assertEqual(b''.join(response.streaming_content).decode(), (
+            'id,studio,customer,date,time,duration_minutes,num_customers,notes\r\n'
+            f'{self.earlier.id},{studio},{customer},2030-01-07,09:00:00,90,2,\r\n'
+            f'{self.later.id},{studio},{customer},2030-01-07,11:00:00,60,1,"Bring ""the"" amp, please"\r\n'))
+
+    def test_ndjson_matches_the_api(self):
+        response = self.export(self.owner, output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in exported], [self.earlier.id, self.later.id, self.theirs.id])
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        for row in exported:
+            shown = client.get(f"/api/reservations/{row['id']}/").json()
+            self.assertEqual(row, {key: shown[key] for key in row})
+
+    def test_scope_and_format(self):
+        self.assertEqual(len(b''.join(self.export(self.other_customer).streaming_content).splitlines()), 2)
+        self.assertEqual(self.export(self.customer, output='xml').status_code, 400)
+
+
+class ValuesSerializerTests(TestCase):
+    """Checks that lists built from `.values()` rows render byte for byte like the model serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        employees = [User.objects.create_user(username=f'employee{i}', password='secret', is_employee=True)
+                     for i in range(3)]
+        studio = Studio.objects.create(name='Studio', owner=cls.owner, opens_at=time(8, 30), closes_at=time(20))
+        studio.employees.set(employees[::-1])
+        Studio.objects.create(name='Empty Studio', owner=cls.owner, max_customers_per_day=1, slot_minutes=45)
+        Reservation.objects.create(customer=cls.customer, studio=studio, date=date(2030, 1, 7), time=time(9, 15),
+                                   notes='Ünïcode "quoted"')
+        Reservation.objects.create(customer=cls.customer, studio=studio, date=date(2029, 12, 31), time=time(18),
+                                   duration_minutes=120, num_customers=4)
+
+    def assertSameBytes(self, serializer_class, queryset, fields=None):
+        fast = values_serializer(serializer_class, fields)
+        self.assertEqual(JSONRenderer().render(fast.represent(fast.values(queryset))),
+                         JSONRenderer().render(serializer_class(queryset, many=True, fields=fields).data))
+
+    def test_serializers_render_the_same_bytes(self):
+        cases = [(StudioSerializer, Studio.objects.order_by('id')),
+                 (ReservationSerializer, Reservation.objects.order_by('date', 'time', 'id'))]
+        for serializer_class, queryset in cases:
+            for fields in (None, ('employees', 'name', 'opens_at', 'notes', 'time')):
+                with self.subTest(serializer=serializer_class.__name__, fields=fields):
+                    self.assertSameBytes(serializer_class, queryset, fields)
+
+    def test_list_endpoints_match_the_model_serializers(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        cases = [('/api/studios/', StudioSerializer, Studio.objects.order_by('id')),
+                 ('/api/reservations/', ReservationSerializer, Reservation.objects.order_by('date', 'time', 'id'))]
+        for path, serializer_class, queryset in cases:
+            with self.subTest(path=path):
+                results = client.get(path).json()['results']
+                self.assertEqual(JSONRenderer().render(results),
+                                 JSONRenderer().render(serializer_class(queryset, many=True).data))
+
+
+class CalendarTests(TestCase):
+    """Checks the monthly calendar of a studio and the rebuild of the ledger it is read from."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.other_owner = User.objects.create_user(username='other_owner', password='secret', is_studio_owner=True)
+        cls.employee = User.objects.create_user(username='employee', password='secret', is_employee=True)
+        cls.customer = User.objects.create_user(username='customer', password='secret', is_customer=True)
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, max_customers_per_day=4)
+        cls.other_studio = Studio.objects.create(name='Other Studio', owner=cls.other_owner)
+        StudioEmployee.objects.create(studio=cls.studio, user=cls.employee)
+        for at, num_customers in ((9, 1), (10, 2)):
+            Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=date(2030, 2, 3), time=time(at),
+                                       num_customers=num_customers)
+        Reservation.objects.create(customer=cls.customer, studio=cls.studio, date=date(2030, 2, 28), time=time(9),
+                                   num_customers=4)
+        Reservation.objects.create(customer=cls.customer, studio=cls.other_studio, date=date(2030, 2, 3),
+                                   time=time(9))
+
+    def get(self, user, studio=None, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/studios/{(studio or self.studio).id}/calendar/', params)
+
+    def test_month_is_zero_filled(self):
+        response = self.get(self.owner, month='2030-02')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual({key: body[key] for key in ('studio', 'month', 'max_customers_per_day')},
+                         {'studio': self.studio.id, 'month': '2030-02', 'max_customers_per_day': 4})
+        days = body['days']
+        self.assertEqual([day['date'] for day in days], [f'2030-02-{day:02}' for day in range(1, 29)])
+        self.assertEqual(days[2], {'date': '2030-02-03', 'reservations': 2, 'customers': 3, 'remaining_capacity': 1})
+        self.assertEqual(days[27], {'date': '2030-02-28', 'reservations': 1, 'customers': 4, 'remaining_capacity': 0})
+        self.assertEqual(days[0], {'date': '2030-02-01', 'reservations': 0, 'customers': 0, 'remaining_capacity': 4})
+
+    def test_month_defaults_to_the_current_one(self):
+        self.assertEqual(self.get(self.employee).json()['month'], timezone.localdate().strftime('%Y-%m'))
+
+    def test_staff_only(self):
+        self.assertEqual(self.get(self.employee, month='2030-02').status_code, 200)
+        for user in (self.customer, self.other_owner):
+            with self.subTest(user=user.username):
+                self.assertEqual(self.get(user, month='2030-02').status_code, 403)
+        self.assertEqual(self.get(self.employee, self.other_studio, month='2030-02').status_code, 403)
+
+    def test_invalid_months_are_refused(self):
+        for month in ('2030-13', '2030-02-01', 'February'):
+            with self.subTest(month=month):
+                self.assertEqual(self.get(self.owner, month=month).status_code, 400)
+
+    def test_rebuild_occupancy_command(self):
+        # Queryset updates bypass Reservation.save() and leave the ledger behind.
+        Reservation.objects.filter(date=date(2030, 2, 3)).update(num_customers=1)
+        DailyOccupancy.objects.filter(studio=self.other_studio).update(num_customers=3)
+        out = StringIO()
+        call_command('rebuild_occupancy', studio=[self.studio.id], stdout=out)
+        self.assertEqual(out.getvalue(), 'Rebuilt 2 daily occupancy rows.\n')
+        self.assertEqual(self.get(self.owner, month='2030-02').json()['days'][2]['customers'], 2)
+        self.assertEqual(DailyOccupancy.objects.get(studio=self.other_studio).num_customers, 3)
+        call_command('rebuild_occupancy', stdout=out)
+        self.assertEqual(DailyOccupancy.objects.get(studio=self.other_studio).num_customers, 1)
+
+
+class WaitlistPromotionTests(TestCase):
+    """Checks that waiting customers are promoted into cancelled capacity once, in the order they joined."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        cls.customers = [User.objects.create_user(username=f'customer{i}', password='secret', is_customer=True)
+                         for i in range(3)]
+        cls.studio = Studio.objects.create(name='Studio', owner=cls.owner, max_customers_per_day=2)
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def setUp(self):
+        self.booked = [Reservation.objects.create(customer=customer, studio=self.studio, date=self.day, time=time(at))
+                       for customer, at in zip(self.customers[:2], (9, 10))]
+
+    def wait(self, customer, at=None):
+        return WaitlistEntry.objects.create(studio=self.studio, date=self.day, customer=customer, time=at)
+
+    def run_due_jobs(self):
+        return run_jobs(claim_jobs(10))
+
+    def test_cancellation_promotes_through_the_job_queue(self):
+        first, second = self.wait(self.customers[2], time(10)), self.wait(self.customers[0])
+        self.run_due_jobs()
+        self.assertEqual(WaitlistEntry.objects.count(), 2)
+
+        self.booked[1].delete()
+        self.assertEqual(self.run_due_jobs(), 1)
+        promoted = Reservation.objects.get(customer=self.customers[2])
+        self.assertEqual((promoted.date, promoted.time), (self.day, time(10)))
+        self.assertEqual(list(WaitlistEntry.objects.values_list('id', flat=True)), [second.id])
+        self.assertFalse(WaitlistEntry.objects.filter(pk=first.pk).exists())
+        self.assertEqual(DailyOccupancy.objects.get(studio=self.studio, date=self.day).num_customers, 2)
+
+    def test_entry_leaving_during_promotion_rolls_it_back(self):
+        self.wait(self.customers[2])
+        self.booked[1].delete()
+
+        def leave_then_create(items):
+            WaitlistEntry.objects.all().delete()
+            return create_reservations(items)
+
+        with mock.patch('api.waitlist.create_reservations', leave_then_create), \
+                self.assertRaises(WaitlistChanged):
+            promote_waitlist({(self.studio.id, self.day)})
+        # The rollback also restores the entry, which keeps its place.
+        self.assertFalse(Reservation.objects.filter(customer=self.customers[2]).exists())
+        self.assertTrue(WaitlistEntry.objects.filter(customer=self.customers[2]).exists())
+        self.assertEqual(DailyOccupancy.objects.get(studio=self.studio, date=self.day).num_customers, 1)
+
+    def test_command_promotes_every_waitlisted_day(self):
+        other_day = self.day + timedelta(days=1)
+        self.wait(self.customers[2])
+        WaitlistEntry.objects.create(studio=self.studio, date=other_day, customer=self.customers[2], num_customers=2)
+        self.booked[0].delete()
+        Job.objects.all().delete()
+        out = StringIO()
+        with self.settings(BOOKING_WAITLIST_BATCH_SIZE=1):
+            call_command('promote_waitlist', stdout=out)
+        self.assertEqual(out.getvalue(), 'Promoted 2 waitlist entries over 2 days.\n')
+        self.assertEqual(set(Reservation.objects.filter(customer=self.customers[2]).values_list('date', flat=True)),
+                         {self.day, other_day})
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_queryset_only_scopes(self):
+        entry = self.wait(self.customers[2])
+        self.assertEqual(list(WaitlistEntry.objects.visible_to(self.customers[2])), [entry])
+        self.assertEqual(list(WaitlistEntry.objects.visible_to(self.owner)), [entry])
+        self.assertFalse(WaitlistEntry.objects.visible_to(self.customers[0]).exists())
+        self.assertFalse(hasattr(WaitlistEntry.objects, 'overlaps'))
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    """Checks that BOOKING_DB_PROFILE selects the database and that the SQLite backend validates its options."""
+
+    def load_settings(self, **environ):
+        with mock.patch.dict('os.environ', environ):
+            return runpy.run_path(str(settings.BASE_DIR / 'booking' / 'settings.py'))
+
+    def test_profiles(self):
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('BOOKING_DB_PROFILE', None)
+            default = self.load_settings()['DATABASES']['default']
+        self.assertEqual(default['ENGINE'], 'booking.sqlite3')
+        self.assertEqual(default['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        server = self.load_settings(BOOKING_DB_PROFILE='server', BOOKING_DB_NAME='bookings',
+                                    BOOKING_DB_CONN_MAX_AGE='30')['DATABASES']['default']
+        self.assertEqual((server['ENGINE'], server['NAME'], server['CONN_MAX_AGE']),
+                         ('django.db.backends.postgresql', 'bookings', 30))
+        self.assertTrue(server['CONN_HEALTH_CHECKS'])
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unknown BOOKING_DB_PROFILE 'mysql'"):
+            self.load_settings(BOOKING_DB_PROFILE='mysql')
+
+    def test_transaction_mode_is_validated(self):
+        for mode in ('immediate', 'EXCLUSIVE', None):
+            options = {} if mode is None else {'transaction_mode': mode}
+            wrapper = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': ':memory:', 'OPTIONS': options})
+            with self.subTest(mode=mode):
+                self.assertNotIn('transaction_mode', wrapper.get_connection_params())
+        wrapper = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': ':memory:',
+                                         'OPTIONS': {'transaction_mode': 'LAZY'}})
+        with self.assertRaisesMessage(ImproperlyConfigured, "transaction_mode must be one of"):
+            wrapper.get_connection_params()
+
+
+class SQLiteConnectionTests(TransactionTestCase):
+    """Checks that SQLite connections are tuned when opened and take the write lock when a transaction begins."""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest(f'The {connection.vendor} backend is not tuned per connection.')
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        pragmas = {'busy_timeout': 1234, 'cache_size': -2048, 'temp_store': 'MEMORY'}
+        with self.settings(BOOKING_SQLITE_PRAGMAS=pragmas):
+            new = connections.create_connection('default')
+            self.addCleanup(new.close)
+            new.ensure_connection()
+        with new.cursor() as cursor:
+            applied = {pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0] for pragma in pragmas}
+        # SQLite reports temp_store=MEMORY as 2.
+        self.assertEqual(applied, {'busy_timeout': 1234, 'cache_size': -2048, 'temp_store': 2})
+
+    def test_atomic_blocks_begin_immediate(self):
+        with CaptureQueriesContext(connection) as captured, transaction.atomic():
+            Studio.objects.exists()
+        self.assertEqual(captured[0]['sql'], 'BEGIN IMMEDIATE')
@@ -1,6 +1,6 @@
 from rest_framework import routers
 
-from .views import StudioViewSet, ReservationViewSet, StudioEmployeeViewSet
+from .views import StudioViewSet, ReservationViewSet, StudioEmployeeViewSet, WaitlistEntryViewSet
 
 app_name = 'api'
 
@@ -8,5 +8,6 @@ router = routers.DefaultRouter()
 router.register(r'studios', StudioViewSet)
 router.register(r'reservations', ReservationViewSet)
 router.register(r'studio-employees', StudioEmployeeViewSet)
+router.register(r'waitlist', WaitlistEntryViewSet)
 
 urlpatterns = router.urls
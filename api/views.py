@@ -1,46 +1,280 @@
-from rest_framework.viewsets import ModelViewSet
+import calendar
+import hashlib
+from datetime import timedelta
+
+from rest_framework import mixins
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from rest_framework.permissions import IsAuthenticated, BasePermission
-from django.core.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError as DjangoValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import Studio, Reservation, StudioEmployee
+from booking.pagination import ReservationCursorPagination
+from booking.serialization import ValuesListMixin
+from booking.shaping import ShapedViewSetMixin
+from users.models import User
+from users.throttling import CredentialThrottle
+from .availability import studio_availability
+from .bulk import create_reservations
+from .cache import cached_studios, reservation_versions
+from .export import EXPORT_FORMATS, export_rows
+from .holds import SlotUnavailable, alternative_slots, get_hold, held_by_other, hold_slot, release_hold
+from .search import search_studios
+from .models import Studio, Reservation, StudioEmployee, DailyOccupancy, WaitlistEntry
 from .serializers import StudioSerializer, ReservationSerializer, StudioEmployeeSerializer, \
-    StudioTokenObtainPairSerializer
+    StudioTokenObtainPairSerializer, AvailabilityQuerySerializer, ReservationItemSerializer, CalendarQuerySerializer, \
+    WaitlistEntrySerializer, ReservationSeriesSerializer, StudioSearchQuerySerializer
 
 
-class StudioViewSet(ModelViewSet):
+def reservation_list_etag(user, versions, path):
+    """Build the weak ETag of a reservation list from the versions of the studios or customer in its scope.
+
+    Args:
+        user: The user the list is scoped to.
+        versions (dict): The reservation list versions of the scope, as returned by `reservation_versions`.
+        path (str): The full path of the list request, which selects the page.
+
+    Returns:
+        str: The weak ETag.
+    """
+    fingerprint = repr((user.id, sorted(versions.items()), path))
+    return f'W/"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """Check whether the If-None-Match header of a request matches an ETag.
+
+    Entity tags are compared weakly, ignoring their `W/` prefix, and `*` matches any ETag.
+
+    Args:
+        request: The HTTP request.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client already holds the representation with that ETag.
+    """
+    tags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+class IsStudioStaff(BasePermission):
+    """Permission class that allows access to a studio only to its owner and employees."""
+    def has_object_permission(self, request, view, obj):
+        """Check if the requesting user owns or works at the requested studio.
+
+        The studios a user works at are read from the token's role claims when the user was built from them.
+
+        Args:
+            request: The HTTP request.
+            view: The Django view.
+            obj: The studio being requested.
+
+        Returns:
+            True if the user owns or works at the studio, False otherwise.
+        """
+        user = request.user
+        if obj.owner_id == user.id:
+            return True
+        studio_ids = getattr(user, 'studio_ids', None)
+        if studio_ids is not None:
+            return obj.id in studio_ids
+        return user.is_employee and StudioEmployee.objects.filter(studio_id=obj.id, user_id=user.id).exists()
+
+
+class StudioViewSet(ShapedViewSetMixin, ValuesListMixin, ModelViewSet):
     """A view set for CRUD operations on Studio objects.
 
+    Read responses can be trimmed with `?fields=` and inline the owner and employees with `?expand=`.
+
     Attributes:
         queryset (QuerySet): The queryset of Studio objects to be used for the view set.
         serializer_class (Serializer): The serializer class to be used for the view set.
         permission_classes (List[Permission]): The list of permissions to be checked before allowing access
                                                to the view set.
+
+    Methods:
+        list(request): Returns a page of studios from the studio cache.
+        retrieve(request, pk): Returns a studio from the studio cache.
+        availability(request, pk): Returns the free slots and remaining capacity of a studio over a date range.
+        calendar(request, pk): Returns the bookings per day of a studio over a month, for its owner and employees.
+        search(request): Returns the studios whose names best match the text typed so far.
     """
-    queryset = Studio.objects.all()
+    # Employees are ordered by ID, the order the `.values()` list path reads them in.
+    queryset = Studio.objects.prefetch_related(Prefetch('employees', queryset=User.objects.order_by('id')))
     serializer_class = StudioSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        """Return a page of studios, serving it from the studio cache when it was built before.
+
+        The page is cached per host and query string, since its pagination links carry both. On a miss it is
+        built from `.values()` rows by `ValuesListMixin`.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The page of studios.
+        """
+        key = f'list:{request.get_host()}:{request.query_params.urlencode()}'
+        return Response(cached_studios(key, lambda: super(StudioViewSet, self).list(request, *args, **kwargs).data))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a studio, serving it from the studio cache when it was built before.
+
+        The studio is cached per query string, which selects its fields and expansions.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The studio.
+
+        Raises:
+            Http404: If there is no studio with the requested ID.
+        """
+        key = f"detail:{kwargs[self.lookup_url_kwarg or self.lookup_field]}:{request.query_params.urlencode()}"
+        return Response(cached_studios(key, lambda: super(StudioViewSet, self).retrieve(request, *args, **kwargs).data))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Return the studios whose names best match a query, best match first.
 
-class ReservationViewSet(ModelViewSet):
+        The query is read from the `q` query parameter and matched as word prefixes, then with tolerance for
+        typos, from the search indexes of `api.search`; at most `limit` studios are returned, unpaginated.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The matching studios, in rank order.
+
+        Raises:
+            ValidationError: If the query is too short or the limit out of range.
+        """
+        query = StudioSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        studios = search_studios(query.validated_data['q'], query.validated_data.get('limit'), self.get_queryset())
+        return Response(self.get_serializer(studios, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """Return the free slots and remaining daily capacity of a studio for each day of a date range.
+
+        The range is read from the `start` and `end` query parameters and answered from the studio's booked-slot
+        bitmaps and occupancy ledger, in a fixed number of queries.
+
+        Args:
+            request: The HTTP request.
+            pk: The ID of the studio.
+
+        Returns:
+            Response: The studio ID, its daily capacity and the availability of each day in the range.
+
+        Raises:
+            ValidationError: If the date range is invalid or too wide.
+        """
+        studio = self.get_object()
+        query = AvailabilityQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end = query.validated_data['start'], query.validated_data['end']
+        return Response({
+            'studio': studio.id,
+            'max_customers_per_day': studio.max_customers_per_day,
+            'days': studio_availability(studio, start, end),
+        })
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsStudioStaff])
+    def calendar(self, request, pk=None):
+        """Return the reservation count, party size and remaining capacity of a studio for each day of a month.
+
+        The month is read from the `month` query parameter as `YYYY-MM` and answered from the occupancy ledger in
+        one range query over its (studio, date) index; days without reservations are filled in with zeros.
+
+        Args:
+            request: The HTTP request.
+            pk: The ID of the studio.
+
+        Returns:
+            Response: The studio ID, the month, its daily capacity and the bookings of each day of the month.
+
+        Raises:
+            ValidationError: If the month is invalid.
+            Http404: If there is no studio with the requested ID.
+            PermissionDenied: If the user neither owns nor works at the studio.
+        """
+        query = CalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        first = query.validated_data['month']
+        last = first + timedelta(days=calendar.monthrange(first.year, first.month)[1] - 1)
+        # The planned queryset would prefetch the employees, which the calendar does not show.
+        studio = get_object_or_404(Studio.objects.only('id', 'owner_id', 'max_customers_per_day'), pk=pk)
+        self.check_object_permissions(request, studio)
+        ledger = {day: (num_reservations, num_customers) for day, num_reservations, num_customers in
+                  DailyOccupancy.objects.filter(studio=studio, date__range=(first, last)).values_list(
+                      'date', 'num_reservations', 'num_customers')}
+        days = []
+        for offset in range((last - first).days + 1):
+            day = first + timedelta(days=offset)
+            num_reservations, num_customers = ledger.get(day, (0, 0))
+            days.append({
+                'date': day,
+                'reservations': num_reservations,
+                'customers': num_customers,
+                'remaining_capacity': max(studio.max_customers_per_day - num_customers, 0),
+            })
+        return Response({
+            'studio': studio.id,
+            'month': first.strftime('%Y-%m'),
+            'max_customers_per_day': studio.max_customers_per_day,
+            'days': days,
+        })
+
+
+class ReservationViewSet(ShapedViewSetMixin, ValuesListMixin, ModelViewSet):
     """API endpoint that allows reservations to be viewed or edited.
 
+    Read responses can be trimmed with `?fields=` and inline the studio and customer with `?expand=`.
+
     Attributes:
         queryset (QuerySet): A queryset of all Reservation objects.
         serializer_class (Serializer): The serializer class to be used for Reservation objects.
         permission_classes (list): The list of permission classes that will be applied to all requests.
+        pagination_class (Pagination): The keyset pagination that pages reservations in (date, time, id) order.
 
     Methods:
-        get_queryset(): Returns a filtered queryset based on the requesting user's role.
-        get_object(): Returns the Reservation object for the requested reservation ID, with additional permission checks based on the requesting user's role.
+        get_queryset(): Returns a filtered queryset based on the requesting user's role, which also scopes the
+                        objects that can be retrieved, updated or deleted.
+        list(request): Returns a page of Reservations, or 304 if the client's ETag is still current.
+        perform_create(serializer): Saves a new Reservation, reporting a full day as a validation error and a slot
+                                    that is taken or held by someone else as a conflict.
+        perform_update(serializer): Saves an updated Reservation, reporting errors as `perform_create` does.
+        bulk(request): Creates a batch of Reservations and reports the outcome of each item.
+        series(request): Creates the occurrences of a recurring Reservation and reports the ones that conflict.
+        hold(request): Holds a slot for the user for a short while, or reports it taken with alternative slots.
+        confirm(request): Turns one of the user's holds into a Reservation.
+        export(request): Streams every Reservation in the user's scope as CSV or NDJSON.
     """
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReservationCursorPagination
 
     def get_queryset(self):
         """Get the list of Reservations based on the user's role.
 
+        The scoping is a single filter on the reservation query, so the list and detail endpoints run a fixed
+        number of queries for every role, and a reservation outside the user's scope is simply not found.
+
         Args:
             self (ReservationViewSet): Instance of ReservationViewSet
 
@@ -51,52 +285,334 @@ class ReservationViewSet(ModelViewSet):
             PermissionDenied: If user's role is not defined or user has no permission to access this view.
         """
         user = self.request.user
+        if not (user.is_customer or user.is_employee or user.is_studio_owner):
+            # Raise permission denied if user has no role
+            raise PermissionDenied("User has no role assigned.")
+        return Reservation.objects.visible_to(user)
 
-        if user.is_customer:
-            # Filter reservations by customer
-            return Reservation.objects.filter(customer=user)
+    def get_list_etag(self, request):
+        """Build the weak ETag of the requested reservation list from the versions of the studios or customer in it.
 
-        elif user.is_employee:
-            # Filter reservations by studio
-            studio = user.studioemployee.studio
-            return Reservation.objects.filter(studio=studio)
+        The ETag changes whenever a reservation in the user's scope is saved or deleted, or the studios in scope
+        change, without reading the reservation table.
 
-        elif user.is_studio_owner:
-            # Filter reservations by all studios owned by user
-            owned_studios = Studio.objects.filter(owner=user)
-            return Reservation.objects.filter(studio__in=owned_studios)
+        Args:
+            request: The HTTP request.
 
+        Returns:
+            str: The weak ETag.
+        """
+        user = request.user
+        if user.is_customer:
+            studio_ids, customer_ids = [], [user.id]
         else:
-            # Raise permission denied if user has no role
-            raise PermissionDenied("User has no role assigned.")
+            studio_ids = getattr(user, 'studio_ids', None)
+            if studio_ids is None and user.is_employee:
+                studio_ids = StudioEmployee.objects.filter(user_id=user.id).values_list('studio_id', flat=True)
+            elif studio_ids is None:
+                studio_ids = Studio.objects.filter(owner_id=user.id).values_list('id', flat=True)
+            studio_ids, customer_ids = sorted(studio_ids), []
+        return reservation_list_etag(user, reservation_versions(studio_ids, customer_ids), request.get_full_path())
 
-    def get_object(self):
-        """Retrieve and return the requested reservation object based on the user's permissions.
+    def list(self, request, *args, **kwargs):
+        """Return a page of reservations, or an empty 304 response if the client already holds the current one.
 
-        Raises a `PermissionDenied` exception if the user doesn't have the necessary permissions to view the reservation.
+        The page is built from `.values()` rows by `ValuesListMixin`, without instantiating reservations. A page
+        that inlines studios or customers with `?expand=` has no ETag: the reservation versions do not change when
+        the inlined objects do.
+
+        Args:
+            request: The HTTP request.
 
         Returns:
-            A `Reservation` object.
+            Response: The page of reservations with its ETag, or a 304 response.
+        """
+        self.get_queryset()  # Raises PermissionDenied for a user without a role before any ETag is compared.
+        if self.get_shape()[1]:
+            return super().list(request, *args, **kwargs)
+        etag = self.get_list_etag(request)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def perform_create(self, serializer):
+        """Saves the new Reservation, turning a capacity or opening hours error from the model into a 400 response
+        and a taken slot into a 409 response.
+
+        A slot held by another user counts as taken, as does a reservation overlapping another booking. A slot
+        taken by a concurrent writer after validation shows up as a unique constraint violation, which is answered
+        the same way.
+
+        Args:
+            serializer: The validated serializer instance to save.
+
+        Raises:
+            ValidationError: If the reservation is outside the studio's opening hours, or the studio has no capacity
+                             left for the reservation's party size on that day.
+            SlotUnavailable: If the slot is held by another user, overlaps another booking or was booked
+                             concurrently.
+
+        Returns:
+            None
+        """
+        data = serializer.validated_data
+        studio, date, time = (data.get(field, getattr(serializer.instance, field, None))
+                              for field in ('studio', 'date', 'time'))
+        if held_by_other(studio.id, date, time, self.request.user.id):
+            raise SlotUnavailable(alternative_slots(studio, date, time))
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except DjangoValidationError as e:
+            if getattr(e, 'code', None) == 'overlap':
+                raise SlotUnavailable(alternative_slots(studio, date, time), detail=e.messages[0])
+            raise ValidationError({'non_field_errors': e.messages})
+        except IntegrityError:
+            raise SlotUnavailable(alternative_slots(studio, date, time))
+
+    def perform_update(self, serializer):
+        """Saves the updated Reservation, turning a capacity or opening hours error into a 400 response and a taken
+        slot into a 409 response, as `perform_create` does.
+
+        The slot the reservation ends up in is checked like a new one, so moving a reservation onto a slot held by
+        another user, or onto another booking, is refused.
+
+        Args:
+            serializer: The validated serializer instance to save.
+
+        Raises:
+            ValidationError: If the reservation is outside the studio's opening hours, or the studio has no capacity
+                             left for the reservation's party size on that day.
+            SlotUnavailable: If the slot is held by another user, overlaps another booking or was booked
+                             concurrently.
+
+        Returns:
+            None
+        """
+        self.perform_create(serializer)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create a batch of reservations in one transaction and report the outcome of each item.
+
+        The request body is a list of reservations. Items that fail validation, collide with a booked slot or one
+        held by another user, or exceed a studio's daily capacity are reported with their errors; the others are
+        created together. The errors of a held slot list the nearest free slots as `alternatives`.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The number of created and failed items and, for each item in order, its status and either
+                      the created reservation or its errors. The status is 201 if any item was created, 400 otherwise.
+
+        Raises:
+            ValidationError: If the body is not a list or holds more than `BOOKING_BULK_MAX_ITEMS` items.
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError("Expected a list of reservations.")
+        if len(request.data) > settings.BOOKING_BULK_MAX_ITEMS:
+            raise ValidationError(f"A batch may hold at most {settings.BOOKING_BULK_MAX_ITEMS} reservations.")
+
+        results = [None] * len(request.data)
+        valid = []
+        for index, item in enumerate(request.data):
+            serializer = ReservationItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = serializer.errors
+        outcomes = create_reservations([data for _, data in valid], user_id=request.user.id)
+        for (index, _), result in zip(valid, outcomes):
+            results[index] = result
+
+        created = 0
+        for index, result in enumerate(results):
+            if isinstance(result, Reservation):
+                created += 1
+                results[index] = {'index': index, 'status': 'created',
+                                  'reservation': ReservationSerializer(result).data}
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': result}
+        return Response({'created': created, 'failed': len(results) - created, 'results': results},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def series(self, request):
+        """Create every occurrence of a recurring reservation that is free, and report the ones that conflict.
+
+        The body is a reservation with `every_days` (7 by default) and either `until` or `count`. All occurrences
+        are checked against existing bookings, slots held by other users and the daily capacity together, in a
+        fixed number of queries, and the free ones inserted in one transaction, so a year of weekly bookings costs
+        about as much as one.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The number of created and conflicting occurrences, the created reservations and, for each
+                      conflicting occurrence, its date and errors. The status is 201 if any occurrence was created,
+                      409 otherwise.
+
+        Raises:
+            ValidationError: If the series is invalid.
+        """
+        serializer = ReservationSeriesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.occurrences()
+        created, conflicts = [], []
+        for item, result in zip(items, create_reservations(items, user_id=request.user.id)):
+            if isinstance(result, Reservation):
+                created.append(result)
+            else:
+                conflicts.append({'date': item['date'], 'errors': result})
+        return Response({
+            'created': len(created),
+            'failed': len(conflicts),
+            'reservations': ReservationSerializer(created, many=True).data,
+            'conflicts': conflicts,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_409_CONFLICT)
+
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        """Hold a slot for the user for `BOOKING_HOLD_SECONDS`, to be confirmed into a reservation.
+
+        The body is a reservation. Of several clients asking for the same slot at once, one gets the hold and the
+        others a 409 response at once, before any transaction is opened.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The hold, with the token to confirm it with and its expiry, and a 201 status.
+
+        Raises:
+            ValidationError: If the reservation is invalid or the day has no capacity left for its party size.
+            SlotUnavailable: If the slot is already booked or held, with the nearest free slots of the day.
+        """
+        serializer = ReservationItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(hold_slot(request.user.id, serializer.validated_data), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def confirm(self, request):
+        """Turn one of the user's holds into a reservation and release it.
+
+        Args:
+            request: The HTTP request, whose body carries the `hold` token.
+
+        Returns:
+            Response: The created reservation, with a 201 status.
+
+        Raises:
+            NotFound: If the user has no such hold, for example because it expired.
+            ValidationError: If the reservation is no longer valid, for example because its slot was booked through
+                             another path, or the day is full.
+            SlotUnavailable: If the slot was booked concurrently.
+        """
+        token = request.data.get('hold')
+        hold = get_hold(token) if isinstance(token, str) else None
+        if hold is None or hold['user'] != request.user.id:
+            raise NotFound("The hold does not exist or has expired.")
+        serializer = self.get_serializer(data={field: hold[field] for field in (
+            'studio', 'customer', 'date', 'time', 'num_customers', 'duration_minutes', 'notes')
+            if hold.get(field) is not None})
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        release_hold(hold)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every reservation visible to the user, in booking order, as a CSV or NDJSON download.
+
+        The format is chosen with the `output` query parameter, `csv` by default. Rows are read from a database
+        iterator `BOOKING_EXPORT_CHUNK_SIZE` at a time and streamed as they are written, so the memory of the
+        export stays flat however many reservations it covers.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            StreamingHttpResponse: The export, as an attachment.
 
         Raises:
-            PermissionDenied: If the user doesn't have the necessary permissions to view the reservation.
+            ValidationError: If the requested output format is not supported.
+            PermissionDenied: If user's role is not defined.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError(f"Unsupported output format, expected one of: {', '.join(EXPORT_FORMATS)}.")
+        content_type, chunks = EXPORT_FORMATS[output]
+        chunk_size = settings.BOOKING_EXPORT_CHUNK_SIZE
+        response = StreamingHttpResponse(chunks(export_rows(self.get_queryset(), chunk_size), chunk_size),
+                                         content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="reservations.{output}"'
+        return response
+
+
+class WaitlistEntryViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, GenericViewSet):
+    """API endpoint for the waitlists of days that are fully booked.
+
+    Customers join the waitlist of a studio's day and leave it again; entries are promoted into reservations in
+    the background as capacity frees up, and disappear from the list once promoted. Employees and owners see the
+    entries of their studios.
+
+    Attributes:
+        queryset (QuerySet): A queryset of all WaitlistEntry objects.
+        serializer_class (Serializer): The serializer class to be used for WaitlistEntry objects.
+        permission_classes (list): The list of permission classes that will be applied to all requests.
+
+    Methods:
+        get_queryset(): Returns the entries the requesting user may see, in waitlist order.
+        perform_create(serializer): Adds the requesting customer to the waitlist of a day.
+    """
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Get the waitlist entries the requesting user may see, scoped as reservations are.
+
+        Returns:
+            Queryset: The visible entries, ordered by studio, day and position.
+
+        Raises:
+            PermissionDenied: If the user has no role.
         """
-        obj = super().get_object()
         user = self.request.user
-        if user.is_customer:
-            if obj != user:
-                raise PermissionDenied("You don't have permission to view this reservation.")
+        if not (user.is_customer or user.is_employee or user.is_studio_owner):
+            raise PermissionDenied("User has no role assigned.")
+        return WaitlistEntry.objects.visible_to(user).order_by('studio', 'date', 'id')
+
+    def perform_create(self, serializer):
+        """Adds the requesting customer to the waitlist of the requested day.
+
+        Args:
+            serializer: The validated serializer instance to save.
 
-        elif user.is_employee:
-            studio = user.studioemployee.studio
-            if obj.studio != studio:
-                raise PermissionDenied("You don't have permission to view this reservation.")
+        Raises:
+            PermissionDenied: If the user is not a customer.
+            ValidationError: If the customer is already waiting for that studio and day.
 
-        elif user.is_studio_owner:
-            studios = Studio.objects.filter(owner=user)
-            if obj.studio not in studios:
-                raise PermissionDenied("You don't have permission to view this reservation.")
-        return obj
+        Returns:
+            None
+        """
+        user = self.request.user
+        if not user.is_customer:
+            raise PermissionDenied("Only customers can join a waitlist.")
+        data = serializer.validated_data
+        duplicate = ValidationError("You are already on the waitlist for this day.")
+        if WaitlistEntry.objects.filter(studio=data['studio'], date=data['date'], customer_id=user.id).exists():
+            raise duplicate
+        try:
+            with transaction.atomic():
+                serializer.save(customer_id=user.id)
+        except IntegrityError:
+            raise duplicate
 
 
 class IsStudioOwner(BasePermission):
@@ -116,7 +632,7 @@ class IsStudioOwner(BasePermission):
         Returns:
             True if the user owns the studio of the requested object, False otherwise.
         """
-        return obj.studio.owner == request.user
+        return obj.studio.owner_id == request.user.id
 
     def has_permission(self, request, view):
         """Check if the requesting user owns the specified studio.
@@ -131,7 +647,7 @@ class IsStudioOwner(BasePermission):
         user = request.user
         studio_id = request.query_params.get('studio_id')
         if user.is_authenticated and user.is_studio_owner and studio_id:
-            return user.studios.filter(id=studio_id).exists()
+            return Studio.objects.filter(id=studio_id, owner_id=user.id).exists()
         else:
             return False
 
@@ -159,7 +675,7 @@ class StudioEmployeeViewSet(ModelViewSet):
             A QuerySet of StudioEmployee objects filtered by the owner of the studio.
         """
         user = self.request.user
-        return StudioEmployee.objects.filter(studio__owner=user)
+        return StudioEmployee.objects.filter(studio__owner_id=user.id).select_related('studio')
 
     def perform_create(self, serializer):
         """Saves the new StudioEmployee instance with the current user as the owner.
@@ -170,16 +686,19 @@ class StudioEmployeeViewSet(ModelViewSet):
         Returns:
             None
         """
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
 
 class StudioTokenObtainPairView(TokenObtainPairView):
     """View that returns an access and refresh token for a studio user.
 
     Extends the `TokenObtainPairView` class and uses the `StudioTokenObtainPairSerializer`
-    to generate tokens with an associated studio ID.
+    to generate tokens with an associated studio ID. Calls are throttled per client IP and username.
 
     Attributes:
         serializer_class (StudioTokenObtainPairSerializer): The serializer class to use for token generation.
+        throttle_classes (list): The token-bucket throttle of the credential endpoints.
     """
     serializer_class = StudioTokenObtainPairSerializer
+    throttle_classes = [CredentialThrottle]
+    throttle_scope = 'token'
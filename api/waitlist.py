@@ -0,0 +1,141 @@
+"""Module for promoting waitlisted customers into the capacity that cancellations free up.
+
+A cancellation does not promote anyone itself: it only queues a promotion job for its (studio, date), at most one
+pending per day, and the job workers promote the days of a claimed batch of jobs together. A batch reads the
+waitlist, bookings and occupancy ledger of all its days with one query each, then creates the promoted
+reservations together through `create_reservations` and deletes their entries in the same transaction, so a burst
+of cancellations costs a few batches rather than a scan per cancellation.
+
+The `promote_waitlist` command sweeps every upcoming day that has waiting customers, to be run on a schedule.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import slot_grid
+from .bulk import create_reservations, day_schedules
+from .holds import held_by_other
+from .intervals import to_minutes
+from .jobs import enqueue, job
+from .models import Studio, Reservation, DailyOccupancy, WaitlistEntry
+
+
+def _pick_slot(entry, studio, schedule):
+    """Returns the entry's preferred slot if it is free, else the earliest free slot of the day, or None.
+
+    The promoted reservation lasts one slot of the studio.
+    """
+    slots = slot_grid(studio)
+    candidates = [entry.time, *slots] if entry.time is not None else slots
+    for slot in candidates:
+        start = to_minutes(slot)
+        if (studio.is_open(slot, studio.slot_minutes) and not schedule.overlaps(start, start + studio.slot_minutes)
+                and not held_by_other(entry.studio_id, entry.date, slot, entry.customer_id)):
+            return slot
+    return None
+
+
+class WaitlistChanged(Exception):
+    """Raised when waitlist entries being promoted left the waitlist before the promotion could delete them."""
+
+
+def promote_waitlist(days):
+    """Promotes waitlisted customers into the free capacity of some days, in the order they joined the waitlist.
+
+    An entry whose party no longer fits the day, or for whom no slot is free, keeps its place, and the entries
+    behind it are still considered. Promoted entries are deleted in the transaction that creates their
+    reservations, with the days and the entries locked from the moment they are read, so an entry is promoted
+    exactly once and a customer who leaves the waitlist meanwhile is never booked.
+
+    Args:
+        days (iterable): The (studio ID, date) pairs to promote.
+
+    Returns:
+        list: The reservations created for the promoted entries.
+
+    Raises:
+        WaitlistChanged: If a promoted entry was deleted concurrently, in which case nothing is promoted.
+    """
+    days = set(days)
+    if not days:
+        return []
+    studio_ids, dates = {studio_id for studio_id, _ in days}, {date for _, date in days}
+    with transaction.atomic():
+        DailyOccupancy.lock_days(days)
+        studios = Studio.objects.in_bulk(studio_ids)
+        schedules = day_schedules(studio_ids, dates)
+        occupancy = {
+            (studio_id, date): num_customers for studio_id, date, num_customers in DailyOccupancy.objects.filter(
+                studio_id__in=studio_ids, date__in=dates).values_list('studio_id', 'date', 'num_customers')
+        }
+        entries = WaitlistEntry.objects.select_for_update().filter(
+            studio_id__in=studio_ids, date__in=dates).order_by('studio', 'date', 'id')
+
+        promoted, items = [], []
+        for entry in entries:
+            day = (entry.studio_id, entry.date)
+            if day not in days:
+                continue
+            studio = studios[entry.studio_id]
+            if occupancy.get(day, 0) + entry.num_customers > studio.max_customers_per_day:
+                continue
+            slot = _pick_slot(entry, studio, schedules[day])
+            if slot is None:
+                continue
+            start = to_minutes(slot)
+            schedules[day].add(start, start + studio.slot_minutes)
+            occupancy[day] = occupancy.get(day, 0) + entry.num_customers
+            promoted.append(entry.id)
+            items.append({'studio_id': entry.studio_id, 'customer_id': entry.customer_id, 'date': entry.date,
+                          'time': slot, 'num_customers': entry.num_customers, 'notes': entry.notes})
+        if not items:
+            return []
+
+        results = create_reservations(items)
+        promoted = [entry_id for entry_id, result in zip(promoted, results) if isinstance(result, Reservation)]
+        deleted, _ = WaitlistEntry.objects.filter(id__in=promoted).delete()
+        if deleted != len(promoted):
+            raise WaitlistChanged(f'{len(promoted) - deleted} of {len(promoted)} promoted entries left the waitlist.')
+    return [result for result in results if isinstance(result, Reservation)]
+
+
+def waitlisted_days():
+    """Returns the upcoming (studio ID, date) pairs that have waiting customers, in order.
+
+    Returns:
+        QuerySet: The pairs, as tuples.
+    """
+    return WaitlistEntry.objects.filter(date__gte=timezone.localdate()).order_by(
+        'studio', 'date').values_list('studio_id', 'date').distinct()
+
+
+@job('waitlist.promote', batch=True)
+def promote_waitlist_job(payloads):
+    """Promotes the days of a batch of promotion jobs together.
+
+    Args:
+        payloads (list): The payloads of the jobs, each with a `studio_id` and an ISO 8601 `date`.
+
+    Returns:
+        None
+    """
+    promote_waitlist({(payload['studio_id'], datetime.date.fromisoformat(payload['date'])) for payload in payloads})
+
+
+def request_promotion(studio_id, day):
+    """Queues the promotion of a studio's day, unless the day has passed or its promotion is queued already.
+
+    The job is queued in the current transaction, so it runs only once the change that freed the capacity commits.
+
+    Args:
+        studio_id (int): The ID of the studio.
+        day (date): The day that may have capacity for waiting customers.
+
+    Returns:
+        None
+    """
+    if day >= timezone.localdate():
+        enqueue('waitlist.promote', dedupe_key=f'waitlist:{studio_id}:{day.isoformat()}', studio_id=studio_id,
+                date=day.isoformat())
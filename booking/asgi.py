@@ -1,7 +1,8 @@
 """
 ASGI config for booking project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``. It runs with the
+``booking.settings_asgi`` settings, which serve the token endpoints with async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -11,6 +12,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booking.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booking.settings_asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,26 @@
+"""booking URL Configuration for ASGI deployments
+
+It serves the token endpoints with async views that hash passwords on a bounded worker pool, the hot api read
+endpoints with async ORM views, and every other route from `booking.urls`.
+"""
+from django.urls import path
+
+from api import async_views
+from api.serializers import StudioTokenObtainPairSerializer
+from users.async_views import token_view
+from users.serializers import LoginSerializer, UserTokenObtainPairSerializer
+
+from .urls import urlpatterns as sync_urlpatterns
+
+app_name = 'booking'
+
+
+urlpatterns = [
+    path('login/', token_view(LoginSerializer, 'login'), name='token_obtain_pair'),
+    path('users/token/', token_view(UserTokenObtainPairSerializer, 'token'), name='token_obtain_pair'),
+    path('api/token/', token_view(StudioTokenObtainPairSerializer, 'token'), name='token_obtain_pair'),
+    path('api/reservations/', async_views.reservation_list_view),
+    path('api/reservations/<int:pk>/', async_views.reservation_detail_view),
+    path('api/studios/', async_views.studio_list_view),
+    path('api/studios/<int:pk>/availability/', async_views.studio_availability_view),
+] + sync_urlpatterns
@@ -0,0 +1,23 @@
+"""Module for the per-connection tuning of the database profiles.
+
+SQLite keeps most of its tuning per connection rather than per database file, so `configure_sqlite` applies
+`BOOKING_SQLITE_PRAGMAS` to every connection as it is opened. Server databases need no per-connection setup.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Applies `BOOKING_SQLITE_PRAGMAS` to a new SQLite connection. Connected to `connection_created`.
+
+    The pragmas run on the driver's connection, bypassing Django's cursor, so they are not counted among the queries
+    of the request that happened to open the connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for pragma, value in settings.BOOKING_SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}').close()
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='booking.database.configure_sqlite')
@@ -0,0 +1,254 @@
+"""Module for the per-request timing instrumentation of the project.
+
+`RequestTimingMiddleware` records, for every request, how many SQL queries ran and how long they took, how long
+serializers spent building representations, how long the view ran and how long its response took to render.
+Requests slower than `BOOKING_SLOW_REQUEST_MS` are logged as a warning on the `booking.timing` logger, one JSON line
+with their full SQL, and at its INFO level every request is logged without the SQL. With `DEBUG` or
+`BOOKING_SERVER_TIMING` on, the figures are also sent back in a `Server-Timing` header. Finding where in the project a
+query came from takes a walk of the stack, so it is only done for the queries worth chasing: those that ran for at
+least `BOOKING_SLOW_QUERY_MS` and those whose SQL ran `BOOKING_DUPLICATE_QUERY_COUNT` times or more in the request,
+the mark of a query issued in a loop.
+
+The timings of a request live in a context variable, which follows the request into the threads that run its
+synchronous code under ASGI, so queries are attributed to the right request even on a shared connection.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger('booking.timing')
+
+_current = ContextVar('request_timings', default=None)
+
+MAX_RECORDED_QUERIES = 200
+
+
+class RequestTimings:
+    """The timings collected for one request.
+
+    Attributes:
+        queries (int): The number of SQL queries run.
+        db (float): The time spent in the database, in seconds.
+        spans (dict): The time spent in each named span, such as `serialize`, in seconds.
+        sql (list): The SQL, duration and origin of the first `MAX_RECORDED_QUERIES` queries; the origin is None
+                    for a query that was neither slow nor repeated.
+        runs (dict): How many times each recorded SQL statement ran.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        self.sql = []
+        self.runs = {}
+        self._open = set()
+
+
+def record_query(execute, sql, params, many, context):
+    """Runs a query, timing it for the current request if there is one. Installed as a connection execute wrapper."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        timings.queries += 1
+        timings.db += duration
+        if len(timings.sql) < MAX_RECORDED_QUERIES:
+            runs = timings.runs[sql] = timings.runs.get(sql, 0) + 1
+            worth_chasing = (duration * 1000 >= settings.BOOKING_SLOW_QUERY_MS
+                             or runs >= settings.BOOKING_DUPLICATE_QUERY_COUNT)
+            timings.sql.append((sql, duration, _origin() if worth_chasing else None))
+
+
+def install_query_recorder(connection, **kwargs):
+    """Adds `record_query` to the execute wrappers of a database connection, once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+def _origin():
+    """Returns the `file:line` of the innermost project frame on the stack, outside this module and libraries."""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and 'site-packages' not in filename and filename != __file__:
+            return f'{filename[len(base) + 1:]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the enclosed block to the named span of the current request.
+
+    Nested blocks of the same span are only counted once, by the outermost block. Outside a request, or with the
+    middleware disabled, the block runs untimed.
+
+    Args:
+        name (str): The name of the span, reported in the `Server-Timing` header.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] = timings.spans.get(name, 0.0) + time.perf_counter() - start
+        timings._open.discard(name)
+
+
+def _timed_representation(serializer, representation, instance):
+    """Calls a `to_representation` method, adding its duration to the `serialize` span of the current request.
+
+    It is called for every serialized object, so it inlines `timed` rather than entering a context manager.
+    """
+    timings = _current.get()
+    if timings is None or 'serialize' in timings._open:
+        return representation(instance)
+    timings._open.add('serialize')
+    start = time.perf_counter()
+    try:
+        return representation(instance)
+    finally:
+        timings.spans['serialize'] = timings.spans.get('serialize', 0.0) + time.perf_counter() - start
+        timings._open.discard('serialize')
+
+
+class TimedListSerializer(ListSerializer):
+    """List serializer that reports the time spent building a list representation as the `serialize` span."""
+
+    def to_representation(self, data):
+        return _timed_representation(self, super().to_representation, data)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin that reports the time spent building representations as the `serialize` span.
+
+    Lists are timed once as a whole by `TimedListSerializer`, which the mixin makes the serializer's list
+    serializer class unless its `Meta` names another one.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    def to_representation(self, instance):
+        return _timed_representation(self, super().to_representation, instance)
+
+
+class RequestTimingMiddleware:
+    """Middleware that measures the database, serializer, view and render time of each request.
+
+    It should be the first entry of `MIDDLEWARE`, so the total covers the other middleware too. It runs natively
+    in both the WSGI and the ASGI request path, so it never forces a thread switch onto async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened from now on get the recorder through `connection_created`; these may already be open.
+        for connection in connections.all():
+            install_query_recorder(connection)
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's MiddlewareMixin does, and give the handler
+            # async hooks so it does not wrap them in a thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_query_recorder(connection)
+        timings, token, start = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token, start = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    @staticmethod
+    def _start(request):
+        timings = RequestTimings()
+        request._timing_marks = {}
+        return timings, _current.set(timings), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, timings, start):
+        """Adds the Server-Timing header to a response, if enabled, and logs the timings of its request."""
+        total = time.perf_counter() - start
+        marks = request._timing_marks
+        view_start = marks.get('view_start', start)
+        view_end = marks.get('view_end', start + total)
+        metrics = {
+            'db': timings.db,
+            'serialize': timings.spans.get('serialize', 0.0),
+            'view': view_end - view_start if 'view_start' in marks else 0.0,
+            'render': start + total - view_end if 'view_end' in marks else 0.0,
+            'total': total,
+        }
+        if settings.DEBUG or settings.BOOKING_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={seconds * 1000:.1f}' + (f';desc="{timings.queries} queries"' if name == 'db' else '')
+                for name, seconds in metrics.items())
+
+        slow = total * 1000 >= settings.BOOKING_SLOW_REQUEST_MS
+        if not (logger.isEnabledFor(logging.INFO) or slow and logger.isEnabledFor(logging.WARNING)):
+            return response
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in metrics.items()},
+        }
+        logger.info(json.dumps(record))
+        if slow:
+            record['sql'] = [{'sql': sql, 'ms': round(duration * 1000, 2), 'origin': origin}
+                             for sql, duration, origin in timings.sql]
+            logger.warning(json.dumps(record))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_marks['view_start'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns a response that still has to be rendered, such as a DRF Response.
+        request._timing_marks['view_end'] = time.perf_counter()
+        return response
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return RequestTimingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def _aprocess_template_response(self, request, response):
+        return RequestTimingMiddleware.process_template_response(self, request, response)
@@ -0,0 +1,150 @@
+"""Module for the keyset pagination used by the list endpoints of the project."""
+
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination that seeks on every ordering field instead of the first one plus an offset.
+
+    The ordering must end with a unique field, so a position identifies exactly one row and a page is fetched with
+    one range query that costs the same at any depth. No count query is ever run.
+
+    Attributes:
+        ordering (tuple): The fields that order the list and make up a cursor position.
+        page_size_query_param (str): The query parameter a client may use to choose the page size.
+        max_page_size (int): The largest page size a client may request, which bounds the memory of a response.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page of the queryset that follows, or precedes, the position in the request's cursor.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            request (Request): The current request.
+            view (APIView): The view being paginated.
+
+        Returns:
+            list: The objects of the page, in list order.
+
+        Raises:
+            NotFound: If the cursor cannot be decoded.
+        """
+        return self._set_page(list(self._page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Return the page of the queryset like `paginate_queryset`, fetching it with the async ORM.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            request (Request): The current request.
+            view (APIView): The view being paginated.
+
+        Returns:
+            list: The objects of the page, in list order.
+
+        Raises:
+            NotFound: If the cursor cannot be decoded.
+        """
+        return self._set_page([obj async for obj in self._page_queryset(queryset, request, view)])
+
+    def _page_queryset(self, queryset, request, view):
+        """Decode the request's cursor and return the query for the page it points at, plus one look-ahead row."""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        self._reverse = self.cursor is not None and self.cursor.reverse
+        self._position = self._decode_position(self.cursor.position, queryset.model) if self.cursor else None
+        ordering = [self._flip(field) for field in self.ordering] if self._reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self._position is not None:
+            queryset = queryset.filter(self._after(ordering, self._position))
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        """Keep the page out of the fetched rows and work out whether pages follow or precede it."""
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+        if self._reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self._position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self._position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        """Return the link to the page after the current one, or None if it is the last page."""
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        """Return the link to the page before the current one, or None if it is the first page."""
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Encode the values of the ordering fields of an object, or of a `.values()` row, as a JSON list."""
+        if isinstance(instance, dict):
+            values = (instance[field.lstrip('-')] for field in ordering)
+        else:
+            values = (getattr(instance, field.lstrip('-')) for field in ordering)
+        return json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+
+    def _decode_position(self, position, model):
+        """Decode a position encoded by `_get_position_from_instance` into values of the model's ordering fields.
+
+        Every value is converted by its field, so a tampered cursor is rejected here rather than failing in the
+        query it would be filtered on.
+
+        Raises:
+            NotFound: If the position does not fit the ordering or a value is not valid for its field.
+        """
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering) or None in values:
+                raise ValueError(position)
+            return [model._meta.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(self.ordering, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _after(ordering, position):
+        """Build the filter for the rows strictly after a position in an ordering.
+
+        For an ordering (a, b, c) this is `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`, with the
+        comparison flipped for descending fields, which the database answers as one index range scan.
+        """
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            term = Q(**{name + ('__lt' if field.startswith('-') else '__gt'): position[i]})
+            for previous, value in zip(ordering[:i], position[:i]):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return condition
+
+
+class ReservationCursorPagination(KeysetCursorPagination):
+    """Keyset pagination of reservations in booking order."""
+    ordering = ('date', 'time', 'id')
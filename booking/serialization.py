@@ -0,0 +1,187 @@
+"""Module for the read-only fast path of the list endpoints of the project.
+
+A `ValuesSerializer` produces the same representation as a `ModelSerializer`, but straight from `.values()` rows:
+the serializer's fields are inspected once and turned into a plan of plain converters, such as `date.isoformat`
+for dates and nothing at all for integers, strings and foreign key IDs. No model instances or field objects are
+built per row, and a many-to-many field is read from its through table in one extra query per page.
+"""
+
+from datetime import date, time
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+
+# Fields whose representation of a value read from the database is the value itself.
+_IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+def _is_iso(field, setting):
+    output_format = getattr(field, 'format', getattr(api_settings, setting))
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+
+def _readable_from_values(field):
+    """Returns whether the representation of a field can be built from the `.values()` column of its source."""
+    if field.source in ('*', '') or '.' in field.source or isinstance(field, serializers.BaseSerializer):
+        return False
+    if isinstance(field, ManyRelatedField):
+        return isinstance(field.child_relation, PrimaryKeyRelatedField)
+    return not isinstance(field, serializers.RelatedField) or isinstance(field, PrimaryKeyRelatedField)
+
+
+def _converter(field):
+    """Returns the function that turns a non-null database value into a field's representation, or None if the
+    value is its own representation."""
+    if isinstance(field, PrimaryKeyRelatedField):
+        return field.pk_field.to_representation if field.pk_field is not None else None
+    if isinstance(field, serializers.DateField) and _is_iso(field, 'DATE_FORMAT'):
+        return date.isoformat
+    if isinstance(field, serializers.TimeField) and _is_iso(field, 'TIME_FORMAT'):
+        return time.isoformat
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """Read-only serializer that builds the representation of a `ModelSerializer` from `.values()` rows.
+
+    Its output is identical to the `ModelSerializer`'s for the fields it supports: model fields, foreign keys and
+    many-to-many fields represented as primary keys. Serializers with other fields, such as method fields, nested
+    serializers or dotted sources, are rejected when the plan is compiled.
+
+    Args:
+        serializer_class (type): The `ModelSerializer` subclass to mirror.
+        fields (iterable): The names of the fields to represent, or None for all of them.
+
+    Attributes:
+        columns (tuple): The `.values()` columns the rows must hold.
+    """
+    def __init__(self, serializer_class, fields=None):
+        model = serializer_class.Meta.model
+        self._plan = []
+        self._many = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only or fields is not None and name not in fields:
+                continue
+            if not _readable_from_values(field):
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} cannot be read from .values() rows.')
+            if isinstance(field, ManyRelatedField):
+                relation = model._meta.get_field(field.source)
+                through = relation.remote_field.through
+                source = through._meta.get_field(relation.m2m_field_name()).attname
+                target = through._meta.get_field(relation.m2m_reverse_field_name()).attname
+                self._many.append((name, through, source, target, _converter(field.child_relation)))
+                self._plan.append((name, None, None))
+            else:
+                self._plan.append((name, field.source, _converter(field)))
+        self._pk = model._meta.pk.attname
+        self.columns = tuple(column for _, column, _ in self._plan if column is not None)
+        if self._many and self._pk not in self.columns:
+            self.columns += (self._pk,)
+
+    def values(self, queryset, extra=()):
+        """Returns the `.values()` queryset of the columns the representation is built from.
+
+        Args:
+            queryset (QuerySet): The model queryset to read.
+            extra (iterable): Further columns the rows must hold, such as the ordering fields of a paginator.
+
+        Returns:
+            QuerySet: The queryset of `.values()` rows.
+        """
+        extra = [column for column in extra if column not in self.columns]
+        return queryset.prefetch_related(None).values(*self.columns, *extra)
+
+    def _represent(self, rows, many):
+        plan, pk = self._plan, self._pk
+        with timed('serialize'):
+            results = []
+            for row in rows:
+                representation = {}
+                for name, column, convert in plan:
+                    if column is None:
+                        representation[name] = many[name].get(row[pk], [])
+                        continue
+                    value = row[column]
+                    representation[name] = value if value is None or convert is None else convert(value)
+                results.append(representation)
+            return results
+
+    def _many_queries(self, rows):
+        if not self._many:
+            # The rows only hold the primary key when a many-to-many field needs it.
+            return
+        pks = [row[self._pk] for row in rows]
+        for name, through, source, target, convert in self._many:
+            query = through.objects.filter(**{f'{source}__in': pks}).order_by(source, target)
+            yield name, convert, query.values_list(source, target)
+
+    @staticmethod
+    def _group(pairs, convert):
+        grouped = {}
+        for pk, related in pairs:
+            grouped.setdefault(pk, []).append(related if convert is None else convert(related))
+        return grouped
+
+    def represent(self, rows):
+        """Builds the representation of each row, as `ModelSerializer(instances, many=True).data` would.
+
+        Args:
+            rows (iterable): The rows of the queryset returned by `values`.
+
+        Returns:
+            list: The representation of each row, in order.
+        """
+        rows = list(rows)
+        many = {name: self._group(query, convert) for name, convert, query in self._many_queries(rows)}
+        return self._represent(rows, many)
+
+    async def arepresent(self, rows):
+        """Builds the representation of each row like `represent`, reading many-to-many fields with the async ORM."""
+        many = {name: self._group([pair async for pair in query], convert)
+                for name, convert, query in self._many_queries(rows)}
+        return self._represent(rows, many)
+
+
+@lru_cache(maxsize=None)
+def values_serializer(serializer_class, fields=None):
+    """Returns the `ValuesSerializer` of a serializer class, compiled on first use.
+
+    Args:
+        serializer_class (type): The `ModelSerializer` subclass to mirror.
+        fields (tuple): The names of the fields to represent, or None for all of them.
+
+    Returns:
+        ValuesSerializer: The shared values serializer of the class and fields.
+    """
+    return ValuesSerializer(serializer_class, fields)
+
+
+class ValuesListMixin:
+    """Viewset mixin whose list action serializes the page from `.values()` rows.
+
+    The response body is identical to the one `ListModelMixin` builds with the viewset's serializer class, which
+    remains in use for every other action, and for lists whose `get_values_serializer` returns None.
+    """
+    def get_values_serializer(self):
+        """Returns the `ValuesSerializer` the list is built with, or None to build it with the serializer class."""
+        return values_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        if serializer is None:
+            return super().list(request, *args, **kwargs)
+        ordering = getattr(self.paginator, 'ordering', None)
+        extra = [field.lstrip('-') for field in ordering] if isinstance(ordering, (list, tuple)) else []
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()), extra)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.represent(page))
+        return Response(serializer.represent(queryset))
@@ -9,9 +9,12 @@ https://docs.djangoproject.com/en/4.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
-from datetime import timedelta
+import os
+from datetime import time, timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'booking.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,11 +79,62 @@ WSGI_APPLICATION = 'booking.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+#
+# BOOKING_DB_PROFILE, read from the environment, selects the database:
+# * 'sqlite' (the default): the db.sqlite3 file, tuned on every new connection with BOOKING_SQLITE_PRAGMAS by
+#   booking.database: write-ahead logging lets readers run alongside the writer, synchronous=NORMAL syncs at
+#   checkpoints rather than every commit, and writers wait up to busy_timeout milliseconds for the write lock
+#   instead of failing with "database is locked". The booking.sqlite3 backend begins every atomic block with the
+#   write lock, so a transaction that reads before it writes waits its turn too. Connections are kept, so their
+#   page cache and memory map stay warm.
+# * 'server': a database server, PostgreSQL by default, configured by the BOOKING_DB_* environment variables, with
+#   persistent connections that are health-checked before each request reuses them.
+
+BOOKING_DB_PROFILE = os.environ.get('BOOKING_DB_PROFILE', 'sqlite')
+
+if BOOKING_DB_PROFILE == 'server':
+    DATABASES = {
+        'default': {
+            'ENGINE': os.environ.get('BOOKING_DB_ENGINE', 'django.db.backends.postgresql'),
+            'NAME': os.environ.get('BOOKING_DB_NAME', 'booking'),
+            'USER': os.environ.get('BOOKING_DB_USER', ''),
+            'PASSWORD': os.environ.get('BOOKING_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BOOKING_DB_HOST', ''),
+            'PORT': os.environ.get('BOOKING_DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('BOOKING_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+elif BOOKING_DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'booking.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown BOOKING_DB_PROFILE {BOOKING_DB_PROFILE!r}; use 'sqlite' or 'server'.")
+
+BOOKING_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -104,10 +159,14 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Replace JWTAuthentication with users.authentication.ClaimsJWTAuthentication to authenticate requests from the role
+# claims in the access token, without a user query. Role versions are kept in the users_version table.
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'booking.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 SIMPLE_JWT = {
@@ -128,6 +187,116 @@ SIMPLE_JWT = {
 
 }
 
+# Booking
+# The opening hours and slot length new studios get unless they set their own, the widest date range one
+# availability query may span, the largest batch one bulk reservation request may create, and the most occurrences
+# and the most days from first to last occurrence of a recurring series.
+
+BOOKING_DAY_START = time(9, 0)
+BOOKING_DAY_END = time(21, 0)
+BOOKING_SLOT_MINUTES = 60
+BOOKING_AVAILABILITY_MAX_DAYS = 31
+BOOKING_BULK_MAX_ITEMS = 500
+BOOKING_SERIES_MAX_OCCURRENCES = 104
+BOOKING_SERIES_MAX_DAYS = 731
+
+# How many reservations an export reads from the database, and writes out, at a time.
+BOOKING_EXPORT_CHUNK_SIZE = 2000
+
+# Slot holds
+# A hold keeps a slot for one client for BOOKING_HOLD_SECONDS until it is confirmed into a reservation. Holds live in
+# the BOOKING_HOLD_CACHE cache, which every worker must share: Redis or Memcached in production, or a DatabaseCache
+# table where neither is available. The default local-memory cache only suits a single process. A client that loses
+# the race for a slot is offered up to BOOKING_HOLD_ALTERNATIVES free slots of the same day instead.
+BOOKING_HOLD_CACHE = 'default'
+BOOKING_HOLD_SECONDS = 120
+BOOKING_HOLD_ALTERNATIVES = 5
+
+# Waitlist
+# The promote_waitlist command promotes this many days at a time.
+BOOKING_WAITLIST_BATCH_SIZE = 100
+
+# Job queue
+# Workers of `manage.py run_jobs` claim up to BOOKING_JOB_BATCH_SIZE due jobs at a time and poll for new ones every
+# BOOKING_JOB_POLL_INTERVAL seconds when idle. A failed job is retried after BOOKING_JOB_RETRY_BACKOFF seconds,
+# doubled on every further failure up to BOOKING_JOB_RETRY_MAX_DELAY, until it has been tried
+# BOOKING_JOB_MAX_ATTEMPTS times. A job still running after BOOKING_JOB_LOCK_TIMEOUT seconds is assumed to have lost
+# its worker and is claimed again.
+BOOKING_JOB_BATCH_SIZE = 50
+BOOKING_JOB_POLL_INTERVAL = 1.0
+BOOKING_JOB_RETRY_BACKOFF = 5
+BOOKING_JOB_RETRY_MAX_DELAY = 3600
+BOOKING_JOB_MAX_ATTEMPTS = 5
+BOOKING_JOB_LOCK_TIMEOUT = 300
+
+# Studio search
+# A search needs at least BOOKING_SEARCH_MIN_LENGTH characters and returns at most BOOKING_SEARCH_MAX_RESULTS studios.
+# A studio matches a query with typos when its name holds at least BOOKING_SEARCH_SIMILARITY of the query's trigrams.
+# Only the first BOOKING_SEARCH_CANDIDATES matches of a term are ranked, which bounds the cost of common prefixes.
+BOOKING_SEARCH_MIN_LENGTH = 2
+BOOKING_SEARCH_MAX_RESULTS = 20
+BOOKING_SEARCH_SIMILARITY = 0.5
+BOOKING_SEARCH_CANDIDATES = 1000
+
+# How long, in seconds, a cached studio representation is kept. Changes to studios invalidate it immediately.
+BOOKING_STUDIO_CACHE_TIMEOUT = 300
+
+# Password hashing under ASGI
+# The async token views hash passwords on this many worker threads, with at most this many more logins waiting;
+# logins beyond that are refused with a 503.
+
+BOOKING_HASH_WORKERS = 4
+BOOKING_HASH_QUEUE_DEPTH = 16
+
+# Credential throttling
+# Signup, login and the token views take a token per call from a bucket of the client IP and one of the submitted
+# username. BOOKING_THROTTLE_RATES gives each kind of bucket its capacity, the largest burst it admits, and the tokens
+# it regains per second; a kind set to None is not checked. The buckets live in process memory, over
+# BOOKING_THROTTLE_SHARDS shards holding up to BOOKING_THROTTLE_MAX_KEYS buckets, or with BOOKING_THROTTLE_BACKEND
+# set to 'cache' in the BOOKING_THROTTLE_CACHE cache, which all workers then share. Admin users can read the counts
+# of admitted and refused calls of a worker at /throttles/.
+BOOKING_THROTTLE_BACKEND = 'memory'
+BOOKING_THROTTLE_CACHE = 'default'
+BOOKING_THROTTLE_SHARDS = 16
+BOOKING_THROTTLE_MAX_KEYS = 100000
+BOOKING_THROTTLE_RATES = {
+    'ip': (30, 1.0),
+    'username': (5, 1 / 60),
+}
+
+# Request timing
+# Requests slower than BOOKING_SLOW_REQUEST_MS are logged as warnings on the booking.timing logger with their query
+# count, their database, serializer, view and render times and their full SQL. Lowering the logger to INFO logs every
+# request without its SQL.
+
+BOOKING_SLOW_REQUEST_MS = 500
+
+# The same times are sent to the client in a Server-Timing header when DEBUG or BOOKING_SERVER_TIMING is on. They tell
+# anyone who can make a request how the server spends its time, so the header is left off in production.
+BOOKING_SERVER_TIMING = False
+
+# Finding where in the project a logged query came from walks the stack, so it is only done for a query that ran for
+# at least BOOKING_SLOW_QUERY_MS, or whose SQL ran at least BOOKING_DUPLICATE_QUERY_COUNT times in the request.
+BOOKING_SLOW_QUERY_MS = 50
+BOOKING_DUPLICATE_QUERY_COUNT = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'booking.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -0,0 +1,8 @@
+"""
+Django settings for booking project under ASGI.
+
+They are the settings of `booking.settings` with the URLconf that serves the async token views.
+"""
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'booking.asgi_urls'
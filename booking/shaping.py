@@ -0,0 +1,166 @@
+"""Module for the response shaping of the read endpoints of the project.
+
+Clients choose the fields of a response with `?fields=name,date` and inline related objects instead of their IDs
+with `?expand=studio,customer`. The queryset is planned from the shaped serializer itself: `only()` loads just the
+columns it reads, `select_related` joins the objects it inlines and `prefetch_related` loads its to-many relations
+in one query each, so no shape makes the number of queries grow with the number of rows.
+"""
+
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+from .serialization import values_serializer
+
+
+class ShapedSerializerMixin:
+    """Serializer mixin that drops fields and inlines related objects on request.
+
+    The relations that may be inlined are listed in `Meta.expandable`, which maps a relation field to the
+    serializer class that represents the related objects.
+
+    Args:
+        fields (iterable): The names of the fields to keep, or None to keep them all. Expanded fields are kept.
+        expand (iterable): The names of the relation fields to inline.
+    """
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = getattr(self.Meta, 'expandable', {})
+        for name in expand:
+            many = isinstance(self.fields[name], ManyRelatedField)
+            self.fields[name] = expandable[name](many=many, read_only=True)
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields and name not in expand:
+                    self.fields.pop(name)
+
+
+@lru_cache(maxsize=None)
+def _field_names(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+def _split(value):
+    return [name for name in (value or '').split(',') if name]
+
+
+def plan_queryset(queryset, serializer, extra=()):
+    """Restricts a queryset to what a serializer reads and joins or prefetches every relation it follows.
+
+    Args:
+        queryset (QuerySet): The queryset of the objects the serializer represents.
+        serializer (Serializer): The serializer, already shaped.
+        extra (iterable): Further fields that must be loaded, such as the ordering fields of a paginator.
+
+    Returns:
+        QuerySet: The planned queryset. If the serializer reads anything but model fields, all columns are loaded.
+    """
+    only, select, prefetch = _plan(queryset.model, serializer, '')
+    queryset = queryset.select_related(*select) if select else queryset
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(queryset.model._meta.pk.name, *only, *extra)
+    return queryset
+
+
+def _plan(model, serializer, prefix):
+    """Returns the `only()` fields, or None for all of them, the `select_related` paths and the `Prefetch` objects
+    of a serializer's fields."""
+    only, select, prefetch = [], [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source in ('*', '') or '.' in field.source or isinstance(field, serializers.SerializerMethodField):
+            only = None
+            continue
+        path = prefix + field.source
+        relation = model._meta.get_field(field.source)
+        if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+            prefetch.append(Prefetch(path, queryset=_related_queryset(relation, field)))
+        elif isinstance(field, serializers.BaseSerializer):
+            nested_only, nested_select, nested_prefetch = _plan(relation.related_model, field, path + '__')
+            select += [path, *nested_select]
+            prefetch += nested_prefetch
+            if only is not None and nested_only is not None:
+                only += [path, *nested_only]
+            else:
+                only = None
+        elif isinstance(field, RelatedField) and not relation.many_to_one:
+            only = None
+        elif only is not None:
+            only.append(path)
+    return only, select, prefetch
+
+
+def _related_queryset(relation, field):
+    """Returns the queryset that prefetches a to-many relation for a field, in primary key order."""
+    related = relation.related_model
+    queryset = related._default_manager.order_by(related._meta.pk.name)
+    # A reverse foreign key is matched to its objects through the foreign key, which must be loaded.
+    extra = [relation.field.name] if relation.one_to_many else []
+    if isinstance(field, serializers.ListSerializer):
+        return plan_queryset(queryset, field.child, extra)
+    return queryset.only(related._meta.pk.name, *extra)
+
+
+class ShapedViewSetMixin:
+    """Viewset mixin that shapes the read responses of a viewset with `?fields=` and `?expand=`.
+
+    The serializer class must use `ShapedSerializerMixin`. Only safe methods are shaped; writes always use the full
+    serializer. Unknown field names are rejected with a 400 response.
+    """
+    def get_shape(self):
+        """Returns the fields and expansions requested for the current request.
+
+        Returns:
+            tuple: The requested field names, or None for all fields, and the relation names to expand.
+
+        Raises:
+            ValidationError: If a field is unknown or a relation cannot be expanded.
+        """
+        if self.request.method not in SAFE_METHODS:
+            return None, ()
+        if not hasattr(self, '_shape'):
+            serializer_class = self.get_serializer_class()
+            fields, expand = _split(self.request.query_params.get('fields')), \
+                _split(self.request.query_params.get('expand'))
+            errors = {}
+            unknown = [name for name in fields if name not in _field_names(serializer_class)]
+            if unknown:
+                errors['fields'] = [f"Unknown fields: {', '.join(unknown)}."]
+            expandable = getattr(serializer_class.Meta, 'expandable', {})
+            unknown = [name for name in expand if name not in expandable]
+            if unknown:
+                errors['expand'] = [f"Cannot expand: {', '.join(unknown)}."]
+            if errors:
+                raise ValidationError(errors)
+            self._shape = (fields or None, tuple(dict.fromkeys(expand)))
+        return self._shape
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_shape()
+        if fields is not None or expand:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        ordering = getattr(self.paginator, 'ordering', None) if self.action == 'list' else None
+        extra = [field.lstrip('-') for field in ordering] if isinstance(ordering, (list, tuple)) else []
+        return plan_queryset(queryset, self.get_serializer(), extra)
+
+    def get_values_serializer(self):
+        """Returns the `.values()` serializer of the requested shape, or None if it inlines related objects."""
+        fields, expand = self.get_shape()
+        if expand:
+            return None
+        if fields is None:
+            return super().get_values_serializer()
+        return values_serializer(self.get_serializer_class(), tuple(fields))
@@ -0,0 +1,25 @@
+"""Module for the SQLite backend of the 'sqlite' database profile.
+
+It is Django's SQLite backend with the `transaction_mode` option, which Django only gains in 5.1: with
+`'transaction_mode': 'IMMEDIATE'` in `OPTIONS`, every atomic block takes the write lock when it begins. A deferred
+transaction takes it only at its first write, and if another writer committed since the transaction's first read,
+SQLite refuses the upgrade at once with "database is locked" rather than waiting out the busy timeout.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {mode!r}.")
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode.upper()}' if mode else 'BEGIN')
@@ -17,7 +17,7 @@ from django.contrib import admin
 from django.urls import path, include
 
 from api.views import StudioTokenObtainPairView
-from users.views import SignUpView, LoginView, UserTokenObtainPairView
+from users.views import SignUpView, LoginView, UserTokenObtainPairView, ThrottleCountersView
 
 app_name = 'booking'
 
@@ -27,6 +27,7 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='token_obtain_pair'),
     path('users/token/', UserTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/', StudioTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('throttles/', ThrottleCountersView.as_view(), name='throttle_counters'),
 
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
@@ -0,0 +1,60 @@
+"""Module for the async token views served under ASGI.
+
+The credential check of each view, which hashes the submitted password, runs on the bounded password executor
+instead of the request's thread, and a login is refused with a 503 when that executor is saturated. Before that,
+calls are throttled per client IP and username like the sync token views, and refused with a 429.
+"""
+
+import json
+import math
+
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from .executor import ExecutorSaturated, get_password_executor
+from .throttling import check_credentials_call, submitted_username
+
+
+def token_view(serializer_class, throttle_scope):
+    """Builds an async view that validates credentials with a token serializer and returns its tokens.
+
+    Args:
+        serializer_class (type): The serializer that checks the credentials and issues the tokens, such as
+                                 `LoginSerializer` or a `TokenObtainPairSerializer`.
+        throttle_scope (str): The scope the view's calls are throttled and counted under.
+
+    Returns:
+        callable: The async view, which accepts POST requests with a JSON or form body.
+    """
+    async def view(request):
+        if request.method != 'POST':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+        else:
+            data = request.POST.dict()
+
+        wait = check_credentials_call(throttle_scope, BaseThrottle().get_ident(request), submitted_username(data))
+        if wait:
+            return JsonResponse({'detail': 'Request was throttled.'}, status=429,
+                                headers={'Retry-After': str(math.ceil(wait))})
+
+        serializer = serializer_class(data=data, context={'request': request})
+        try:
+            valid = await get_password_executor().run(serializer.is_valid)
+        except ExecutorSaturated:
+            return JsonResponse({'detail': 'Too many logins in progress, please retry.'}, status=503,
+                                headers={'Retry-After': '1'})
+        except APIException as e:
+            return JsonResponse({'detail': e.detail}, status=e.status_code)
+        if not valid:
+            return JsonResponse(serializer.errors, status=400)
+        return JsonResponse(serializer.validated_data)
+
+    view.csrf_exempt = True
+    view.__name__ = f'{serializer_class.__name__}_async_view'
+    return view
@@ -1,5 +1,13 @@
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .versions import aget_versions, bump_versions, get_versions
 
 User = get_user_model()
 
@@ -38,3 +46,158 @@ class EmailBackend(BaseBackend):
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
             return None
+
+
+ROLE_VERSION_KEY = 'role:{}'
+
+
+def get_role_version(user_id):
+    """Returns the current role version of a user.
+
+    The version changes whenever anything that decides what a user may access changes, which makes every token
+    issued before the change fall back to a database lookup in `ClaimsJWTAuthentication`. It is a counter of
+    `users.versions`, so every worker reads the same value.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The role version.
+    """
+    key = ROLE_VERSION_KEY.format(user_id)
+    return get_versions([key])[key]
+
+
+async def aget_role_version(user_id):
+    """Returns the current role version of a user like `get_role_version`, from an async caller."""
+    key = ROLE_VERSION_KEY.format(user_id)
+    return (await aget_versions([key]))[key]
+
+
+def bump_role_version(user_id):
+    """Increments a user's role version, in the current transaction if there is one.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        None
+    """
+    bump_versions([ROLE_VERSION_KEY.format(user_id)])
+
+
+def role_claims(user):
+    """Builds the token claims that describe what a user may access.
+
+    Args:
+        user (User): The user to build the claims for.
+
+    Returns:
+        dict: The role flags, the IDs of the studios the user owns or works at, and the role version.
+    """
+    studio_ids = set()
+    if user.is_studio_owner:
+        studio_ids.update(user.studios.values_list('id', flat=True))
+    if user.is_employee:
+        studio_ids.update(user.studioemployee_set.values_list('studio_id', flat=True))
+    return {
+        'is_studio_owner': user.is_studio_owner,
+        'is_employee': user.is_employee,
+        'is_customer': user.is_customer,
+        'studio_ids': sorted(studio_ids),
+        'role_version': get_role_version(user.id),
+    }
+
+
+class RoleRefreshToken(RefreshToken):
+    """A refresh token that carries the user's role claims, which its access tokens copy."""
+
+    @classmethod
+    def for_user(cls, user):
+        """Returns a refresh token for a user with the user's role claims added.
+
+        Args:
+            user (User): The user to issue the token for.
+
+        Returns:
+            RoleRefreshToken: The refresh token.
+        """
+        token = super().for_user(user)
+        for claim, value in role_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """An opt-in JWT authentication that builds the request user from the token's role claims.
+
+    While the role version in the token is still the user's current one, the user is a `TokenUser` backed by the
+    claims and no user query runs; `is_studio_owner`, `is_employee`, `is_customer` and `studio_ids` are read
+    from the token. Tokens without role claims, or issued before a role change, are authenticated from the
+    database as usual. The role versions are kept in the database, so a role change in one worker is seen by the
+    others.
+    """
+    def get_user(self, validated_token):
+        """Returns the user of a validated token, from its claims when they are still current.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Returns:
+            TokenUser | User: The claims-backed user, or the user loaded from the database.
+        """
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is not None and validated_token.get('role_version') == get_role_version(user_id):
+            return jwt_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
+
+
+def get_jwt_authenticator():
+    """Returns an instance of the first JWT authentication class in the DRF settings.
+
+    Returns:
+        JWTAuthentication: The configured JWT authentication, or a plain `JWTAuthentication` if none is configured.
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        if issubclass(authentication_class, JWTAuthentication):
+            return authentication_class()
+    return JWTAuthentication()
+
+
+async def aauthenticate(request):
+    """Authenticates the JWT of a request from an async view, as the configured JWT authentication would.
+
+    Decoding the token needs no I/O and runs inline; the user is taken from the token's claims when the configured
+    authentication is `ClaimsJWTAuthentication` and they are current, and from the async ORM otherwise.
+
+    Args:
+        request (HttpRequest): The current request.
+
+    Returns:
+        tuple | None: The user and the validated token, or None if the request carries no token.
+
+    Raises:
+        InvalidToken: If the token is invalid, expired or names no user.
+        AuthenticationFailed: If the user of the token does not exist or is inactive.
+    """
+    authenticator = get_jwt_authenticator()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    validated_token = authenticator.get_validated_token(raw_token)
+
+    user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+    if user_id is None:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+    if (isinstance(authenticator, ClaimsJWTAuthentication)
+            and validated_token.get('role_version') == await aget_role_version(user_id)):
+        return jwt_settings.TOKEN_USER_CLASS(validated_token), validated_token
+
+    try:
+        user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user, validated_token
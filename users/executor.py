@@ -0,0 +1,96 @@
+"""Module for the bounded worker pool that runs password hashing off the event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a task is submitted to a BoundedExecutor whose workers and queue are all taken."""
+
+
+class BoundedExecutor:
+    """A thread pool that refuses work instead of queueing it without limit.
+
+    At most `max_workers` tasks run at once and at most `max_queue` more wait for a worker; any task beyond that
+    is rejected immediately with `ExecutorSaturated`, so a burst cannot build up an unbounded backlog.
+
+    Attributes:
+        max_workers (int): The number of worker threads.
+        max_queue (int): The number of tasks that may wait for a worker.
+    """
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hasher')
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules a callable on the pool.
+
+        The worker closes its stale database connections after the call, as a request would.
+
+        Args:
+            fn (callable): The callable to run.
+            *args: Positional arguments for the callable.
+            **kwargs: Keyword arguments for the callable.
+
+        Returns:
+            Future: The future of the call.
+
+        Raises:
+            ExecutorSaturated: If every worker is busy and the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated()
+
+        def task():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        try:
+            future = self._pool.submit(task)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs a callable on the pool and waits for its result without blocking the event loop.
+
+        Args:
+            fn (callable): The callable to run.
+            *args: Positional arguments for the callable.
+            **kwargs: Keyword arguments for the callable.
+
+        Returns:
+            The return value of the callable.
+
+        Raises:
+            ExecutorSaturated: If every worker is busy and the queue is full.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+
+_password_executor = None
+_password_executor_lock = threading.Lock()
+
+
+def get_password_executor():
+    """Returns the process-wide executor for password hashing, sized by the `BOOKING_HASH_*` settings.
+
+    Returns:
+        BoundedExecutor: The password hashing executor.
+    """
+    global _password_executor
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                _password_executor = BoundedExecutor(settings.BOOKING_HASH_WORKERS, settings.BOOKING_HASH_QUEUE_DEPTH)
+    return _password_executor
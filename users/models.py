@@ -15,3 +15,16 @@ class User(AbstractUser):
     is_studio_owner = models.BooleanField(default=False)
     is_employee = models.BooleanField(default=False)
     is_customer = models.BooleanField(default=False)
+
+
+class Version(models.Model):
+    """A version counter of something other data is derived from, such as a user's role claims.
+
+    Counters are read and bumped through `users.versions`.
+
+    Attributes:
+        key (str): What the counter versions, e.g. `role:1`.
+        version (int): The number of times it changed.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
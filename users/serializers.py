@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 
+from booking.instrumentation import TimedSerializerMixin
+from booking.shaping import ShapedSerializerMixin
+from .authentication import RoleRefreshToken
 from .models import User
 
 
@@ -93,7 +95,7 @@ class LoginSerializer(serializers.Serializer):
             user = authenticate(username=username, password=password)
             if user:
                 if user.is_active:
-                    refresh = RefreshToken.for_user(user)
+                    refresh = RoleRefreshToken.for_user(user)
                     return {
                         'username': username,
                         'access': str(refresh.access_token),
@@ -107,7 +109,7 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Both fields are required.")
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(ShapedSerializerMixin, TimedSerializerMixin, ModelSerializer):
     """Serializer for User model.
 
     Attributes::
@@ -138,9 +140,13 @@ class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
         TokenObtainPairSerializer (class): A serializer that provides the token authentication view and validates
                                            user credentials.
 
+        token_class (RoleRefreshToken): The token class, which adds the user's role claims to the tokens.
+
     Methods:
         validate (function): Validates the user credentials and returns the validated data.
     """
+    token_class = RoleRefreshToken
+
     def validate(self, attrs):
         """Validates the user credentials and returns the validated data.
 
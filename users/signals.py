@@ -0,0 +1,22 @@
+"""Module for the signal receivers of the users app."""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .authentication import bump_role_version
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_role_claims(sender, instance, **kwargs):
+    """Bumps the role version of a saved user, so tokens carrying the old role claims are no longer trusted.
+
+    Args:
+        sender (type): The User model class.
+        instance (User): The user that was saved.
+        kwargs: Any additional arguments sent with the signal.
+
+    Returns:
+        None
+    """
+    bump_role_version(instance.id)
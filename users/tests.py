@@ -1,3 +1,182 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.models import Studio, StudioEmployee
+from .authentication import ClaimsJWTAuthentication, RoleRefreshToken, get_role_version
+from .executor import BoundedExecutor, ExecutorSaturated
+from .models import User
+from .throttling import throttle_counters
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """Checks that the role claims of a token are only trusted while the user's role version is current."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        self.authentication = ClaimsJWTAuthentication()
+
+    def authenticate(self, token):
+        return self.authentication.get_user(self.authentication.get_validated_token(str(token)))
+
+    def test_current_claims_are_trusted(self):
+        self.assertIsInstance(self.authenticate(RoleRefreshToken.for_user(self.user).access_token), TokenUser)
+
+    def test_role_change_makes_claims_stale(self):
+        token = RoleRefreshToken.for_user(self.user).access_token
+        self.user.is_studio_owner = False
+        self.user.save()
+        user = self.authenticate(token)
+        self.assertIsInstance(user, User)
+        self.assertFalse(user.is_studio_owner)
+
+    def test_role_version_rolls_back_with_the_change(self):
+        token = RoleRefreshToken.for_user(self.user).access_token
+        version = get_role_version(self.user.id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.user.is_studio_owner = False
+            self.user.save()
+            self.assertEqual(get_role_version(self.user.id), version + 1)
+            raise IntegrityError
+        self.assertEqual(get_role_version(self.user.id), version)
+        self.assertIsInstance(self.authenticate(token), TokenUser)
+
+    def test_deactivated_user_is_refused(self):
+        token = RoleRefreshToken.for_user(self.user).access_token
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+
+class CredentialThrottleTests(TestCase):
+    """Checks that credential calls past either bucket are refused with a 429 and told when to retry."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, username, ip='10.0.0.1'):
+        return self.client.post('/login/', {'username': username, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    @override_settings(BOOKING_THROTTLE_RATES={'ip': (2, 1 / 60), 'username': None})
+    def test_ip_bucket(self):
+        before = throttle_counters().get('login', {}).get('rejected_ip', 0)
+        self.assertEqual(self.login('first').status_code, 400)
+        self.assertEqual(self.login('second').status_code, 400)
+        self.assertThrottled(self.login('third'))
+        self.assertEqual(self.login('third', ip='10.0.0.2').status_code, 400)
+        self.assertEqual(throttle_counters()['login']['rejected_ip'], before + 1)
+
+    @override_settings(BOOKING_THROTTLE_RATES={'ip': None, 'username': (2, 1 / 60)})
+    def test_username_bucket(self):
+        before = throttle_counters().get('login', {}).get('rejected_username', 0)
+        self.assertEqual(self.login('victim', ip='10.0.0.1').status_code, 400)
+        self.assertEqual(self.login('victim', ip='10.0.0.2').status_code, 400)
+        # Case and padding variants of a username share one bucket, so they gain no extra attempts.
+        self.assertThrottled(self.login(' Victim', ip='10.0.0.3'))
+        self.assertEqual(self.login('other', ip='10.0.0.3').status_code, 400)
+        self.assertEqual(throttle_counters()['login']['rejected_username'], before + 1)
+
+    @override_settings(BOOKING_THROTTLE_BACKEND='cache', BOOKING_THROTTLE_RATES={'ip': (2, 1 / 60), 'username': None})
+    def test_cache_buckets(self):
+        self.assertEqual(self.login('first').status_code, 400)
+        self.assertEqual(self.login('second').status_code, 400)
+        response = self.login('third')
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']), 120)
+
+
+class BoundedExecutorTests(SimpleTestCase):
+    """Checks that the password executor refuses work beyond its workers and queue, and takes it again once free."""
+
+    def test_refuses_work_when_saturated(self):
+        executor = BoundedExecutor(max_workers=1, max_queue=1)
+        release, done = threading.Event(), threading.Semaphore(0)
+        futures = [executor.submit(release.wait, 5), executor.submit(release.wait, 5)]
+        with self.assertRaises(ExecutorSaturated):
+            executor.submit(release.wait, 5)
+        # Callbacks run in the order they were added, so these run once the futures have given back their slots.
+        for future in futures:
+            future.add_done_callback(lambda _: done.release())
+        release.set()
+        self.assertTrue(done.acquire(timeout=5) and done.acquire(timeout=5))
+        self.assertEqual(executor.submit(sum, [1, 2]).result(timeout=5), 3)
+
+
+@override_settings(BOOKING_THROTTLE_RATES={})
+class AsyncTokenViewTests(TransactionTestCase):
+    """Checks that the async token views answer as the sync ones do, and refuse logins while hashing is saturated.
+
+    The credentials are checked on the executor's threads, which only see committed rows.
+    """
+
+    def setUp(self):
+        owner = User.objects.create_user(username='owner', password='secret', is_studio_owner=True)
+        self.employee = User.objects.create_user(username='employee', password='secret', is_employee=True)
+        self.studio = Studio.objects.create(name='Studio', owner=owner)
+        StudioEmployee.objects.create(studio=self.studio, user=self.employee)
+
+    def post_async(self, path, data):
+        async def post():
+            return await AsyncClient().post(path, data, content_type='application/json')
+
+        with self.settings(ROOT_URLCONF='booking.asgi_urls'):
+            return async_to_sync(post)()
+
+    def comparable(self, response):
+        """Returns the status and body of a response, with each token replaced by its claims that do not vary."""
+        body = response.json()
+        for field, token_class in (('access', AccessToken), ('refresh', RefreshToken)):
+            if field in body:
+                body[field] = {claim: value for claim, value in token_class(body[field]).payload.items()
+                               if claim not in ('exp', 'iat', 'jti')}
+        return response.status_code, body
+
+    def test_same_answers_as_sync_views(self):
+        good = {'username': 'employee', 'password': 'secret'}
+        bad = {'username': 'employee', 'password': 'wrong'}
+        cases = {'/login/': [good, bad, {'username': 'employee'}],
+                 '/users/token/': [good, bad, {}],
+                 '/api/token/': [{**good, 'studio_id': self.studio.id}, {**bad, 'studio_id': self.studio.id}, good]}
+        for path, bodies in cases.items():
+            for body in bodies:
+                with self.subTest(path=path, body=body):
+                    sync = self.comparable(self.client.post(path, body, content_type='application/json'))
+                    self.assertEqual(self.comparable(self.post_async(path, body)), sync)
+        self.assertEqual(self.comparable(self.post_async('/login/', good))[0], 200)
+        self.assertEqual(self.comparable(self.post_async('/api/token/', {**good, 'studio_id': self.studio.id}))[1][
+            'access']['studio_id'], self.studio.id)
+
+    def test_saturated_executor_refuses_logins(self):
+        executor, release = BoundedExecutor(max_workers=1, max_queue=0), threading.Event()
+        executor.submit(release.wait, 5)
+        try:
+            with mock.patch('users.async_views.get_password_executor', return_value=executor):
+                response = self.post_async('/login/', {'username': 'employee', 'password': 'secret'})
+        finally:
+            release.set()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(BOOKING_THROTTLE_RATES={'ip': (1, 1 / 60), 'username': None})
+    def test_throttled_before_hashing(self):
+        body = {'username': 'employee', 'password': 'wrong'}
+        self.assertEqual(self.post_async('/login/', body).status_code, 400)
+        with mock.patch('users.async_views.get_password_executor') as executor:
+            response = self.post_async('/login/', body)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        executor.assert_not_called()
@@ -0,0 +1,201 @@
+"""Module for the token-bucket throttles of the credential endpoints: signup, login and the token views.
+
+Every call to these endpoints hashes a password, so a burst of credential stuffing would saturate the CPU. Each
+call first takes a token from two buckets, one per client IP and one per submitted username; a call that finds
+either bucket empty is refused with a 429 before any password is hashed or the database is touched.
+
+By default the buckets live in process memory, split over `BOOKING_THROTTLE_SHARDS` independently locked shards so
+concurrent requests rarely contend, each holding its most recently used buckets up to a share of
+`BOOKING_THROTTLE_MAX_KEYS`. With `BOOKING_THROTTLE_BACKEND = 'cache'` the limits are shared by all workers through
+the `BOOKING_THROTTLE_CACHE` cache instead. Plain cache operations cannot refill a bucket atomically, so there each
+bucket is approximated by a counter per window of `capacity / rate` seconds, taken with the cache's atomic `incr`.
+
+Admitted and refused calls are counted per endpoint in each process; `throttle_counters` reports them.
+"""
+
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from rest_framework.throttling import BaseThrottle
+
+BUCKET_KEY = 'users:throttle:{}:{}'
+
+
+class MemoryBuckets:
+    """Token buckets kept in process memory, sharded by key.
+
+    Args:
+        shards (int): The number of independently locked shards.
+        max_keys (int): The number of buckets kept across all shards; the least recently used bucket of a full
+                        shard is dropped, which refills it.
+    """
+    def __init__(self, shards, max_keys):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._max_keys = max(max_keys // shards, 1)
+
+    def take(self, key, capacity, rate):
+        """Takes a token from a bucket, refilled at `rate` tokens a second up to `capacity`.
+
+        Args:
+            key (str): The key of the bucket.
+            capacity (int): The most tokens the bucket holds, and so the largest burst it admits.
+            rate (float): The tokens added to the bucket per second.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until the bucket holds one.
+        """
+        lock, buckets = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, stamp = buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._max_keys:
+                buckets.popitem(last=False)
+        return wait
+
+
+class CacheBuckets:
+    """Token buckets shared through a cache, approximated by a counter per refill window.
+
+    Args:
+        alias (str): The alias of the cache, which every worker must share.
+    """
+    def __init__(self, alias):
+        self._alias = alias
+
+    def take(self, key, capacity, rate):
+        """Takes a token like `MemoryBuckets.take`, admitting at most `capacity` calls per `capacity / rate`
+        seconds."""
+        cache, window = caches[self._alias], capacity / rate
+        now = time.time()
+        counter = BUCKET_KEY.format(key, int(now // window))
+        cache.add(counter, 0, int(window) + 1)
+        try:
+            count = cache.incr(counter)
+        except ValueError:
+            # The counter expired between the add and the increment.
+            cache.add(counter, 1, int(window) + 1)
+            count = 1
+        return 0.0 if count <= capacity else window - now % window
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def get_buckets():
+    """Returns the process-wide bucket store chosen by the `BOOKING_THROTTLE_*` settings.
+
+    Returns:
+        MemoryBuckets | CacheBuckets: The bucket store.
+    """
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                if settings.BOOKING_THROTTLE_BACKEND == 'cache':
+                    _buckets = CacheBuckets(settings.BOOKING_THROTTLE_CACHE)
+                else:
+                    _buckets = MemoryBuckets(settings.BOOKING_THROTTLE_SHARDS, settings.BOOKING_THROTTLE_MAX_KEYS)
+    return _buckets
+
+
+@receiver(setting_changed)
+def reset_buckets(setting, **kwargs):
+    """Drops the bucket store when a `BOOKING_THROTTLE_*` setting is overridden, so the next call picks it up."""
+    global _buckets
+    if setting.startswith('BOOKING_THROTTLE_'):
+        _buckets = None
+
+
+def _count(scope, outcome):
+    with _counters_lock:
+        _counters[(scope, outcome)] += 1
+
+
+def throttle_counters():
+    """Returns the calls admitted and refused by this process since it started, per endpoint scope.
+
+    Returns:
+        dict: For each scope, the number of `admitted` calls and of calls refused by the `ip` and the `username`
+              bucket, as `rejected_ip` and `rejected_username`.
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    report = {}
+    for (scope, outcome), count in sorted(counters.items()):
+        report.setdefault(scope, {'admitted': 0, 'rejected_ip': 0, 'rejected_username': 0})[outcome] = count
+    return report
+
+
+def check_credentials_call(scope, ident, username):
+    """Takes a token from the IP bucket and, if a username was given, from the username bucket of a call.
+
+    A kind of bucket without a rate in `BOOKING_THROTTLE_RATES` is not checked.
+
+    Args:
+        scope (str): The endpoint the call is counted under, such as `login`.
+        ident (str): The client IP, or another identification of the client.
+        username (str): The submitted username, or None.
+
+    Returns:
+        float: 0 if the call is admitted, otherwise the seconds the client should wait before retrying.
+    """
+    buckets = get_buckets()
+    keys = [('ip', ident)]
+    if username:
+        keys.append(('username', username.strip().lower()))
+    for kind, value in keys:
+        if settings.BOOKING_THROTTLE_RATES.get(kind) is None:
+            continue
+        capacity, rate = settings.BOOKING_THROTTLE_RATES[kind]
+        wait = buckets.take(f'{kind}:{value}', capacity, rate)
+        if wait:
+            _count(scope, f'rejected_{kind}')
+            return wait
+    _count(scope, 'admitted')
+    return 0.0
+
+
+def submitted_username(data):
+    """Returns the username submitted in a request body, or None if there is none."""
+    username = data.get(get_user_model().USERNAME_FIELD) if hasattr(data, 'get') else None
+    return username if isinstance(username, str) else None
+
+
+class CredentialThrottle(BaseThrottle):
+    """Throttles a credential endpoint by client IP and by submitted username, with token buckets.
+
+    The endpoint is counted under the `throttle_scope` of its view. The view should not authenticate requests, so
+    a refused call does no work but parsing its body.
+    """
+    def allow_request(self, request, view):
+        """Takes the tokens of a call, remembering how long a refused client should wait.
+
+        Args:
+            request: The HTTP request.
+            view: The view the request is for.
+
+        Returns:
+            bool: True if the call is admitted.
+        """
+        self._wait = check_credentials_call(
+            getattr(view, 'throttle_scope', view.__class__.__name__), self.get_ident(request),
+            submitted_username(request.data))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,56 @@
+"""Module for the version counters that tell every worker whether what it derived from the database is current.
+
+Each counter is a row of the `Version` table, keyed by what it versions, such as the reservation list of a studio.
+A counter is bumped with a single upsert in the transaction of the change it records, so it commits or rolls back
+with the change, and every worker reads the same value without a cache to share. A counter that was never bumped
+reads as 0. The upsert is written as SQLite and PostgreSQL, the databases of the `BOOKING_DB_PROFILE` profiles,
+spell it.
+"""
+
+from django.db import connection
+
+from .models import Version
+
+
+def get_versions(keys):
+    """Returns the current value of some version counters, with one query.
+
+    Args:
+        keys (iterable): The keys of the counters.
+
+    Returns:
+        dict: The value of each counter, keyed by its key.
+    """
+    keys = list(keys)
+    versions = dict(Version.objects.filter(key__in=keys).values_list('key', 'version')) if keys else {}
+    return {key: versions.get(key, 0) for key in keys}
+
+
+async def aget_versions(keys):
+    """Returns the current value of some version counters like `get_versions`, from an async caller."""
+    keys = list(keys)
+    versions = {key: version async for key, version in Version.objects.filter(key__in=keys).values_list(
+        'key', 'version')} if keys else {}
+    return {key: versions.get(key, 0) for key in keys}
+
+
+def bump_versions(keys):
+    """Increments some version counters, creating the ones that do not exist yet, with one statement.
+
+    The counters are written in key order, so two transactions bumping overlapping counters cannot deadlock.
+
+    Args:
+        keys (iterable): The keys of the counters.
+
+    Returns:
+        None
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    quote = connection.ops.quote_name
+    table, key, version = quote(Version._meta.db_table), quote('key'), quote('version')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({key}, {version}) VALUES {', '.join(['(%s, 1)'] * len(keys))} "
+            f'ON CONFLICT ({key}) DO UPDATE SET {version} = {table}.{version} + 1', keys)
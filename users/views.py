@@ -1,46 +1,61 @@
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.generics import CreateAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from booking.shaping import ShapedViewSetMixin
 
 from .models import User
 from .serializers import UserTokenObtainPairSerializer, UserSerializer, SignupSerializer, LoginSerializer
+from .throttling import CredentialThrottle, throttle_counters
 
 
 class SignUpView(CreateAPIView):
     """View for creating a new user account.
 
-    POST requests to this view with valid user data will create a new user account.
+    POST requests to this view with valid user data will create a new user account. Calls are throttled per
+    client IP and username before the request is authenticated or the password hashed, which needs no
+    authentication at all.
 
     Attributes:
         queryset (QuerySet): A QuerySet containing all User objects.
         serializer_class (SignupSerializer): The serializer class used to serialize/deserialize user data.
         permission_classes (list): A list of permission classes that determine who can access this view.
+        throttle_classes (list): The token-bucket throttle of the credential endpoints.
 
     Methods:
         post(request, *args, **kwargs): Handle POST requests to create a new user account.
     """
     queryset = User.objects.all()
     serializer_class = SignupSerializer
+    authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [CredentialThrottle]
+    throttle_scope = 'signup'
 
 
 class LoginView(TokenObtainPairView):
     """View to obtain access and refresh JSON Web Tokens for authentication.
 
     Inherits from `TokenObtainPairView` and uses the `LoginSerializer` to validate user credentials and
-    return the JWT tokens upon successful authentication.
+    return the JWT tokens upon successful authentication. Calls are throttled per client IP and username.
 
     Attributes:
         serializer_class: The serializer class used for validating user credentials and obtaining tokens.
+        throttle_classes (list): The token-bucket throttle of the credential endpoints.
     """
     serializer_class = LoginSerializer
+    throttle_classes = [CredentialThrottle]
+    throttle_scope = 'login'
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(ShapedViewSetMixin, ModelViewSet):
     """A view set that handles CRUD operations for User objects.
 
+    Read responses can be trimmed with `?fields=`.
+
     Attributes:
         queryset (QuerySet): The set of User objects to be displayed and manipulated.
         serializer_class (UserSerializer): The serializer class to be used for serializing and deserializing User objects.
@@ -76,6 +91,7 @@ class UserTokenObtainPairView(TokenObtainPairView):
 
     Attributes:
         serializer_class: The serializer class to be used for validating the user's credentials.
+        throttle_classes (list): The token-bucket throttle of the credential endpoints.
 
     Returns:
         A JSON response containing the user's username, access token, and refresh token.
@@ -83,5 +99,28 @@ class UserTokenObtainPairView(TokenObtainPairView):
     Raises:
         HTTP 400 Bad Request: If the user's credentials are invalid.
         HTTP 401 Unauthorized: If the user is not authenticated.
+        HTTP 429 Too Many Requests: If the client IP or the username has run out of calls.
     """
     serializer_class = UserTokenObtainPairSerializer
+    throttle_classes = [CredentialThrottle]
+    throttle_scope = 'token'
+
+
+class ThrottleCountersView(APIView):
+    """View that reports the calls the credential throttles of this worker admitted and refused, for admins.
+
+    Attributes:
+        permission_classes (list): Only admin users may read the counters.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Return the counts of admitted and refused calls per credential endpoint since the worker started.
+
+        Args:
+            request: The HTTP request.
+
+        Returns:
+            Response: The counters of each endpoint scope, as returned by `throttle_counters`.
+        """
+        return Response(throttle_counters())